@@ -0,0 +1,352 @@
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from incremental import IncrementalParser, ShiftedSlices
+from lexer import Lexer
+from parser import AstCache, Parser, parse_file
+from syntax.node import SyntaxNode, node_fields
+from syntax.serialize import paused_gc
+
+
+def generate_netlist(line_num: int) -> str:
+    """
+    flattened gate-level like netlist with `line_num` lines:
+        module top (...);
+            wire n_0, n_1, n_2;
+            AND2 u_0 (.A(n_0), .B(n_1), .Y(n_2)); // cell 0
+            ...
+        endmodule
+    """
+    lines = ["module top (input wire clk, input wire [7:0] a, output wire [7:0] y);"]
+    for i in range(max(line_num - 2, 0)):
+        if i % 8 == 0:
+            lines.append(f"    wire n_{i}, n_{i + 1}, n_{i + 2};")
+        elif i % 8 == 7:
+            lines.append(f"    /* block {i} */ assign n_{i} = n_{i - 1} ^ 8'hff;")
+        else:
+            lines.append(f"    AND2 u_{i} (.A(n_{i}), .B(n_{i + 1}), .Y(n_{i + 2})); // cell {i}")
+    lines.append("endmodule")
+    return "\n".join(lines)
+
+
+def generate_library(module_num: int) -> str:
+    """
+    cell library like file with `module_num` small modules:
+        module CELL_0 (input wire A, input wire B, output wire Y);
+            wire n;
+            assign n = A & B;
+            assign Y = ~n;
+        endmodule
+        ...
+    """
+    lines = []
+    for i in range(module_num):
+        lines.append(f"module CELL_{i} (input wire A, input wire B, output wire Y);")
+        lines.append("    wire n;")
+        lines.append("    assign n = A & B;")
+        lines.append("    assign Y = ~n;")
+        lines.append("endmodule")
+    return "\n".join(lines)
+
+
+def generate_expressions(line_num: int) -> str:
+    """
+    expression heavy module with `line_num` lines, wide muxes and comparisons:
+        module alu (...);
+            assign n_0 = op == 4'd0 ? a + b * 0 : op == 4'd1 ? a - (b << 2) : ...;
+            ...
+        endmodule
+    """
+    lines = ["module alu (input wire clk, input wire [3:0] op, input wire [31:0] a, input wire [31:0] b, "
+             "output reg [31:0] y);"]
+    for i in range(max(line_num - 2, 0)):
+        if i % 4 == 0:
+            lines.append(f"    assign n_{i} = op == 4'd0 ? a + b * {i} : op == 4'd1 ? a - (b << 2) : "
+                         f"op == 4'd2 ? a & ~b | a ^ b : op == 4'd3 ? {{a[15:0], b[31:16]}} : "
+                         f"&a[7:0] && |b || !a[{i % 32}] ? 32'd1 : 32'd0;")
+        elif i % 4 == 1:
+            lines.append(f"    assign m_{i} = {{{{4{{a[7]}}}}, a[27:0]}} >>> 3 + (a % 5 == b ** 2) - -a[3:0] != 4'hf;")
+        elif i % 4 == 2:
+            lines.append(f"    always @(posedge clk) y <= y + {{a[{i % 8}], b[30:0]}} >= pkg::C ? f(a, b[3], st.x) : y;")
+        else:
+            lines.append(f"    assign k_{i} = (a <= b) === (a !== b) == a[1] && a < b || a > b >> 1 && a >= 32'h{i:x};")
+    lines.append("endmodule")
+    return "\n".join(lines)
+
+
+def generate_xor_chain(term_num: int) -> str:
+    """
+    a single long expression of `term_num` terms, as in a generated xor network:
+        module xor_chain (input wire [N:0] a, output wire y);
+            assign y = a[0] ^ a[1] ^ ... ^ a[N-1];
+        endmodule
+    """
+    terms = " ^ ".join(f"a[{i}]" for i in range(term_num))
+    return f"module xor_chain (input wire [{term_num}:0] a, output wire y);\n    assign y = {terms};\nendmodule"
+
+
+def generate_nested_expression(operand_num: int) -> str:
+    """
+    a single expression of `operand_num` operands nested as deep, as in a generated mux tree or adder chain:
+        module nested (input wire [N:0] a, input wire [N:0] sel, output wire y);
+            assign y = sel[0] ? a[0] : (a[1] + (sel[2] ? a[2] : (... (a[N-2] + (a[N-1])))));
+        endmodule
+    """
+    terms = []
+    for i in range(operand_num - 1):
+        terms.append(f"sel[{i}] ? a[{i}] : (" if i % 2 == 0 else f"a[{i}] + (")
+    expr = "".join(terms) + f"a[{operand_num - 1}]" + ")" * (operand_num - 1)
+    return (f"module nested (input wire [{operand_num}:0] a, input wire [{operand_num}:0] sel, output wire y);\n"
+            f"    assign y = {expr};\nendmodule")
+
+
+def bench_lexer_scaling(line_nums: list[int], engine: str = "master"):
+    """
+    the time per line should stay flat as the file grows, if lexing is linear in the file size
+    """
+    print(f"lexer engine: {engine}")
+    for line_num in line_nums:
+        context = generate_netlist(line_num)
+        start = time.perf_counter()
+        lexer = Lexer(context, engine=engine)
+        elapsed = time.perf_counter() - start
+        print(f"    lines: {line_num:>8}, tokens: {len(lexer.tokens):>9}, time: {elapsed:>8.3f}s, "
+              f"per line: {elapsed / line_num * 1e6:>6.2f}us")
+
+
+def bench_token_memory(line_num: int):
+    """
+    peak memory of lexing into a list of Token against lexing into a TokenStore
+    """
+    context = generate_netlist(line_num)
+    print(f"token memory, lines: {line_num}")
+    for store in [False, True]:
+        tracemalloc.start()
+        lexer = Lexer(context, store=store)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"    {'TokenStore' if store else 'list[Token]':<12}, tokens: {len(lexer.tokens):>9}, "
+              f"peak: {peak / 2**20:>8.1f}MiB")
+        del lexer
+
+
+def bench_parallel_lexing(line_num: int, jobs_list: list[int]):
+    """
+    lexing one large file with a pool of processes, the chunks are split at safe eol
+    """
+    context = generate_netlist(line_num)
+    print(f"parallel lexing, lines: {line_num}")
+    for jobs in jobs_list:
+        start = time.perf_counter()
+        lexer = Lexer(context, store=True, jobs=jobs)
+        elapsed = time.perf_counter() - start
+        print(f"    jobs: {jobs:>3}, tokens: {len(lexer.tokens):>9}, time: {elapsed:>8.3f}s")
+        del lexer
+
+
+def bench_ast_cache(line_num: int):
+    """
+    loading the syntax nodes of an unchanged file from the AST cache against parsing it
+    """
+    context = generate_netlist(line_num)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "netlist.sv")
+        with open(path, 'w', encoding="utf-8") as f:
+            f.write(context)
+        cache = AstCache(os.path.join(directory, "cache"))
+        start = time.perf_counter()
+        parse_file(path, parse_body=True)
+        cold = time.perf_counter() - start
+        parse_file(path, parse_body=True, cache=cache)  # fill the cache
+        gc.collect()
+        start = time.perf_counter()
+        nodes = parse_file(path, parse_body=True, cache=cache)
+        warm = time.perf_counter() - start
+        del nodes
+        gc.collect()
+        start = time.perf_counter()
+        with paused_gc():
+            nodes = parse_file(path, parse_body=True, cache=cache)
+        paused = time.perf_counter() - start
+    print(f"ast cache, lines: {line_num}, nodes: {len(nodes)}")
+    print(f"    parse: {cold:>8.3f}s, load: {warm:>8.3f}s, speedup: {cold / warm:>6.1f}x")
+    print(f"    load with the gc paused: {paused:>8.3f}s, speedup: {cold / paused:>6.1f}x")
+
+
+def bench_lazy_body(module_num: int, used_num: int = 10):
+    """
+    the bodies of `used_num` modules out of `module_num` are needed, parsing all the bodies against parsing them lazily
+    """
+    context = generate_library(module_num)
+    start = time.perf_counter()
+    Parser(context, parse_body=True).parse()
+    eager = time.perf_counter() - start
+    start = time.perf_counter()
+    nodes = Parser(context, parse_body=True, lazy_body=True).parse()
+    for node in nodes[:used_num]:
+        node.body_items
+    lazy = time.perf_counter() - start
+    print(f"lazy body, modules: {module_num}, bodies used: {used_num}")
+    print(f"    eager: {eager:>8.3f}s, lazy: {lazy:>8.3f}s, speedup: {eager / lazy:>6.1f}x")
+
+
+def bench_parallel_parsing(module_num: int, jobs_list: list[int]):
+    """
+    parsing the modules of a single file with a pool of `jobs` processes
+    """
+    context = generate_library(module_num)
+    base = None
+    for jobs in jobs_list:
+        start = time.perf_counter()
+        Parser(context, parse_body=True, jobs=jobs).parse()
+        elapsed = time.perf_counter() - start
+        base = base or elapsed
+        print(f"parallel parsing, modules: {module_num}, jobs: {jobs:>3}, time: {elapsed:>8.3f}s, "
+              f"speedup: {base / elapsed:>6.2f}x")
+
+
+def bench_expression_parsing(line_nums: list[int]):
+    """
+    parsing an expression heavy module, most of the time is in the pratt parser
+    """
+    for line_num in line_nums:
+        context = generate_expressions(line_num)
+        start = time.perf_counter()
+        Parser(context, parse_body=True).parse()
+        elapsed = time.perf_counter() - start
+        print(f"expression parsing, lines: {line_num:>8}, time: {elapsed:>8.3f}s, "
+              f"per line: {elapsed / line_num * 1e6:>8.2f}us")
+
+
+def bench_long_expression(term_nums: list[int]):
+    """
+    parsing one long expression, the time and the memory per term should stay flat as it grows
+    """
+    for term_num in term_nums:
+        context = generate_xor_chain(term_num)
+        tracemalloc.start()
+        start = time.perf_counter()
+        Parser(context, parse_body=True).parse()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"long expression, terms: {term_num:>8}, time: {elapsed:>8.3f}s, peak: {peak / 2**20:>8.1f}MiB")
+
+
+def bench_deep_expression(operand_nums: list[int]):
+    """
+    parsing one expression nested as deep as its number of operands, far beyond the recursion limit,
+    the time per operand should stay flat as it grows
+    """
+    for operand_num in operand_nums:
+        context = generate_nested_expression(operand_num)
+        start = time.perf_counter()
+        Parser(context, parse_body=True).parse()
+        elapsed = time.perf_counter() - start
+        print(f"deep expression, operands: {operand_num:>8}, depth: {operand_num - 1:>8}, time: {elapsed:>8.3f}s, "
+              f"per operand: {elapsed / operand_num * 1e6:>8.2f}us")
+
+
+def bench_expression_rendering(operand_nums: list[int]):
+    """
+    rendering the tokens_str of one expression nested as deep as its number of operands, the time per operand should
+    stay flat as it grows, the second access is memoized. source_str slices the source instead
+    """
+    for operand_num in operand_nums:
+        parser = Parser(generate_nested_expression(operand_num), parse_body=True)
+        expr = parser.parse()[0].body_items[0].assignment
+        start = time.perf_counter()
+        expr.tokens_str
+        first = time.perf_counter() - start
+        start = time.perf_counter()
+        expr.tokens_str
+        second = time.perf_counter() - start
+        start = time.perf_counter()
+        expr.source_str(parser.ctx.src_info.lines)
+        source = time.perf_counter() - start
+        print(f"expression rendering, operands: {operand_num:>8}, tokens_str: {first:>8.3f}s, "
+              f"per operand: {first / operand_num * 1e6:>8.2f}us, memoized: {second * 1e6:>8.2f}us, "
+              f"source_str: {source * 1e6:>8.2f}us")
+
+
+def count_nodes(obj) -> int:
+    if isinstance(obj, SyntaxNode):
+        return 1 + sum(count_nodes(getattr(obj, attr)) for attr in node_fields(obj.__class__) if attr != "tokens")
+    elif isinstance(obj, (list, tuple, ShiftedSlices)):
+        return sum(count_nodes(c) for c in obj)
+    return 0
+
+
+def bench_node_memory(line_num: int):
+    """
+    memory held by the syntax nodes of a parse, and per node, which is mostly the nodes themselves and their lists
+    """
+    for name, context in [("netlist", generate_netlist(line_num)), ("expressions", generate_expressions(line_num // 10))]:
+        parser = Parser(context, parse_body=True)  # the tokens are not counted
+        gc.collect()
+        tracemalloc.start()
+        nodes = parser.parse()
+        gc.collect()
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        node_num = count_nodes(nodes)
+        print(f"node memory, {name}, nodes: {node_num:>9}, memory: {current / 2**20:>8.1f}MiB, "
+              f"per node: {current / node_num:>6.0f}B")
+        del nodes, parser
+
+
+def bench_incremental_reparse(line_nums: list[int]):
+    """
+    an edit of one line in the middle of the file, reparsing it incrementally against parsing the whole file,
+    the incremental time should stay about flat as the file grows, also when the edit adds a line, and over 100 edits
+    adding lines, whose slices pile up. a node behind such an edit is shifted when it is read, the last one here
+    """
+    for line_num in line_nums:
+        context = generate_netlist(line_num)
+        start = time.perf_counter()
+        Parser(context, parse_body=True).parse()
+        full = time.perf_counter() - start
+        incremental = IncrementalParser(context)
+        gc.collect()  # the parse leaves a collection of its nodes due, not to be timed with the edits
+        pos = context.index("AND2", len(context) // 2)
+        start = time.perf_counter()
+        incremental.edit(pos, pos + len("AND2"), "OR2")  # same number of lines
+        same = time.perf_counter() - start
+        pos = context.index("\n", pos)
+        start = time.perf_counter()
+        nodes = incremental.edit(pos, pos, "\n    wire n_x;")  # a line added, the nodes behind are shifted
+        added = time.perf_counter() - start
+        start = time.perf_counter()
+        _ = nodes[-1].body_items[-1].tokens_str
+        read = time.perf_counter() - start
+        start = time.perf_counter()
+        for i in range(1, 101):  # behind the module header, an edit of it parses the module again
+            pos = incremental.text.index("\n", len(incremental.text) * i // 101)
+            incremental.edit(pos, pos, "\n    wire n_y;")
+        edits = (time.perf_counter() - start) / 100
+        print(f"incremental reparse, lines: {line_num:>8}, full: {full:>8.3f}s, edit: {same * 1e3:>8.2f}ms, "
+              f"edit adding a line: {added * 1e3:>8.2f}ms, reading a node behind it: {read * 1e3:>8.2f}ms, "
+              f"per edit of 100 adding lines: {edits * 1e3:>8.2f}ms")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        line_nums = [int(arg) for arg in sys.argv[1:]]
+    else:
+        line_nums = [1_000, 10_000, 100_000, 1_000_000]
+    bench_lexer_scaling(line_nums)
+    bench_token_memory(line_nums[-1])
+    bench_parallel_lexing(line_nums[-1], [1, 2, 4, os.cpu_count() or 1])
+    bench_ast_cache(line_nums[-1])
+    bench_lazy_body(line_nums[-1] // 10)
+    bench_parallel_parsing(line_nums[-1] // 10, [1, 2, 4, os.cpu_count() or 1])
+    bench_incremental_reparse(line_nums)
+    bench_expression_parsing(line_nums[:-1])
+    bench_long_expression([line_num // 100 for line_num in line_nums])
+    bench_node_memory(line_nums[-1] // 10)
+    bench_deep_expression([1_000, 10_000, 100_000])
+    bench_expression_rendering([1_000, 10_000, 100_000])
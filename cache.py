@@ -0,0 +1,113 @@
+import hashlib
+import os
+import tempfile
+import time
+
+from log import log
+
+
+tool_sources: list[str] = ["lexer.py", "parser.py", "pratt.py", "prototype.py", "reserved_word.py",
+                           os.path.join("syntax", "node.py"), os.path.join("syntax", "expression.py"),
+                           os.path.join("syntax", "serialize.py")]
+tool_version_: str | None = None
+
+
+def tool_version() -> str:
+    """
+    hash of the sources of the lexer and the parser, a cached result is stale once any of them changes
+    """
+    global tool_version_
+    if tool_version_ is None:
+        digest = hashlib.sha256()
+        root = os.path.dirname(os.path.abspath(__file__))
+        for source in tool_sources:
+            with open(os.path.join(root, source), 'rb') as f:
+                digest.update(f.read())
+        tool_version_ = digest.hexdigest()
+    return tool_version_
+
+
+class DiskCache:
+    """
+    a directory of entries, each is one file named by its key.
+    an entry is written to a temporary file and renamed, so concurrent writers, e.g. a process pool,
+    never leave a partial entry. reading an entry refreshes its mtime, `evict` removes the least recently used ones
+    """
+    def __init__(self, directory: str, suffix: str = "", max_age: float = 30 * 24 * 3600, max_size: int = 1 << 30):
+        """
+        max_age:
+            in seconds, entries not used for longer are evicted
+        max_size:
+            in bytes, the least recently used entries are evicted until the total size is below it
+        """
+        self.directory: str = directory
+        self.suffix: str = suffix
+        self.max_age: float = max_age
+        self.max_size: int = max_size
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(content: bytes, *options) -> str:
+        """ content hash, salted by the tool version and the options the cached result depends on """
+        digest = hashlib.sha256(content)
+        digest.update(repr((tool_version(),) + options).encode())
+        return digest.hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + self.suffix)
+
+    def get(self, key: str) -> bytes | None:
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def put(self, key: str, data: bytes):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            log.warning(f"failed to write cache entry '{path}'\n")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def evict(self) -> int:
+        """ returns the number of evicted entries """
+        entries = []
+        for root, dirs, files in os.walk(self.directory):
+            for file in files:
+                if not file.endswith(self.suffix) or file.startswith(".tmp"):
+                    continue
+                path = os.path.join(root, file)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort(reverse=True)  # the most recently used first
+        now = time.time()
+        total_size = 0
+        evicted = 0
+        for mtime, size, path in entries:
+            total_size += size
+            if now - mtime <= self.max_age and total_size <= self.max_size:
+                continue
+            try:
+                os.remove(path)
+                evicted += 1
+            except OSError:
+                pass
+        return evicted
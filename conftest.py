@@ -0,0 +1,15 @@
+import os
+
+import pytest
+
+
+@pytest.fixture
+def rich_grammar_path() -> str:
+    """ a little of every construct the lexer and the parser know """
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), "rich_grammar.sv")
+
+
+@pytest.fixture
+def rich_grammar(rich_grammar_path) -> str:
+    with open(rich_grammar_path, 'r', encoding="utf-8") as f:
+        return f.read()
@@ -0,0 +1,342 @@
+import bisect
+import collections.abc
+import dataclasses
+import itertools
+import re
+import typing
+
+from lexer import Token, TokenKind, TokenSpan, TokenView, comment_kinds, lex_from
+from log import log
+from parser import Context, Parser, ParserError, SourceInfo, SourceLines
+from syntax.node import LazyModuleNode, ModuleNode, SyntaxNode, node_fields
+
+
+class ShiftedSlices(collections.abc.Sequence):
+    """
+    slices of other sequences, as a read-only sequence whose elements are read shifted by the delta of their slice:
+    an int by its value, a token or a node by its lines, see `shift_lines`, e.g. the line ends, the tokens and the
+    nodes behind an edit which adds lines. an edit is a new ShiftedSlices sharing the slices, see `spliced`, nothing is
+    copied or shifted in place, so it costs O(the slices) rather than O(the elements), and the sequences edited read
+    the same as before. a shifted element is kept, reading it again gives the same object.
+    it compares equal to a list of the same elements, and is pickled as a list
+    """
+    __slots__ = ("slices", "starts", "shifted")
+
+    def __init__(self, slices: list[tuple[typing.Sequence, int, int, int]]):
+        # (source, lo, hi, delta), a source is not a ShiftedSlices, so the elements are read through one of them
+        self.slices: list[tuple[typing.Sequence, int, int, int]] = [s for s in slices if s[1] < s[2]]
+        self.starts: list[int] = list(itertools.accumulate((hi - lo for _, lo, hi, _ in self.slices), initial=0))
+        self.shifted: dict[int, typing.Any] = {}
+
+    @staticmethod
+    def of(seq: typing.Sequence, delta: int = 0) -> 'ShiftedSlices':
+        """ the whole of `seq`, shifted by delta """
+        if isinstance(seq, ShiftedSlices):
+            return ShiftedSlices([(source, lo, hi, d + delta) for source, lo, hi, d in seq.slices])
+        return ShiftedSlices([(seq, 0, len(seq), delta)])
+
+    def slices_of(self, lo: int, hi: int, delta: int = 0) -> list[tuple[typing.Sequence, int, int, int]]:
+        """ the slices of self[lo:hi], shifted by delta """
+        out = []
+        k = max(bisect.bisect_right(self.starts, lo) - 1, 0)
+        while k < len(self.slices) and self.starts[k] < hi:
+            source, s_lo, s_hi, d = self.slices[k]
+            start = self.starts[k]
+            out.append((source, s_lo + max(lo - start, 0), s_lo + min(hi - start, s_hi - s_lo), d + delta))
+            k += 1
+        return out
+
+    def spliced(self, lo: int, hi: int, new: typing.Sequence, delta: int) -> 'ShiftedSlices':
+        """ self[:lo] + new + self[hi:], the elements behind shifted by delta """
+        return ShiftedSlices(self.slices_of(0, lo) + ShiftedSlices.of(new).slices +
+                             self.slices_of(hi, len(self), delta))
+
+    def __len__(self) -> int:
+        return self.starts[-1]
+
+    def __getitem__(self, idx: int | slice):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(len(self))[idx]]
+        if idx < 0:
+            idx += len(self)
+        if idx < 0 or idx >= len(self):
+            raise IndexError(f"index out of range: {idx}")
+        obj = self.shifted.get(idx)
+        if obj is not None:
+            return obj
+        k = bisect.bisect_right(self.starts, idx) - 1
+        source, lo, _, delta = self.slices[k]
+        obj = source[lo + idx - self.starts[k]]
+        if delta == 0:
+            return obj
+        if isinstance(obj, int):
+            return obj + delta
+        obj = self.shifted[idx] = shift_lines(obj, delta, {})
+        return obj
+
+    def __iter__(self):
+        for (source, lo, hi, delta), start in zip(self.slices, self.starts):
+            if delta == 0:
+                yield from map(source.__getitem__, range(lo, hi))
+            else:
+                yield from map(self.__getitem__, range(start, start + hi - lo))
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (ShiftedSlices, TokenSpan, list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return list, (list(self),)
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+def shift_lines(obj, delta: int, views: dict[int, ShiftedSlices]):
+    """
+    a copy of the token or the node with its lines shifted by delta, the sub-nodes and tokens of a node are copied,
+    but the body items of a module and the TokenSpans are not, they become ShiftedSlices of what they refer to.
+    views: by id of the token sequence of a TokenSpan, its ShiftedSlices, so a node and its sub-nodes share the tokens
+    """
+    if isinstance(obj, Token):
+        return Token(obj.kind_, obj.ldx + delta, obj.cdx, obj.val, obj.src)
+    elif isinstance(obj, TokenView):
+        return shift_lines(obj.to_token(), delta, views)
+    elif isinstance(obj, SyntaxNode):
+        cls = ModuleNode if isinstance(obj, LazyModuleNode) else obj.__class__
+        node = object.__new__(cls)
+        for attr in node_fields(cls):
+            value = getattr(obj, attr)
+            if attr == "ldx":
+                value += delta
+            elif attr == "body_items":
+                value = ShiftedSlices.of(value, delta)
+            elif attr != "cdx":
+                value = shift_lines(value, delta, views)
+            object.__setattr__(node, attr, value)
+        object.__setattr__(node, "tokens_str_", obj.tokens_str_)  # the text is the same
+        return node
+    elif isinstance(obj, TokenSpan):
+        view = views.get(id(obj.source))
+        if view is None:
+            view = views[id(obj.source)] = ShiftedSlices.of(obj.source, delta)
+        return TokenSpan(view, obj.start, obj.end)
+    elif isinstance(obj, (list, ShiftedSlices)):
+        return [shift_lines(c, delta, views) for c in obj]
+    elif isinstance(obj, tuple):
+        return tuple(shift_lines(c, delta, views) for c in obj)
+    else:
+        return obj
+
+
+class IncrementalParser:
+    """
+    the text, the tokens and the syntax nodes of a parse, kept so that an edit of the text is relexed and reparsed
+    locally rather than as a whole, e.g. on every keystroke in an editor:
+        the tokens are relexed from the last token before the edit, until they line up with the old tokens again
+        the module body items the relexed tokens fall in are reparsed, or the top-level items if the edit is not
+        inside a module body, the whole text is parsed again only if neither works
+        the other nodes are reused, nothing is shifted or copied in place: the line ends, the tokens and the items
+        are ShiftedSlices, an edit splices the new ones in and adds the lines it adds to the slices behind it, so it
+        costs O(the edit and the slices) rather than O(the text), a node behind the edit is copied with its lines
+        shifted when it is first read
+    the nodes returned by an edit are not changed by the next ones. the comments are not kept
+    """
+    def __init__(self, text: str, eol: str = '\n', path: str = "", parse_body: bool = True):
+        self.eol: str = eol
+        self.path: str = path
+        self.parse_body: bool = parse_body
+        self.text: str = text
+        self.line_ends: typing.Sequence[int] = []
+        self.tokens: typing.Sequence[Token] = []
+        # None if the text is not parsed, e.g. it has a syntax error
+        self.nodes: typing.Sequence[SyntaxNode] | None = None
+        self.parser: Parser | None = None
+        self.reset(text)
+
+    def reset(self, text: str) -> list[SyntaxNode]:
+        """ parse the whole text """
+        self.text = text
+        self.nodes = None
+        self.parser = Parser(text, self.eol, path=self.path, parse_body=self.parse_body)
+        self.line_ends = self.parser.ctx.src_info.lines.line_ends
+        self.tokens = self.parser.ctx.tokens
+        self.nodes = self.parser.parse()
+        return self.nodes
+
+    def offset(self, token: Token) -> int:
+        return (self.line_ends[token.ldx - 1] if token.ldx != 0 else 0) + token.cdx
+
+    def token_idx(self, token: Token) -> int:
+        return bisect.bisect_left(self.tokens, self.offset(token), key=self.offset)
+
+    def edit(self, start: int, end: int, text: str) -> typing.Sequence[SyntaxNode]:
+        """
+        replace self.text[start:end] by `text`, returns the updated top-level nodes, a read-only sequence.
+        a syntax error is raised like `Parser.parse`, the next edit parses the whole text then
+        """
+        new_text = self.text[:start] + text + self.text[end:]
+        if self.nodes is None:
+            return self.reset(new_text)
+        line_ends = self.edit_line_ends(new_text, start, end, len(text))
+        try:
+            first, last, new_tokens = self.relex(new_text, line_ends, start, end, len(text))
+        except AssertionError:
+            return self.reset(new_text)  # an invalid token, reported by the lexer
+
+        # the items are located by the old tokens, before they are replaced
+        plan = self.plan_module_body(first, last) if self.parse_body else None
+        top_plan = self.plan_items(self.nodes, 0, len(self.tokens) - 1, first, last)
+
+        line_delta = len(line_ends) - len(self.line_ends)
+        # spliced rather than updated in place, the nodes reused refer to the old tokens by TokenSpan
+        self.tokens = ShiftedSlices.of(self.tokens).spliced(first, last + 1, new_tokens, line_delta)
+        self.text = new_text
+        self.line_ends = line_ends
+        shift = len(new_tokens) - (last + 1 - first)  # of the token indexes behind the relexed tokens
+
+        nodes = None
+        if plan is not None:
+            nodes = self.reparse_module_body(plan, shift, line_delta)
+        if nodes is None:
+            nodes = self.reparse_items(self.nodes, top_plan, shift, line_delta,
+                                       lambda ctx: list(self.parser.parse_top_level_items_locally(ctx)))
+        if nodes is None:
+            return self.reset(new_text)
+        self.nodes = nodes
+        return nodes
+
+    def edit_line_ends(self, new_text: str, start: int, end: int, text_len: int) -> ShiftedSlices:
+        """
+        the line ends of the new text, only the lines of the edit are scanned, the ones behind are shifted,
+        it reads as `get_line_ends(new_text, self.eol)`
+        """
+        old = self.line_ends
+        delta = text_len - (end - start)
+        i = bisect.bisect_right(old, start, hi=len(old) - 1)  # the eol up to `start` are kept
+        line_start = old[i - 1] if i > 0 else 0
+        # an eol starting at or behind `end` in the old text is unchanged, the last entry is the end of the text
+        j = bisect.bisect_left(old, end + len(self.eol), lo=i, hi=len(old) - 1)
+        scan_end = min(start + text_len + len(self.eol) - 1, len(new_text))
+        scanned = [_.end() for _ in re.compile(re.escape(self.eol)).finditer(new_text, line_start, scan_end)]
+        # the last entry, the end of the text, is shifted to the end of the new text
+        return ShiftedSlices.of(old).spliced(i, j, scanned, delta)
+
+    def relex(self, new_text: str, line_ends, start: int, end: int, text_len: int) \
+            -> tuple[int, int, list[Token]]:
+        """
+        returns the range [first, last] of the old tokens replaced, and the new tokens replacing them.
+        the relexing stops at the first token behind the edit which is at the same offset as an old token,
+        shifted by the edit, on a line after the edit, the tokens from then on are the same
+        """
+        tokens = self.tokens
+        first = max(bisect.bisect_left(tokens, start, key=self.offset) - 1, 0)
+        relex_start = self.offset(tokens[first])
+        if relex_start >= start:
+            relex_start = 0  # the edit is before the first token, maybe inside a comment
+        edit_end = start + text_len  # in the new text
+        delta = text_len - (end - start)
+        end_ldx = bisect.bisect_right(self.line_ends, end)  # the line of the edit end in the old text
+        old_idx = first
+        new_tokens = []
+        for token, offset in lex_from(new_text, relex_start, line_ends):
+            if token.kind_ in comment_kinds:
+                continue
+            if offset >= edit_end:
+                old_offset = offset - delta
+                while old_idx < len(tokens) and self.offset(tokens[old_idx]) < old_offset:
+                    old_idx += 1
+                if old_idx < len(tokens) and self.offset(tokens[old_idx]) == old_offset and \
+                        tokens[old_idx].ldx > end_ldx:
+                    return first, old_idx - 1, new_tokens
+            new_tokens.append(token)
+        return first, len(tokens) - 1, new_tokens
+
+    def plan_items(self, items: typing.Sequence[SyntaxNode], bound_lo: int, bound_hi: int, first: int, last: int) \
+            -> tuple[int, int, int, int] | None:
+        """
+        the items [i, j] which the old tokens [first, last] fall in, and their token range [lo, hi],
+        an item is taken to extend to the next one, so the tokens between items belong to the one before,
+        the ones before the first item to it. None if the tokens are not inside [bound_lo, bound_hi]
+        """
+        if first < bound_lo or last > bound_hi:
+            return None
+        key = lambda item: self.token_idx(item.tokens[0])
+        i = max(bisect.bisect_right(items, first, key=key) - 1, 0)
+        j = bisect.bisect_right(items, last, key=key) - 1
+        lo = key(items[i]) if items and first >= key(items[i]) else bound_lo
+        hi = key(items[j + 1]) - 1 if j + 1 < len(items) else bound_hi
+        return i, j, min(lo, first), hi
+
+    def plan_module_body(self, first: int, last: int) -> tuple[int, ModuleNode, tuple[int, int, int, int]] | None:
+        """ the module whose body the old tokens [first, last] are inside, and the plan of its body items """
+        key = lambda node: self.token_idx(node.tokens[0])
+        m = bisect.bisect_right(self.nodes, first, key=key) - 1
+        if m < 0 or not isinstance(self.nodes[m], ModuleNode):
+            return None
+        module = self.nodes[m]
+        module_start = key(module)
+        module_end = self.token_idx(module.tokens[-1])
+        body_start = module_start
+        depth = 0
+        while body_start < module_end:  # the body starts behind the ';' of the header
+            kind = self.tokens[body_start].kind_
+            if kind == TokenKind.LParen:
+                depth += 1
+            elif kind == TokenKind.RParen:
+                depth -= 1
+            elif kind == TokenKind.SemiColon and depth == 0:
+                break
+            body_start += 1
+        plan = self.plan_items(module.body_items, body_start + 1, module_end - 1, first, last)
+        if plan is None:
+            return None
+        return m, module, plan
+
+    def reparse_module_body(self, plan: tuple[int, ModuleNode, tuple[int, int, int, int]], shift: int,
+                            line_delta: int) -> ShiftedSlices | None:
+        m, module, items_plan = plan
+
+        def parse_body_items(ctx: Context) -> list[SyntaxNode]:
+            items = []
+            while ctx.current() is not None and ctx.current().kind_ != TokenKind.EndModule:
+                item = self.parser.parse_module_body_item_locally(ctx)
+                if item is not None:
+                    items.append(item)
+            return items
+
+        body_items = self.reparse_items(module.body_items, items_plan, shift, line_delta, parse_body_items)
+        if body_items is None:
+            return None
+        module_start = self.token_idx(module.tokens[0])
+        module_end = module_start + len(module.tokens) - 1 + shift
+        node = dataclasses.replace(module, tokens=TokenSpan(self.tokens, module_start, module_end + 1),
+                                   body_items=body_items)
+        return ShiftedSlices.of(self.nodes).spliced(m, m + 1, [node], line_delta)
+
+    def reparse_items(self, items: typing.Sequence[SyntaxNode], plan: tuple[int, int, int, int] | None, shift: int,
+                      line_delta: int, parse) -> ShiftedSlices | None:
+        """
+        parse the items [i, j] of the plan again from the new tokens, None if it fails,
+        e.g. the edit changes where the items end
+        """
+        if plan is None:
+            return None
+        i, j, lo, hi = plan
+        ctx = Context(self.tokens[lo:hi + shift + 1], src_info=SourceInfo(
+            SourceLines(self.text, self.line_ends, self.eol), self.path))
+        self.parser.ctx = ctx
+        # a failure here is not reported, the text is parsed as a whole then, which reports it
+        with log.collect() as msgs:
+            try:
+                new_items = parse(ctx)
+            except (ParserError, AssertionError):
+                return None
+        if ctx.current() is not None and ctx.current().kind_ != TokenKind.EOF:  # e.g. an 'endmodule' in the body
+            return None
+        log.report(msgs)
+        # the items behind are reused, their lines are shifted as they are read
+        return ShiftedSlices.of(items).spliced(i, j + 1, new_items, line_delta)
@@ -1,7 +1,14 @@
+import array
 import bisect
+import collections.abc
+import concurrent.futures
 import enum
 import dataclasses
+import mmap
+import multiprocessing
+import os
 import re
+import typing
 
 from reserved_word import reserved_words
 
@@ -354,15 +361,103 @@ token_kinds: list[str] = []
 token_matches: list[tuple[str, re.Pattern[str]]] = []
 reserved_word_pat_pat: re.Pattern[str] = re.compile(r"\^"+r"\\b(\w+)\\b")
 implemented_reserved_word: list[str] = []
+keyword_kinds: dict[str, TokenKind] = {}  # reserved word -> token kind, looked up after matching an identifier
+master_pat: re.Pattern[str] | None = None
+binary_master_pat: re.Pattern[bytes] | None = None
+offset_matches: list[tuple[str, re.Pattern[str]]] | None = None
 
 
 def register_token_match(kind: str, pat: re.Pattern[str]):
+    global master_pat, binary_master_pat, offset_matches
     assert kind not in token_kinds
     token_kinds.append(kind)
     token_matches.append((kind, pat))
     cap = reserved_word_pat_pat.match(pat.pattern)
     if cap is not None:
         implemented_reserved_word.append(cap.group(1))
+        keyword_kinds[cap.group(1)] = TokenKind[kind]
+    master_pat = None
+    binary_master_pat = None
+    offset_matches = None
+
+
+def strip_anchor(pattern: str) -> str:
+    """
+    remove the '^' anchors (but not the ones in character sets), the registered patterns are anchored at the start of
+    the sliced remains, while the offset patterns are anchored by `match(context, idx)` instead
+    """
+    chars = []
+    escaped = False
+    in_set = False
+    for char in pattern:
+        if escaped:
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif in_set:
+            in_set = char != ']' or chars[-1] == '['
+        elif char == '[':
+            in_set = True
+        elif char == '^':
+            continue
+        chars.append(char)
+    return "".join(chars)
+
+
+def offset_pattern(pat: re.Pattern[str]) -> str:
+    """
+    rewrite a registered token pattern to be matched at an offset of the whole context, like `match(context, idx)`,
+    rather than at the beginning of the sliced remains
+    """
+    pattern = strip_anchor(pat.pattern)
+    # at the beginning of the sliced remains, a leading '\b' only means "starts with a word character", it must not
+    # look back at the previous token, e.g. '10ns'
+    if pattern.startswith(r"\b"):
+        pattern = pattern[2:]
+    if pat.flags & re.DOTALL:
+        pattern = f"(?s:{pattern})"
+    return pattern
+
+
+def get_offset_matches() -> list[tuple[str, re.Pattern[str]]]:
+    global offset_matches
+    if offset_matches is None:
+        offset_matches = [(kind, re.compile(offset_pattern(pat))) for kind, pat in token_matches]
+    return offset_matches
+
+
+def get_master_pat() -> re.Pattern[str]:
+    """
+    join all the registered token patterns into one alternation, one named group per token kind,
+    the alternation tries them in the registration order, so the first registered pattern still wins.
+    reserved words are left out, they are matched as identifier and then classified by `keyword_kinds`
+    """
+    global master_pat
+    if master_pat is None:
+        keywords = set(keyword_kinds.values())
+        master_pat = re.compile("|".join([f"(?P<{kind}>{offset_pattern(pat)})" for kind, pat in token_matches
+                                          if TokenKind[kind] not in keywords]))
+    return master_pat
+
+
+def get_binary_master_pat() -> re.Pattern[bytes]:
+    """
+    the master pattern for lexing utf-8 bytes, e.g. a memory-mapped file
+    """
+    global binary_master_pat
+    if binary_master_pat is None:
+        binary_master_pat = re.compile(get_master_pat().pattern.encode())
+    return binary_master_pat
+
+
+def map_file(path: str) -> mmap.mmap | bytes:
+    """
+    map the file into memory read-only, the pages are loaded by the os on demand rather than read into a str
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""  # an empty file can not be mapped
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
 
 
 literal_pat_0 = re.compile(r"^"+r"([0-9]*)'([sS]?)([bodhBODH])([_0-9a-fA-F]+)")
@@ -374,6 +469,19 @@ identifier_pat = re.compile(r"^"+r"[\$a-zA-Z_][a-zA-Z0-9_]*")
 directive_pat = re.compile(r"^"+r"`"+identifier_pat.pattern[1:])
 line_comment_pat = re.compile(r"^"+r"//.*(?=\n|$)")
 block_comment_pat = re.compile(r"^"+r"/\*.*?\*/", re.DOTALL)
+whitespace_pat = re.compile(r"[ \t\n]*")
+binary_whitespace_pat = re.compile(rb"[ \t\n]*")
+# the tokens which may span lines, the context is only split at the eol outside of them
+spanning_pat = re.compile(r"//[^\n]*|/\*.*?\*/|" + string_literal_pat.pattern[1:], re.DOTALL)
+binary_spanning_pat = re.compile(spanning_pat.pattern.encode(), re.DOTALL)
+# the words a module prototype is found by, the comments and string literals are matched only to be skipped
+header_scan_pat = re.compile(spanning_pat.pattern +
+                             r"|`(?P<Directive>ifdef|ifndef|endif|celldefine|endcelldefine)\b"
+                             r"|\b(?P<Keyword>module|endmodule|input|output|inout|parameter|"
+                             r"function|endfunction|task|endtask)\b", re.DOTALL)
+binary_header_scan_pat = re.compile(header_scan_pat.pattern.encode(), re.DOTALL)
+statement_end_pat = re.compile(spanning_pat.pattern + r"|;", re.DOTALL)
+binary_statement_end_pat = re.compile(statement_end_pat.pattern.encode(), re.DOTALL)
 
 
 """
@@ -567,9 +675,9 @@ register_token_match("EOF", re.compile('\0'))
 #print(f"{implemented_reserved_word}")
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class Token:
-    kind: str
+    kind_: TokenKind
     ldx: int
     cdx: int
     val: str
@@ -578,6 +686,94 @@ class Token:
     # def __str__(self):
     #     return f"kind: {self.kind_:<24}, rdx: {self.rdx:<5}, cdx: {self.cdx:<5}, val: {self.val}"
 
+    def __str__(self):
+        return self.src
+
+    def __repr__(self):
+        return self.__str__()
+
+    @property
+    def kind(self) -> str:
+        """ name of the token kind, use `kind_` to avoid looking up the enum by name """
+        return self.kind_.name
+
+    @property
+    def pos(self) -> (int, int):
+        return self.ldx, self.cdx
+
+
+kind_by_id: dict[int, TokenKind] = {kind.value: kind for kind in TokenKind}
+kind_by_name: dict[str, TokenKind] = {kind.name: kind for kind in TokenKind}
+
+
+class TokenStore:
+    """
+    columnar token storage, one array per field rather than one object per token,
+    the source text of a token is sliced from the context on demand
+    """
+    def __init__(self, context: str | bytes | mmap.mmap):
+        self.context: str | bytes | mmap.mmap = context
+        self.binary: bool = not isinstance(context, str)
+        self.kinds: array.array = array.array('H')  # TokenKind value
+        self.starts: array.array = array.array('Q')  # offset in context
+        self.lengths: array.array = array.array('I')
+        self.ldxs: array.array = array.array('I')
+        self.cdxs: array.array = array.array('I')
+
+    def append(self, kind: TokenKind, start: int, length: int, ldx: int, cdx: int):
+        self.kinds.append(kind.value)
+        self.starts.append(start)
+        self.lengths.append(length)
+        self.ldxs.append(ldx)
+        self.cdxs.append(cdx)
+
+    def src(self, idx: int) -> str:
+        if self.kinds[idx] == TokenKind.EOF.value:
+            return "\0"
+        start = self.starts[idx]
+        if self.binary:
+            return self.context[start:start + self.lengths[idx]].decode()
+        return self.context[start:start + self.lengths[idx]]
+
+    def without_kinds(self, kinds: list[TokenKind]) -> 'TokenStore':
+        kind_values = set(kind.value for kind in kinds)
+        store = TokenStore(self.context)
+        for idx in range(len(self)):
+            if self.kinds[idx] not in kind_values:
+                store.kinds.append(self.kinds[idx])
+                store.starts.append(self.starts[idx])
+                store.lengths.append(self.lengths[idx])
+                store.ldxs.append(self.ldxs[idx])
+                store.cdxs.append(self.cdxs[idx])
+        return store
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def __getitem__(self, idx: int | slice) -> 'TokenView | list[TokenView]':
+        if isinstance(idx, slice):
+            return [TokenView(self, i) for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        if idx < 0 or idx >= len(self):
+            raise IndexError(f"token index out of range: {idx}")
+        return TokenView(self, idx)
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield TokenView(self, idx)
+
+
+class TokenView:
+    """
+    a token inside a TokenStore, it has the same attributes as Token
+    """
+    __slots__ = ("store", "idx")
+
+    def __init__(self, store: TokenStore, idx: int):
+        self.store: TokenStore = store
+        self.idx: int = idx
+
     def __str__(self):
         return self.src
 
@@ -586,65 +782,610 @@ class Token:
 
     @property
     def kind_(self) -> TokenKind:
-        return TokenKind[self.kind]
+        return kind_by_id[self.store.kinds[self.idx]]
+
+    @property
+    def kind(self) -> str:
+        return self.kind_.name
+
+    @property
+    def ldx(self) -> int:
+        return self.store.ldxs[self.idx]
+
+    @property
+    def cdx(self) -> int:
+        return self.store.cdxs[self.idx]
 
     @property
     def pos(self) -> (int, int):
         return self.ldx, self.cdx
 
+    @property
+    def src(self) -> str:
+        return self.store.src(self.idx)
+
+    @property
+    def val(self) -> str:
+        return self.src
+
+    def to_token(self) -> Token:
+        return Token(kind_=self.kind_, ldx=self.ldx, cdx=self.cdx, val=self.val, src=self.src)
+
+
+class TokenSpan(collections.abc.Sequence):
+    """
+    tokens[start:end] of a token list or a TokenStore, as a read-only sequence sharing the tokens rather than copying
+    them, the tokens of a syntax node are a span of the token stream, so a node costs O(1) rather than O(its length).
+    it compares equal to a list of the same tokens, and is pickled as a list
+    """
+    __slots__ = ("source", "start", "end")
+
+    def __init__(self, source: 'list[Token] | TokenStore', start: int, end: int):
+        self.source: list[Token] | TokenStore = source
+        self.start: int = start
+        self.end: int = end
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def __getitem__(self, idx: int | slice) -> 'Token | TokenView | TokenSpan | list':
+        if isinstance(idx, slice):
+            r = range(self.start, self.end)[idx]
+            if r.step == 1:
+                return TokenSpan(self.source, r.start, max(r.stop, r.start))
+            return [self.source[i] for i in r]
+        if idx < 0:
+            idx += self.end - self.start
+        if idx < 0 or idx >= self.end - self.start:
+            raise IndexError(f"token index out of range: {idx}")
+        return self.source[self.start + idx]
+
+    def __iter__(self):
+        return map(self.source.__getitem__, range(self.start, self.end))
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (TokenSpan, list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __add__(self, other) -> list:
+        return list(self) + list(other)
+
+    def __radd__(self, other) -> list:
+        return list(other) + list(self)
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def __reduce__(self):
+        return list, (list(self),)
+
+
+def get_line_ends(context: str | bytes | mmap.mmap, eol: str = '\n', start: int = 0, end: int | None = None) \
+        -> array.array:
+    """
+    offset after the eol of each line, the last line ends at the end of the context.
+    the eol are found by scanning, rather than splitting the whole context into lines.
+    start, end: the lines of context[start:end] only, whose offsets are still the ones in the context
+    """
+    if not isinstance(context, str):
+        eol = eol.encode()
+    if end is None:
+        end = len(context)
+    line_ends = array.array('Q', (_.end() for _ in re.compile(re.escape(eol)).finditer(context, start, end)))
+    line_ends.append(end)
+    return line_ends
+
+
+binary_non_ascii_pat = re.compile(rb"[\x80-\xff]")
+
+
+def char_column(context: bytes | mmap.mmap, line_start: int, idx: int) -> int:
+    """ the column of the offset `idx` of a bytes context in characters, the line prefix is decoded if it is not ASCII """
+    prefix = context[line_start:idx]
+    return len(prefix) if prefix.isascii() else len(prefix.decode(errors="replace"))
+
+
+def char_columns(context: bytes | mmap.mmap, line_ends: array.array, tokens: 'list[Token] | TokenStore',
+                 start: int = 0):
+    """
+    turn the columns of the tokens of a bytes context from bytes into characters, as the ones of the decoded context,
+    only the lines with a non-ASCII byte are decoded, from one token to the next.
+    start: where the lines of `line_ends` start, see the span of `Lexer`
+    """
+    store = isinstance(tokens, TokenStore)
+    key = None if store else (lambda token: token.ldx)
+    ldxs = tokens.ldxs if store else tokens
+    _ = binary_non_ascii_pat.search(context, start, line_ends[-1])
+    while _ is not None:
+        ldx = bisect.bisect_right(line_ends, _.start())
+        line_start = line_ends[ldx - 1] if ldx != 0 else start
+        lo = bisect.bisect_left(ldxs, ldx, key=key)
+        idx, cdx = line_start, 0
+        for i in range(lo, bisect.bisect_right(ldxs, ldx, lo=lo, key=key)):
+            token_idx = line_start + (tokens.cdxs[i] if store else tokens[i].cdx)
+            cdx += len(context[idx:token_idx].decode(errors="replace"))
+            idx = token_idx
+            if store:
+                tokens.cdxs[i] = cdx
+            else:
+                tokens[i].cdx = cdx
+        _ = binary_non_ascii_pat.search(context, line_ends[ldx], line_ends[-1])
+
+
+class Trivia:
+    """
+    side table of the comments, which are kept out of the token stream,
+    each comment is attached to the token following it by the index of that token in the stream
+    """
+    def __init__(self, context: str | bytes | mmap.mmap, store: bool = False):
+        self.comments: list[Token] | TokenStore = TokenStore(context) if store else []
+        self.token_idxs: array.array = array.array('I')  # index of the following token, in comment order
+
+    def __len__(self) -> int:
+        return len(self.token_idxs)
+
+    def of(self, token_idx: int) -> 'list[Token] | list[TokenView]':
+        """ the comments right before the token at `token_idx` of the stream """
+        start = bisect.bisect_left(self.token_idxs, token_idx)
+        end = bisect.bisect_right(self.token_idxs, token_idx, lo=start)
+        return list(self.comments[start:end])
+
+
+comment_kinds: tuple[TokenKind, ...] = (TokenKind.LineComment, TokenKind.BlockComment)
+
 
 class Lexer:
-    def __init__(self, context: str, eol: str = '\n'):
+    def __init__(self, context: str | bytes | mmap.mmap, eol: str = '\n', engine: str = "master", store: bool = False,
+                 jobs: int = 1, trivia: bool = False, span: tuple[int, int] | None = None):
+        """
+        context:
+            either a str, or utf-8 bytes like a memory-mapped file (see `map_file`), which is lexed without being
+            decoded as a whole, only the tokens are decoded. the column of a token counts characters either way,
+            see `char_columns`
+        engine:
+            "master": match all the token patterns at once with the master pattern, default
+            "reference": try the token patterns one by one, kept for differential testing
+        store:
+            put the tokens into a compact TokenStore rather than a list of Token
+        jobs:
+            split the context at safe eol into chunks, and lex them with a pool of `jobs` processes,
+            a small context is still lexed in this process
+        trivia:
+            put the comments into the `Trivia` side table rather than the token stream
+        span:
+            (start, end), lex context[start:end] in place rather than a slice of it, start is at the beginning of a
+            line, e.g. a chunk of `tokenize_parallel`. the offsets of the tokens are the ones in the context, their
+            lines are counted from start, and EOF is put at end
+        """
+        assert span is None or engine == "master" and jobs == 1, "a span is lexed by the master engine in this process"
         self.eol: str = eol
-        self.context: str = context
-        self.context_len: int = len(context)
-        self.char_num: list[int] = self.get_char_num(context)  # char number per row
-        self.accumulated_char_num: list[int] = \
-            [sum(self.char_num[0:i + 1]) for i in range(len(self.char_num))]
-        self.idx: int = 0
-        self.tokens: list[Token] = []
+        self.context: str | bytes | mmap.mmap = context
+        self.start, self.context_len = (0, len(context)) if span is None else span
+        self.binary: bool = not isinstance(context, str)
+        self.accumulated_char_num: array.array = self.get_line_ends(context)  # also shared by SourceInfo
+        self.idx: int = self.start
+        self.engine: str = engine
+        self.jobs: int = jobs
+        self.tokens: list[Token] | TokenStore = TokenStore(context) if store else []
+        self.trivia: Trivia | None = Trivia(context, store) if trivia else None
         self.tokenize()
 
-    def get_char_num(self, context: str) -> list[int]:
-        lines = context.split(self.eol)
-        return [len(lines[ldx]) + 1 if ldx != len(lines)-1 else len(lines[ldx]) for ldx in range(len(lines))]
+    def add_token(self, kind: TokenKind, idx: int, src: str, ldx: int, cdx: int, length: int | None = None):
+        """ length: of the source in the context, when it is not `len(src)`, e.g. utf-8 bytes """
+        tokens = self.tokens
+        if self.trivia is not None and kind in comment_kinds:
+            self.trivia.token_idxs.append(len(self.tokens))
+            tokens = self.trivia.comments
+        if isinstance(tokens, TokenStore):
+            if length is None:
+                length = len(src) if kind != TokenKind.EOF else 0
+            tokens.append(kind, idx, length, ldx, cdx)
+        else:
+            tokens.append(Token(kind_=kind, ldx=ldx, cdx=cdx, val=src, src=src))
+
+    def get_line_ends(self, context: str | bytes | mmap.mmap) -> array.array:
+        return get_line_ends(context, self.eol, self.start, self.context_len)
 
     def get_rcdx_from_idx(self, idx: int) -> (int, int):
         rdx = bisect.bisect_right(self.accumulated_char_num, idx)
         if rdx != 0:
             cdx = idx - self.accumulated_char_num[rdx - 1]
         else:
-            cdx = idx
+            cdx = idx - self.start
         return rdx, cdx
 
     def tokenize(self):
+        if self.engine == "master" and self.jobs > 1:
+            self.tokenize_parallel()
+        elif self.engine == "master":
+            self.tokenize_master()
+        elif self.engine == "reference":
+            assert not self.binary, f"the reference lexer engine only lexes str"
+            self.tokenize_reference()
+        else:
+            assert 0, f"unknown lexer engine '{self.engine}', 'master' or 'reference' is expected"
+
+    def tokenize_master(self):
+        if self.binary:
+            pat, space_pat, nul = get_binary_master_pat(), binary_whitespace_pat, 0
+        else:
+            pat, space_pat, nul = get_master_pat(), whitespace_pat, '\0'
+        context = self.context
+        start, end = self.start, self.context_len
+        line_ends = self.accumulated_char_num
+        line_num = len(line_ends)
+        rdx = 0  # same as `get_rcdx_from_idx`, but advances together with idx rather than bisecting every time
         while True:
-            remains = self.context[self.idx:]
-            rdx, cdx = self.get_rcdx_from_idx(self.idx)
-            if not remains:
-                token = Token(kind="EOF", ldx=rdx, cdx=cdx, val="\0", src="\0")
-                # print(f"idx: {self.idx:<5}, {token}")
-                self.tokens.append(token)
+            self.idx = space_pat.match(context, self.idx, end).end()
+            while rdx < line_num and line_ends[rdx] <= self.idx:
+                rdx += 1
+            cdx = self.idx - line_ends[rdx - 1] if rdx != 0 else self.idx - start
+            if self.idx >= end:
+                self.add_token(kind=TokenKind.EOF, idx=self.idx, src="\0", ldx=rdx, cdx=cdx)
+                break
+            if context[self.idx] == nul:
+                break
+            _ = pat.match(context, self.idx, end)
+            if _ is None:
+                assert 0, f"invalid syntax, idx: {self.idx}, rdx: {rdx}, cdx: {cdx}, remains:\n"\
+                          f"{context[self.idx:end]}"
+            kind = kind_by_name[_.lastgroup]
+            src = _.group(0)
+            if self.binary:
+                src = src.decode()
+            if kind == TokenKind.Identifier and src in keyword_kinds:
+                kind = keyword_kinds[src]
+            self.add_token(kind=kind, idx=self.idx, src=src, ldx=rdx, cdx=cdx, length=_.end() - self.idx)
+            self.idx = _.end()
+        if self.binary:
+            char_columns(context, line_ends, self.tokens, start)
+            if self.trivia is not None:
+                char_columns(context, line_ends, self.trivia.comments, start)
+
+    def get_split_points(self, chunk_num: int) -> list[int]:
+        """
+        offsets to split the context into about `chunk_num` chunks, each is at the beginning of a line,
+        and the eol before it is not inside of a comment or a string literal.
+        the comments and string literals are found by a prescan, the same way the lexer matches them
+        """
+        context = self.context
+        eol = self.eol.encode() if self.binary else self.eol
+        spans = (binary_spanning_pat if self.binary else spanning_pat).finditer(context)
+        span = next(spans, None)
+        points = []
+        for cdx in range(1, chunk_num):
+            idx = max(self.context_len * cdx // chunk_num, points[-1] if points else 0)
+            while True:
+                eol_idx = context.find(eol, idx)
+                if eol_idx == -1:
+                    return points
+                while span is not None and span.end() <= eol_idx:
+                    span = next(spans, None)
+                if span is not None and span.start() <= eol_idx:
+                    idx = span.end()  # the eol is inside of the span
+                    continue
+                break
+            point = eol_idx + len(eol)
+            if point >= self.context_len:
+                break
+            if not points or point != points[-1]:
+                points.append(point)
+        return points
+
+    def tokenize_parallel(self):
+        min_chunk_len = 1 << 16
+        chunk_num = min(self.jobs, self.context_len // min_chunk_len)
+        nul = b"\0" if self.binary else "\0"
+        if chunk_num < 2 or self.context.find(nul) != -1:
+            # the lexer stops at '\0', which can not be told by a chunk
+            self.tokenize_master()
+            return
+        pool = context_pool(self.jobs, init_lex_worker, self.context)
+        if pool is None:
+            self.tokenize_master()
+            return
+        points = [0] + self.get_split_points(chunk_num) + [self.context_len]
+        chunk_num = len(points) - 1
+        store = TokenStore(self.context)
+        comments = TokenStore(self.context)
+        trivia = self.trivia is not None
+        with pool:
+            # the workers lex the context they share with this process in place, only the offsets of a chunk are sent
+            results = pool.map(lex_chunk, points[:-1], points[1:], [self.eol] * chunk_num, [trivia] * chunk_num)
+            for start, (columns, trivia_columns) in zip(points, results):
+                ldx, _ = self.get_rcdx_from_idx(start)  # a chunk starts at the beginning of a line
+                if trivia_columns is not None:
+                    token_idxs, comment_columns = trivia_columns
+                    self.trivia.token_idxs.extend(array.array('I', [idx + len(store) for idx in token_idxs]))
+                    extend_store(comments, comment_columns, 0, ldx)  # the offsets are the ones in the context
+                extend_store(store, columns, 0, ldx)
+        rdx, cdx = self.get_rcdx_from_idx(self.context_len)
+        store.append(TokenKind.EOF, self.context_len, 0, rdx, cdx)
+        if isinstance(self.tokens, TokenStore):
+            self.tokens = store
+        else:
+            self.tokens = [token.to_token() for token in store]
+        if trivia:
+            if isinstance(self.trivia.comments, TokenStore):
+                self.trivia.comments = comments
+            else:
+                self.trivia.comments = [token.to_token() for token in comments]
+        self.idx = self.context_len
+
+    def tokenize_reference(self):
+        context = self.context
+        while True:
+            if self.idx >= self.context_len:
+                rdx, cdx = self.get_rcdx_from_idx(self.idx)
+                self.add_token(kind=TokenKind.EOF, idx=self.idx, src="\0", ldx=rdx, cdx=cdx)
                 break
             matched = False
-            if remains[0] == ' ' or remains[0] == '\t' or remains[0] == '\n':
+            char = context[self.idx]
+            if char == ' ' or char == '\t' or char == '\n':
                 self.idx += 1
                 continue
-            if remains[0] == '\0':
+            if char == '\0':
                 break
-            for token_match in token_matches:
+            rdx, cdx = self.get_rcdx_from_idx(self.idx)
+            for token_match in get_offset_matches():
                 re_pat = token_match[1]
-                _ = re_pat.search(remains)
-                if _ is not None and _.start() == 0:
-                    token = Token(kind=token_match[0], ldx=rdx, cdx=cdx, val=_.group(0), src=_.group(0))
-                    # print(f"idx: {self.idx:<5}, {token}")
-                    self.tokens.append(token)
-                    self.idx += len(_.group(0))
+                _ = re_pat.match(context, self.idx)
+                if _ is not None:
+                    self.add_token(kind=kind_by_name[token_match[0]], idx=self.idx, src=_.group(0), ldx=rdx, cdx=cdx)
+                    self.idx = _.end()
                     matched = True
                     break
             if not matched:
                 assert 0, f"invalid syntax, idx: {self.idx}, rdx: {rdx}, cdx: {cdx}, remains:\n"\
-                          f"{remains}"
+                          f"{context[self.idx:]}"
+
+    @staticmethod
+    def iter_tokens(source: str | typing.TextIO, eol: str = '\n', chunk_size: int = 1 << 20) -> typing.Iterator[Token]:
+        """
+        yield the tokens lazily with the master pattern, the same tokens as `Lexer(context).tokens`,
+        `source` is either the context or a file object, which is read by `chunk_size` characters.
+        a token is not yielded until enough text behind it has been read, so that tokens spanning chunks
+        (identifiers, block comments, string literals ...) are matched as a whole
+        """
+        lookahead = 64  # no token but block comment / string literal depends on more text behind its end
+        pat = get_master_pat()
+        if isinstance(source, str):
+            buf, eof = source, True
+        else:
+            buf, eof = "", False
+        base = 0  # offset of buf[0] in the whole context
+        idx = 0  # offset in buf
+        counted = 0  # eol before buf[counted] have been counted into ldx
+        ldx = 0
+        line_start = 0  # offset of the current line in the whole context
+        while True:
+            idx = whitespace_pat.match(buf, idx).end()
+            if idx < len(buf) and buf[idx] == '\0':
+                return
+            _ = pat.match(buf, idx) if idx < len(buf) else None
+            if not eof and (_ is None or len(buf) - _.end() < lookahead or
+                            buf.startswith("/*", idx) and _.lastgroup != "BlockComment" or
+                            buf[idx] == '"' and _.lastgroup != "StringLiteral"):
+                chunk = source.read(chunk_size)
+                if not chunk:
+                    eof = True
+                    continue
+                if idx >= chunk_size:
+                    # drop the consumed text, count its eol first
+                    eol_num = buf.count(eol, counted, idx)
+                    if eol_num != 0:
+                        ldx += eol_num
+                        line_start = base + buf.rfind(eol, counted, idx) + len(eol)
+                    buf = buf[idx:]
+                    base += idx
+                    idx = 0
+                    counted = 0
+                buf += chunk
+                continue
+
+            eol_num = buf.count(eol, counted, idx)
+            if eol_num != 0:
+                ldx += eol_num
+                line_start = base + buf.rfind(eol, counted, idx) + len(eol)
+            counted = idx
+            if idx >= len(buf):
+                # same as `get_rcdx_from_idx`, EOF is always put at the beginning of the line after the last line
+                yield Token(kind_=TokenKind.EOF, ldx=ldx + 1, cdx=0, val="\0", src="\0")
+                return
+            if _ is None:
+                assert 0, f"invalid syntax, idx: {base + idx}, rdx: {ldx}, cdx: {base + idx - line_start}, remains:\n"\
+                          f"{buf[idx:]}"
+            kind = kind_by_name[_.lastgroup]
+            src = _.group(0)
+            if kind == TokenKind.Identifier and src in keyword_kinds:
+                kind = keyword_kinds[src]
+            yield Token(kind_=kind, ldx=ldx, cdx=base + idx - line_start, val=src, src=src)
+            idx = _.end()
+
+
+def scan_module_headers(context: str | bytes | mmap.mmap, declarations: bool = True) -> list[tuple[int, int]]:
+    """
+    spans of the text a module prototype needs, without lexing the module bodies:
+        'module ... ;', the header
+        'input/output/inout/parameter ... ;' in the body, only if `declarations`, for Non-ANSI ports
+        'endmodule'
+    the body is skipped by a regex scan for these words, which also steps over comments and string literals.
+    like the parser, text between '`ifdef/`ifndef/`celldefine' and the matching '`endif/`endcelldefine' is ignored,
+    so are the declarations inside of function and task
+    """
+    binary = not isinstance(context, str)
+    scan_pat = binary_header_scan_pat if binary else header_scan_pat
+    end_pat = binary_statement_end_pat if binary else statement_end_pat
+    semicolon = b";" if binary else ";"
+
+    def statement_end(idx: int) -> int:
+        while True:
+            _ = end_pat.search(context, idx)
+            if _ is None:
+                return len(context)
+            if _.group(0) == semicolon:
+                return _.end()
+            idx = _.end()
+
+    spans = []
+    directive_depth = 0
+    routine_depth = 0
+    in_module = False
+    idx = 0
+    while True:
+        _ = scan_pat.search(context, idx)
+        if _ is None:
+            break
+        idx = _.end()
+        if _.lastgroup == "Directive":
+            if _.group("Directive") in (b"endif", b"endcelldefine", "endif", "endcelldefine"):
+                directive_depth -= 1
+            else:
+                directive_depth += 1
+            continue
+        if _.lastgroup != "Keyword" or directive_depth != 0:
+            continue
+        word = _.group("Keyword")
+        if binary:
+            word = word.decode()
+        if word == "module" and not in_module:
+            idx = statement_end(idx)
+            spans.append((_.start(), idx))
+            in_module = True
+        elif word == "endmodule" and in_module:
+            spans.append((_.start(), idx))
+            in_module = False
+        elif word == "function" or word == "task":
+            routine_depth += 1
+        elif word == "endfunction" or word == "endtask":
+            routine_depth -= 1
+        elif word in ("input", "output", "inout", "parameter") and in_module and routine_depth == 0 and declarations:
+            idx = statement_end(idx)
+            spans.append((_.start(), idx))
+    return spans
+
+
+def lex_spans(context: str | bytes | mmap.mmap, spans: list[tuple[int, int]], line_ends: array.array,
+              eol: str = '\n', store: bool = False) -> list[Token] | TokenStore:
+    """
+    lex only the spans of the context, the tokens are positioned in the whole context, and end with one EOF.
+    the comments are dropped, line_ends: see `get_line_ends`
+    """
+    binary = not isinstance(context, str)
+    tokens = TokenStore(context) if store else []
+    for start, end in spans:
+        ldx = bisect.bisect_right(line_ends, start)
+        line_start = line_ends[ldx - 1] if ldx != 0 else 0
+        cdx = char_column(context, line_start, start) if binary else start - line_start
+        sub_tokens = Lexer(context[start:end], eol, store=store, trivia=True).tokens
+        end = len(sub_tokens) - 1  # without the EOF of the span
+        if store:
+            kinds, starts, lengths, ldxs, cdxs = store_columns(sub_tokens, end)
+            cdxs = array.array('I', [c + cdx if l == 0 else c for l, c in zip(ldxs, cdxs)])
+            extend_store(tokens, (kinds, starts, lengths, ldxs, cdxs), start, ldx)
+        else:
+            for token in sub_tokens[:end]:
+                if token.ldx == 0:
+                    token.cdx += cdx
+                token.ldx += ldx
+                tokens.append(token)
+    ldx = len(line_ends)  # same as `Lexer.get_rcdx_from_idx`, at the beginning of the line after the last line
+    cdx = len(context) - line_ends[ldx - 1]
+    if store:
+        tokens.append(TokenKind.EOF, len(context), 0, ldx, cdx)
+    else:
+        tokens.append(Token(kind_=TokenKind.EOF, ldx=ldx, cdx=cdx, val="\0", src="\0"))
+    return tokens
+
+
+def lex_from(context: str, idx: int, line_ends: array.array) -> typing.Iterator[tuple[Token, int]]:
+    """
+    the tokens of the context from the offset `idx`, which is the start of a token, with their offsets.
+    the comments are included, and the last token is EOF. the tokens are lexed only when they are pulled,
+    so the caller can stop as soon as it has enough, e.g. to relex an edited region, line_ends: see `get_line_ends`
+    """
+    pat = get_master_pat()
+    context_len = len(context)
+    line_num = len(line_ends)
+    rdx = bisect.bisect_right(line_ends, idx)
+    while True:
+        idx = whitespace_pat.match(context, idx).end()
+        while rdx < line_num and line_ends[rdx] <= idx:
+            rdx += 1
+        cdx = idx - line_ends[rdx - 1] if rdx != 0 else idx
+        if idx >= context_len:
+            yield Token(kind_=TokenKind.EOF, ldx=rdx, cdx=cdx, val="\0", src="\0"), idx
+            return
+        if context[idx] == '\0':
+            return
+        _ = pat.match(context, idx)
+        if _ is None:
+            assert 0, f"invalid syntax, idx: {idx}, rdx: {rdx}, cdx: {cdx}, remains:\n"\
+                      f"{context[idx:]}"
+        kind = kind_by_name[_.lastgroup]
+        src = _.group(0)
+        if kind == TokenKind.Identifier and src in keyword_kinds:
+            kind = keyword_kinds[src]
+        yield Token(kind_=kind, ldx=rdx, cdx=cdx, val=src, src=src), idx
+        idx = _.end()
+
+
+def store_columns(store: TokenStore, end: int) -> tuple[array.array, ...]:
+    return store.kinds[:end], store.starts[:end], store.lengths[:end], store.ldxs[:end], store.cdxs[:end]
+
+
+def extend_store(store: TokenStore, columns: tuple[array.array, ...], start: int, ldx: int):
+    """ append the columns of a chunk starting at offset `start` and line `ldx` of the context """
+    kinds, starts, lengths, ldxs, cdxs = columns
+    store.kinds.extend(kinds)
+    store.starts.extend(array.array('Q', [idx + start for idx in starts]))
+    store.lengths.extend(lengths)
+    store.ldxs.extend(array.array('I', [idx + ldx for idx in ldxs]))
+    store.cdxs.extend(cdxs)
+
+
+def context_pool(jobs: int, initializer: typing.Callable, context: str | bytes | mmap.mmap, *initargs) \
+        -> concurrent.futures.ProcessPoolExecutor | None:
+    """
+    a pool of `jobs` processes sharing the context with this process, `initializer(context, *initargs)` is run in
+    each of them. they are forked, so they inherit the context rather than receiving a copy of it, a memory-mapped file
+    as the same pages. where a process can not be forked, a str or bytes context is sent once to each of them,
+    and None is returned for a memory-mapped file, which can not be sent
+    """
+    try:
+        mp_context = multiprocessing.get_context("fork")
+    except ValueError:
+        if isinstance(context, mmap.mmap):
+            return None
+        mp_context = None
+    return concurrent.futures.ProcessPoolExecutor(max_workers=jobs, mp_context=mp_context, initializer=initializer,
+                                                  initargs=(context, *initargs))
+
+
+lex_worker_context: str | bytes | mmap.mmap | None = None  # the context of a worker process of `tokenize_parallel`
+
+
+def init_lex_worker(context: str | bytes | mmap.mmap):
+    global lex_worker_context
+    lex_worker_context = context
+
+
+def lex_chunk(start: int, end: int, eol: str, trivia: bool = False) \
+        -> tuple[tuple[array.array, ...], tuple[array.array, tuple[array.array, ...]] | None]:
+    """
+    lex context[start:end] in place in a worker process of `Lexer.tokenize_parallel`, the columns of the TokenStore
+    are sent back, without the EOF of the chunk, together with the token indexes and columns of the trivia, if it is
+    asked
+    """
+    lexer = Lexer(lex_worker_context, eol, store=True, trivia=trivia, span=(start, end))
+    store = lexer.tokens
+    if lexer.trivia is None:
+        return store_columns(store, len(store) - 1), None
+    comments = lexer.trivia.comments
+    return store_columns(store, len(store) - 1), (lexer.trivia.token_idxs, store_columns(comments, len(comments)))
 
 
 if __name__ == "__main__":
@@ -706,3 +1447,9 @@ if __name__ == "__main__":
         context = f.read()
 
     lexer = Lexer(context=context)
+    reference = Lexer(context=context, engine="reference")
+    assert lexer.tokens == reference.tokens
+    store = Lexer(context=context, store=True)
+    assert lexer.tokens == [token.to_token() for token in store.tokens]
+    trivia = Lexer(context=context, trivia=True)
+    assert [token for token in lexer.tokens if token.kind_ not in comment_kinds] == trivia.tokens
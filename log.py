@@ -1,13 +1,19 @@
-from typing import List
+from typing import Callable, List, Optional, Tuple
 
+import contextlib
 import inspect
 import re
+import threading
 import traceback as tb
 
 
 __all__ = ['Logger', 'log']
 
 
+def print_plain(string: str):
+    print(string, end='')
+
+
 def print_green(string: str):
     print(f"\033[1;32m{string}\033[0m", end='')
 
@@ -37,34 +43,58 @@ class Logger:
     def __init__(self, name: str):
         self.name = name
         self.msgs: List[str] = []
+        self.local = threading.local()  # the messages collected by `collect`, for each thread
+
+    def emit(self, printer: Callable[[str], None], msg: str, kept: Optional[str] = None):
+        """ print the message and keep it in msgs, the kept one if it is not printed as it is kept """
+        collected = getattr(self.local, "collected", None)
+        if collected is not None:
+            collected.append((printer, msg, kept))
+            return
+        printer(msg)
+        self.msgs.append(msg if kept is None else kept)
+
+    @contextlib.contextmanager
+    def collect(self):
+        """
+        the messages logged by this thread within are collected into the list it yields rather than printed and kept,
+        `report` them later if they are to be, e.g. the messages of a parse which is dropped if it fails.
+        the messages of the other threads are logged as usual
+        """
+        previous = getattr(self.local, "collected", None)
+        self.local.collected = collected = []
+        try:
+            yield collected
+        finally:
+            self.local.collected = previous
+
+    def report(self, collected: List[Tuple[Callable[[str], None], str, Optional[str]]]):
+        """ log the messages collected by `collect` """
+        for printer, msg, kept in collected:
+            self.emit(printer, msg, kept)
 
     def verbose_info(self, msg: str):
         if not self.disable_verbose_info:
             msg = re.sub(_nl, f"\n{' ' * (len(self.name) + 3)}", msg)
-            print(f"[{self.name}] {msg}", end='')
-            self.msgs.append(f"[{self.name}] {msg}")
+            self.emit(print_plain, f"[{self.name}] {msg}")
 
     def info(self, msg: str):
         if not self.disable_info:
             msg = re.sub(_nl, f"\n{' ' * (len(self.name) + 3)}", msg)
-            print(f"[{self.name}] {msg}", end='')
-            self.msgs.append(f"[{self.name}] {msg}")
+            self.emit(print_plain, f"[{self.name}] {msg}")
 
     def hint(self, msg: str):
         if not self.disable_hint:
             msg = re.sub(_nl, f"\n{' ' * (len(self.name) + 3)}", msg)
-            print_green(f"[{self.name}] hint! {msg}")
-            self.msgs.append(f"[{self.name}] hint! {msg}")
+            self.emit(print_green, f"[{self.name}] hint! {msg}")
 
     def warning_begin(self):
         if not self.disable_warning:
-            print_blue(f"====================\n")
-            self.msgs.append(f"====================\n")
+            self.emit(print_blue, f"====================\n")
 
     def warning_end(self):
         if not self.disable_warning:
-            print_blue(f"^^^^^^^^^^^^^^^^^^^^\n")
-            self.msgs.append(f"^^^^^^^^^^^^^^^^^^^^\n")
+            self.emit(print_blue, f"^^^^^^^^^^^^^^^^^^^^\n")
 
     def warning(self, msg: str, begin: bool = False, end: bool = False):
         msg += f"reported by {get_caller_location_str(0)}\n"
@@ -72,48 +102,41 @@ class Logger:
             if begin:
                 self.warning_begin()
             msg = re.sub(_nl, f"\n{' ' * (len(self.name) + 3)}", msg)
-            print_blue(f"[{self.name}] warning! {msg}")
-            self.msgs.append(f"[{self.name}] warning! {msg}")
+            self.emit(print_blue, f"[{self.name}] warning! {msg}")
             if self.traceback:
                 tb.print_stack()
             if end:
                 self.warning_end()
 
     def error_begin(self):
-        print_red(f"====================\n")
-        self.msgs.append(f"====================\n")
+        self.emit(print_red, f"====================\n")
 
     def error_end(self):
-        print_red(f"^^^^^^^^^^^^^^^^^^^^\n")
-        self.msgs.append(f"^^^^^^^^^^^^^^^^^^^^\n")
+        self.emit(print_red, f"^^^^^^^^^^^^^^^^^^^^\n")
 
     def error(self, msg: str, begin=False, end=False):
         msg += f"reported by {get_caller_location_str(0)}\n"
         if begin:
             self.error_begin()
         msg = re.sub(_nl, f"\n{' ' * (len(self.name) + 3)}", msg)
-        self.msgs.append(f"[{self.name}] error! {msg}")
-        print_red(f"[{self.name}] error! {msg}")
+        self.emit(print_red, f"[{self.name}] error! {msg}")
         if self.traceback:
             tb.print_stack()
         if end:
             self.error_end()
 
     def fatal_begin(self):
-        print_orange(f"====================\n")
-        self.msgs.append(f"====================\n")
+        self.emit(print_orange, f"====================\n")
 
     def fatal_end(self):
-        print_orange(f"^^^^^^^^^^^^^^^^^^^^\n")
-        self.msgs.append(f"^^^^^^^^^^^^^^^^^^^^\n")
+        self.emit(print_orange, f"^^^^^^^^^^^^^^^^^^^^\n")
 
     def fatal(self, msg: str, exceptionType = None, begin = False, end = False):
         msg += f"reported by {get_caller_location_str(0)}\n"
         if begin:
             self.fatal_begin()
         msg = re.sub(_nl, f"\n{' ' * (len(self.name) + 3)}", msg)
-        print_orange(f"[{self.name}] fatal! {msg}")
-        self.msgs.append(f"[{self.name}] fatal! {msg}")
+        self.emit(print_orange, f"[{self.name}] fatal! {msg}")
         if end:
             self.fatal_end()
         if exceptionType is not None:
@@ -122,46 +145,37 @@ class Logger:
     def indented_info(self, indent: int, msg: str):
         if not self.disable_info:
             msg = re.sub(_nl, f"\n{' ' * (len(self.name) + 3)}", msg)
-            print(f"{' ' * indent}{msg}")
-            self.msgs.append(f"{' ' * indent}{msg}")
+            self.emit(print_plain, f"{' ' * indent}{msg}\n", f"{' ' * indent}{msg}")
 
     def list_info(self, title: str, contents: List[str]):
         if not self.disable_info:
             if contents:
                 title = f"[{self.name}] {title}:"
-                print(f"{title}")
-                self.msgs.append(f"{title}\n")
+                self.emit(print_plain, f"{title}\n")
                 for i in range(0, len(contents)):
-                    print(f"            {contents[i]}")
-                    self.msgs.append(f"            {contents[i]}\n")
+                    self.emit(print_plain, f"            {contents[i]}\n")
 
     def list_warning(self, title: str, contents: List[str]):
         if not self.disable_warning:
             if contents:
                 title = f"[{self.name}] warning! {title}:\n"
-                print_blue(f"{title}")
-                self.msgs.append(f"{title}\n")
+                self.emit(print_blue, f"{title}", f"{title}\n")
                 for i in range(0, len(contents)):
-                    print_blue(f"            {contents[i]}")
-                    self.msgs.append(f"            {contents[i]}\n")
+                    self.emit(print_blue, f"            {contents[i]}", f"            {contents[i]}\n")
 
     def list_error(self, title: str, contents: List[str]):
         if contents:
             title = f"[{self.name}] error! {title}:\n"
-            print_red(f"{title}")
-            self.msgs.append(f"{title}\n")
+            self.emit(print_red, f"{title}", f"{title}\n")
             for i in range(0, len(contents)):
-                print_red(f"            {contents[i]}")
-                self.msgs.append(f"            {contents[i]}\n")
+                self.emit(print_red, f"            {contents[i]}", f"            {contents[i]}\n")
 
     def list_fatal(self, title: str, contents: List[str]):
         if contents:
             title = f"[{self.name}] {title}:\n"
-            print_orange(f"{title}")
-            self.msgs.append(f"{title}\n")
+            self.emit(print_orange, f"{title}", f"{title}\n")
             for i in range(0, len(contents)):
-                print_orange(f"            {contents[i]}")
-                self.msgs.append(f"            {contents[i]}\n")
+                self.emit(print_orange, f"            {contents[i]}", f"            {contents[i]}\n")
 
 
 def find_caller_frameinfo(frame, depth: int):
@@ -1,9 +1,15 @@
+import array
+import functools
+import mmap
 import re
+import typing
 from typing import TYPE_CHECKING
 
-from lexer import Lexer, Token, TokenKind
+from lexer import Lexer, Token, TokenKind, TokenSpan, TokenStore, Trivia, context_pool, get_line_ends, lex_spans, map_file, scan_module_headers
+from cache import DiskCache
 from log import log
 from syntax.node import *
+from syntax.serialize import SerializeError, dump_nodes, load_nodes, token_columns, tokens_from_columns
 
 from syntax.expression import *
 
@@ -16,13 +22,47 @@ class ExpectedTokenNotFound(ParserError):
     pass
 
 
+class SourceLines:
+    """
+    lines of the context, a line is sliced (and decoded, if the context is bytes) only when it is indexed,
+    so the context is never split into a list of lines
+    """
+    def __init__(self, context: str | bytes | mmap.mmap, line_ends: typing.Sequence[int], eol: str = '\n'):
+        self.context: str | bytes | mmap.mmap = context
+        self.line_ends: typing.Sequence[int] = line_ends  # offset after the eol of each line, see Lexer
+        self.binary: bool = not isinstance(context, str)
+        self.eol: str | bytes = eol.encode() if self.binary else eol
+
+    def __len__(self) -> int:
+        return len(self.line_ends)
+
+    def offset(self, ldx: int, cdx: int) -> int:
+        """ offset in the context of the position, cdx counts characters, a non-ASCII line of bytes is decoded """
+        start = self.line_ends[ldx - 1] if ldx != 0 else 0
+        if self.binary and ldx < len(self.line_ends):
+            line = self.context[start:self.line_ends[ldx]]
+            if not line.isascii():
+                return start + len(line.decode(errors="replace")[:cdx].encode())
+        return start + cdx
+
+    def __getitem__(self, ldx: int) -> str:
+        start = self.line_ends[ldx - 1] if ldx != 0 else 0
+        line = self.context[start:self.line_ends[ldx]]
+        if line.endswith(self.eol):
+            line = line[:-len(self.eol)]
+        return line.decode(errors="replace") if self.binary else line
+
+
 class SourceInfo:
-    def __init__(self, lines: list[str], path: str):
-        self.lines: list[str] = lines
+    def __init__(self, lines: list[str] | SourceLines, path: str):
+        self.lines: list[str] | SourceLines = lines
         self.path: str = path
 
     def error_context(self, ldx: int, cdx: int):
         msg = [f"line: {ldx+1}, column: {cdx+1}, file: {self.path}\n"]
+        if ldx >= len(self.lines):
+            # the lines are not kept, e.g. the context is streamed
+            return "".join(msg)
         if ldx > 1:
             msg.append(f"    {self.lines[ldx-2]}\n")
         if ldx > 0:
@@ -36,16 +76,96 @@ class SourceInfo:
         return "".join(msg)
 
 
+# the groups of the matching table, an opener is matched with a closer of the same group
+pair_groups: list[tuple[list[TokenKind], list[TokenKind]]] = [
+    ([TokenKind.LParen], [TokenKind.RParen]),
+    ([TokenKind.LBracket], [TokenKind.RBracket]),
+    ([TokenKind.LBrace, TokenKind.SingleQuoteLBrace], [TokenKind.RBrace]),
+    ([TokenKind.Begin], [TokenKind.End]),
+    ([TokenKind.Generate], [TokenKind.EndGenerate]),
+    ([TokenKind.Case], [TokenKind.EndCase]),
+    ([TokenKind.Module], [TokenKind.EndModule]),
+]
+module_group: int = 6  # modules do not nest, an 'endmodule' closes every pending 'module', as `consume_until` does
+pair_openers: set[TokenKind] = set()
+pair_roles: dict[int, int] = {}  # TokenKind value -> group for an opener, ~group for a closer
+for group, (openers, closers) in enumerate(pair_groups):
+    pair_openers.update(openers)
+    pair_roles.update((kind.value, group) for kind in openers)
+    pair_roles.update((kind.value, ~group) for kind in closers)
+
+
+def token_kinds(tokens: list[Token] | TokenStore) -> typing.Sequence[int]:
+    """ the TokenKind values of the tokens """
+    return tokens.kinds if isinstance(tokens, TokenStore) else [token.kind_.value for token in tokens]
+
+
+def match_pairs(tokens: list[Token] | TokenStore) -> array.array:
+    """
+    the matching table, built in one pass: the index of the partner of each bracket / block keyword of `pair_groups`,
+    -1 for an unbalanced one and for the other tokens
+    """
+    kinds = token_kinds(tokens)
+    partners = array.array('i', [-1]) * len(kinds)
+    stacks: list[list[int]] = [[] for _ in pair_groups]
+    for idx, kind in enumerate(kinds):
+        group = pair_roles.get(kind)
+        if group is None:
+            continue
+        if group >= 0:
+            stacks[group].append(idx)
+            continue
+        stack = stacks[~group]
+        if not stack:
+            continue
+        if ~group == module_group:
+            for opener_idx in stack:
+                partners[opener_idx] = idx
+            partners[idx] = stack[0]
+            stack.clear()
+        else:
+            opener_idx = stack.pop()
+            partners[opener_idx] = idx
+            partners[idx] = opener_idx
+    return partners
+
+
 class Context:
-    def __init__(self, tokens: list[Token], delete_eof: bool = False, src_info: SourceInfo | None = None):
+    def __init__(self, tokens: list[Token] | TokenStore, delete_eof: bool = False, src_info: SourceInfo | None = None,
+                 lo: int = 0, hi: int | None = None, partners: array.array | None = None):
+        """
+        a view of tokens[lo:hi], the tokens are shared with the sub-contexts (see `sub`) rather than copied,
+        token_idx is an index of `tokens`, not an offset from `lo`
+        partners:
+            the matching table of `tokens` (see `match_pairs`), built if not given, it is shared with the sub-contexts
+        """
         if delete_eof:
-            tokens = list(filter(lambda x: x.kind_ != TokenKind.EOF, tokens))
-        self.tokens: list[Token] = tokens
-        self.token_idx: int = 0
+            if isinstance(tokens, TokenStore):
+                tokens = tokens.without_kinds([TokenKind.EOF])
+            else:
+                tokens = list(filter(lambda x: x.kind_ != TokenKind.EOF, tokens))
+        self.tokens: list[Token] | TokenStore = tokens
+        self.lo: int = lo
+        self.hi: int = len(tokens) if hi is None else hi
+        self.token_idx: int = lo
         self.src_info: SourceInfo | None = src_info
+        self.partners: array.array = match_pairs(tokens) if partners is None else partners
+
+    def sub(self, lo: int, hi: int | None = None) -> 'Context':
+        """ a sub-context of tokens[lo:hi], in O(1) """
+        return Context(self.tokens, src_info=self.src_info, lo=lo, hi=self.hi if hi is None else hi,
+                       partners=self.partners)
+
+    def span(self, lo: int, hi: int) -> TokenSpan:
+        """ tokens[lo:hi] as the tokens of a node, shared rather than copied """
+        return TokenSpan(self.tokens, lo, hi)
+
+    def span_tokens(self) -> TokenSpan:
+        """ the tokens of the view, e.g. for the node parsed from the whole view """
+        return TokenSpan(self.tokens, self.lo, self.hi)
 
     def current(self) -> Token | None:
-        if self.token_idx >= len(self.tokens):
+        if self.token_idx >= self.hi:
             return None
         return self.tokens[self.token_idx]
 
@@ -57,7 +177,7 @@ class Context:
         return current
 
     def peek(self) -> Token | None:
-        if self.token_idx+1 >= len(self.tokens):
+        if self.token_idx+1 >= self.hi:
             return None
         return self.tokens[self.token_idx+1]
 
@@ -69,7 +189,7 @@ class Context:
         return peek
 
     def last(self) -> Token | None:
-        if self.token_idx == 0:
+        if self.token_idx <= self.lo:
             return None
         return self.tokens[self.token_idx-1]
 
@@ -99,10 +219,28 @@ class Context:
             else:
                 self.consume()
 
+    def partner(self, idx: int) -> int | None:
+        """ the index of the token matching tokens[idx] inside the view, see `match_pairs` """
+        partner = self.partners[idx]
+        if partner < self.lo or partner >= self.hi:
+            return None
+        return partner
+
     def consume_until_matching_pair(self, left: TokenKind | list[TokenKind], right: TokenKind | list[TokenKind],
                                     error_info: str, just_try: bool = False):
-        depth = 0
         assert self.current().kind_ == left
+        if isinstance(left, TokenKind) and left in pair_openers:
+            # looked up in the matching table rather than scanned
+            partner = self.partner(self.token_idx)
+            if partner is not None:
+                self.token_idx = partner
+                return True
+            self.token_idx = self.hi
+            if just_try:
+                return False
+            log.fatal(error_info)
+            raise ExpectedTokenNotFound
+        depth = 0
         while True:
             token = self.current()
             if token is None or token.kind_ == TokenKind.EOF:
@@ -130,6 +268,7 @@ class Context:
 
         depth = 0
         assert self.current().kind_ == left
+        matched = left in pair_openers
         while True:
             token = self.current()
             if token is None or token.kind_ == TokenKind.EOF:
@@ -138,6 +277,11 @@ class Context:
                 log.fatal(error_info)
                 raise ExpectedTokenNotFound
             elif token.kind_ == left:
+                if matched and depth >= expected_depth:
+                    # nothing inside is at the expected depth, jump to its partner
+                    partner = self.partner(self.token_idx)
+                    self.token_idx = self.hi if partner is None else partner + 1
+                    continue
                 depth += 1
             elif token.kind_ == right:
                 depth -= 1
@@ -152,52 +296,212 @@ class Context:
 
 
 class Parser:
-    def __init__(self, context: str, eol: str = '\n', delete_eof: bool = False, path: str = "",
-                 parse_body: bool = True):
-        tokens = Lexer(context, eol).tokens
-        tokens = list(filter(lambda x: x.kind_ != TokenKind.LineComment and x.kind_ != TokenKind.BlockComment, tokens))
-        lines = context.split(eol)
-        src_info = SourceInfo(lines, path)
-        self.ctx = Context(src_info=src_info, tokens=tokens, delete_eof=delete_eof)
+    def __init__(self, context: str | bytes | mmap.mmap | typing.TextIO, eol: str = '\n', delete_eof: bool = False,
+                 path: str = "", parse_body: bool = True, token_store: bool = False, stream: bool = False,
+                 header_only: bool = False, lazy_body: bool = False, jobs: int = 1):
+        """
+        context:
+            a str, or utf-8 bytes like a memory-mapped file (see `map_file`), the bytes are lexed in place.
+            either way, the lines for the error context are sliced from the context on demand
+        token_store:
+            keep the tokens in a compact TokenStore, the parser works on light-weight TokenView then
+        stream:
+            `context` can also be a file object, tokens are pulled from `Lexer.iter_tokens` one top-level item at a
+            time rather than lexing the whole context first, `token_store` is ignored.
+            the source lines are not kept, so the error context only tells the position, and the comments are
+            dropped rather than kept in `trivia`
+        header_only:
+            lex only the module headers, and the port / parameter declarations in the module bodies if `parse_body`,
+            the rest of the bodies are skipped by `scan_module_headers`. the other top-level items and the comments
+            are dropped, it is enough for the module prototypes
+        lazy_body:
+            if `parse_body`, the body of a module is parsed on the first access of its body_items (see LazyModuleNode)
+            rather than with the module, it is much faster if the bodies of a few modules out of many are needed
+        jobs:
+            lex the context (see `Lexer`) and parse the modules (see `parse_parallel`) with a pool of `jobs` processes,
+            it is ignored if `stream`
+        """
         self.parse_body = parse_body
+        self.lazy_body = lazy_body
+        self.jobs = jobs
+        self.eol = eol
+        self.module_index: dict[str, tuple[int, int]] | None = None
+        self.delete_eof = delete_eof
+        self.tokens_iter: typing.Iterator[Token] | None = None
+        self.trivia: Trivia | None = None  # the comments, attached to the token index of `ctx` before parsing
+        if stream:
+            self.tokens_iter = Lexer.iter_tokens(context, eol)
+            self.ctx = Context(src_info=SourceInfo([], path), tokens=[])
+        elif header_only:
+            line_ends = get_line_ends(context, eol)
+            tokens = lex_spans(context, scan_module_headers(context, declarations=parse_body), line_ends, eol,
+                               store=token_store)
+            src_info = SourceInfo(SourceLines(context, line_ends, eol), path)
+            self.ctx = Context(src_info=src_info, tokens=tokens, delete_eof=delete_eof)
+        else:
+            # the comments are kept aside in the trivia table, the token stream is used as it is
+            lexer = Lexer(context, eol, store=token_store, jobs=jobs, trivia=True)
+            self.trivia = lexer.trivia
+            src_info = SourceInfo(SourceLines(context, lexer.accumulated_char_num, eol), path)
+            self.ctx = Context(src_info=src_info, tokens=lexer.tokens, delete_eof=delete_eof)
 
     def error_context(self, ldx: int, cdx: int):
         return self.ctx.src_info.error_context(ldx, cdx)
 
     def parse(self) -> list[SyntaxNode]:
-        nodes = []
+        if self.jobs > 1 and self.tokens_iter is None:
+            return self.parse_parallel()
+        return list(self.iter_parse())
+
+    def parse_parallel(self) -> list[SyntaxNode]:
+        """
+        the modules are found by the matching table and parsed in a pool of `jobs` processes,
+        the other top-level items are parsed in this process. the nodes are the same as the ones of `iter_parse`,
+        but the tokens of the module nodes are Token even if `token_store`, and the bodies parsed by the pool are
+        not lazy
+        """
+        ctx = self.ctx
+        nodes: list[SyntaxNode | None] = []
+        module_ranges: list[tuple[int, int]] = []
         while True:
-            token = self.ctx.current()
+            token = ctx.current()
             if token is None or token.kind_ == TokenKind.EOF:
                 break
-            elif token.kind_ == TokenKind.Directive:
-                node = self.parse_pre_compile_directive_locally(ctx=self.ctx)
             elif token.kind_ == TokenKind.Module:
-                node = self.parse_module_locally(ctx=self.ctx)
+                module_ranges.append(self.consume_module_locally(ctx=ctx))
+                nodes.append(None)  # filled by the pool, in order
             else:
-                log.fatal(f"token `{token.src}` is not supported yet:\n"
-                          f"{self.ctx.src_info.error_context(token.ldx, token.cdx)}\n")
-                raise ParserError
-            nodes.append(node)
-        return nodes
+                nodes.append(self.parse_top_level_item_locally(ctx=ctx))
+        lines = ctx.src_info.lines
+        pool = None
+        if len(module_ranges) >= 2:
+            pool = context_pool(self.jobs, init_parse_worker, lines.context, lines.line_ends, self.eol,
+                                ctx.src_info.path, self.parse_body)
+        if pool is None:
+            modules = [self.parse_module_detail(sub_ctx=ctx.sub(start_idx, end_idx+1))
+                       for start_idx, end_idx in module_ranges]
+        else:
+            batches = split_module_ranges(module_ranges, self.jobs * 4)
+            columns_list = []
+            ranges_list = []
+            for batch in batches:
+                lo = batch[0][0]
+                columns_list.append(token_columns(ctx.tokens[lo:batch[-1][1]+1]))
+                ranges_list.append([(start_idx - lo, end_idx - lo) for start_idx, end_idx in batch])
+            modules = []
+            with pool:
+                for batch, data in zip(batches, pool.map(parse_modules_in_worker, columns_list, ranges_list)):
+                    if data is None:  # not sent back, see `parse_modules_in_worker`, the batch is parsed here
+                        modules.extend(self.parse_module_detail(sub_ctx=ctx.sub(start_idx, end_idx+1))
+                                       for start_idx, end_idx in batch)
+                    else:
+                        modules.extend(load_nodes(data))
+        modules_iter = iter(modules)
+        return [next(modules_iter) if node is None else node for node in nodes]
+
+    def iter_parse(self) -> typing.Iterator[SyntaxNode]:
+        if self.tokens_iter is None:
+            yield from self.parse_top_level_items_locally(ctx=self.ctx)
+            return
+        for tokens in self.iter_top_level_tokens():
+            self.ctx = Context(src_info=self.ctx.src_info, tokens=tokens)
+            yield from self.parse_top_level_items_locally(ctx=self.ctx)
+
+    def index_modules(self) -> dict[str, tuple[int, int]]:
+        """
+        the module boundary index, module name -> token range of `ctx`, from 'module' to 'endmodule' both included.
+        the modules are found by the matching table, nothing is parsed.
+        a module not closed is left out, it is reported when it is parsed. it is empty if `stream`
+        """
+        if self.module_index is None:
+            self.module_index = {}
+            tokens = self.ctx.tokens
+            kinds = token_kinds(tokens)
+            module = TokenKind.Module.value
+            idx = 0
+            while True:
+                try:
+                    idx = kinds.index(module, idx)
+                except ValueError:
+                    break
+                end_idx = self.ctx.partners[idx]
+                if end_idx < 0:
+                    break
+                if idx + 1 < end_idx and tokens[idx + 1].kind_ == TokenKind.Identifier:
+                    self.module_index[tokens[idx + 1].val] = (idx, end_idx)
+                idx = end_idx + 1
+        return self.module_index
+
+    def parse_module(self, name: str) -> ModuleNode:
+        """ parse the module `name` only, see `index_modules` """
+        index = self.index_modules()
+        if name not in index:
+            log.fatal(f"module '{name}' is not found in {self.ctx.src_info.path or 'the context'}\n")
+            raise ParserError
+        start_idx, end_idx = index[name]
+        return self.parse_module_locally(ctx=self.ctx.sub(start_idx, end_idx + 1))
+
+    def iter_top_level_tokens(self) -> typing.Iterator[list[Token]]:
+        """
+        group the streamed tokens, each group ends with an 'endmodule' which is not inside
+        '`ifdef' / '`ifndef' / '`celldefine' / '`begin_keyword' blocks
+        """
+        tokens = []
+        depth = 0
+        for token in self.tokens_iter:
+            if token.kind_ == TokenKind.LineComment or token.kind_ == TokenKind.BlockComment:
+                continue
+            if token.kind_ == TokenKind.EOF and self.delete_eof:
+                continue
+            tokens.append(token)
+            if token.kind_ == TokenKind.Directive:
+                if token.src in ["`ifdef", "`ifndef", "`celldefine", "`begin_keyword"]:
+                    depth += 1
+                elif token.src in ["`endif", "`endcelldefine", "`end_keyword"]:
+                    depth -= 1
+            elif token.kind_ == TokenKind.EndModule and depth == 0:
+                yield tokens
+                tokens = []
+        if tokens:
+            yield tokens
+
+    def parse_top_level_items_locally(self, ctx: Context) -> typing.Iterator[SyntaxNode]:
+        while True:
+            token = ctx.current()
+            if token is None or token.kind_ == TokenKind.EOF:
+                break
+            yield self.parse_top_level_item_locally(ctx=ctx)
+
+    def parse_top_level_item_locally(self, ctx: Context) -> SyntaxNode:
+        token = ctx.current_nn()
+        if token.kind_ == TokenKind.Directive:
+            return self.parse_pre_compile_directive_locally(ctx=ctx)
+        elif token.kind_ == TokenKind.Module:
+            return self.parse_module_locally(ctx=ctx)
+        else:
+            log.fatal(f"token `{token.src}` is not supported yet:\n"
+                      f"{ctx.src_info.error_context(token.ldx, token.cdx)}\n")
+            raise ParserError
 
     def parse_module_locally(self, ctx: Context) -> ModuleNode:
+        start_idx, end_idx = self.consume_module_locally(ctx=ctx)
+        return self.parse_module_detail(sub_ctx=ctx.sub(start_idx, end_idx+1))
+
+    def consume_module_locally(self, ctx: Context) -> tuple[int, int]:
+        """ returns the token range of the module, 'module' and 'endmodule' both included """
         token = ctx.current()
         start_idx = ctx.token_idx
         assert token.kind_ == TokenKind.Module
         ldx, cdx = token.pos
 
-        ctx.consume()
-        ctx.consume_until(
-            token_kind=TokenKind.EndModule,
+        ctx.consume_until_matching_pair(
+            left=TokenKind.Module, right=TokenKind.EndModule,
             error_info=f"invalid syntax, module definition is not closed by 'endmodule',\n"
                        f"{ctx.src_info.error_context(ldx, cdx)}\n"
         )
         end_idx = ctx.token_idx
         ctx.consume()
-
-        return self.parse_module_detail(sub_ctx=Context(src_info=self.ctx.src_info,
-                                                        tokens=ctx.tokens[start_idx:end_idx+1]))
+        return start_idx, end_idx
 
     def parse_module_detail(self, sub_ctx: Context):
         token = sub_ctx.current_nn()
@@ -239,8 +543,7 @@ class Parser:
             )
             end_idx = sub_ctx.token_idx
             sub_ctx.consume()
-            para_list = self.parse_parameter_list(sub_ctx=Context(src_info=self.ctx.src_info,
-                                                                  tokens=sub_ctx.tokens[start_idx:end_idx+1]))
+            para_list = self.parse_parameter_list(sub_ctx=sub_ctx.sub(start_idx, end_idx+1))
 
         token = sub_ctx.current_nn()
         if token.kind_ == TokenKind.LParen:
@@ -254,8 +557,7 @@ class Parser:
             )
             end_idx = sub_ctx.token_idx
             sub_ctx.consume()
-            port_list = self.parse_port_list(sub_ctx=Context(src_info=self.ctx.src_info,
-                                                             tokens=sub_ctx.tokens[start_idx:end_idx+1]))
+            port_list = self.parse_port_list(sub_ctx=sub_ctx.sub(start_idx, end_idx+1))
 
         token = sub_ctx.current_nn()
         if token.kind_ != TokenKind.SemiColon:
@@ -266,12 +568,16 @@ class Parser:
 
         start_idx = sub_ctx.token_idx
 
-        if self.parse_body:
-            body = self.parse_module_body(sub_ctx=Context(src_info=self.ctx.src_info, tokens=sub_ctx.tokens[start_idx:]))
+        if self.parse_body and self.lazy_body:
+            return LazyModuleNode(ldx=ldx, cdx=cdx, tokens=sub_ctx.span_tokens(),
+                                  name=name, paras=para_list, ports=port_list,
+                                  parse_body_=functools.partial(self.parse_module_body, sub_ctx=sub_ctx.sub(start_idx)))
+        elif self.parse_body:
+            body = self.parse_module_body(sub_ctx=sub_ctx.sub(start_idx))
         else:
             body = []
 
-        return ModuleNode(ldx=ldx, cdx=cdx, tokens=sub_ctx.tokens,
+        return ModuleNode(ldx=ldx, cdx=cdx, tokens=sub_ctx.span_tokens(),
                           name=name, paras=para_list, ports=port_list, body_items=body)
 
     def parse_parameter_list(self, sub_ctx: Context) -> list[ParamDefNode]:
@@ -328,7 +634,7 @@ class Parser:
         else:
             end_idx = ctx.token_idx
 
-        return ParamDefNode(ldx=ldx, cdx=cdx, tokens=ctx.tokens[start_idx:end_idx+1],
+        return ParamDefNode(ldx=ldx, cdx=cdx, tokens=ctx.span(start_idx, end_idx+1),
                             data_type=data_typ, identifier_array_val_pairs=identifier_array_val_pairs)
 
     def parse_port_list(self, sub_ctx: Context) -> list[AnsiPortDefNode] | list[NonAnsiPortDefNode]:
@@ -357,6 +663,7 @@ class Parser:
             if len(array_identifier.size) != 0:
                 log.fatal(f"invalid syntax in non-ansi port definition\n"
                           f"{self.error_context(array_identifier.ldx, array_identifier.cdx)}\n")
+                raise ParserError
             non_ansi_port = NonAnsiPortDefNode(ldx=token.ldx, cdx=token.cdx, tokens=array_identifier.tokens,
                                                identifier=array_identifier.identifier)
             non_ansi_port_s.append(non_ansi_port)
@@ -374,10 +681,10 @@ class Parser:
         ansi_port_def_s = []
         while True:
             token = sub_ctx.current_nn()
-            if sub_ctx.token_idx == len(sub_ctx.tokens) - 1:
+            if sub_ctx.token_idx == sub_ctx.hi - 1:
                 assert token.kind_ == TokenKind.RParen
                 break
-            if sub_ctx.token_idx > len(sub_ctx.tokens) - 1:
+            if sub_ctx.token_idx > sub_ctx.hi - 1:
                 break
             if token.kind_ not in [TokenKind.Input, TokenKind.Output, TokenKind.Inout]:
                 log.fatal(f"invalid syntax, 'input'/'output'/'inout' is expected,\n"
@@ -449,7 +756,7 @@ class Parser:
         else:
             end_idx = ctx.token_idx
 
-        return AnsiPortDefNode(ldx=ldx, cdx=cdx, tokens=ctx.tokens[start_idx:end_idx+1],
+        return AnsiPortDefNode(ldx=ldx, cdx=cdx, tokens=ctx.span(start_idx, end_idx+1),
                                direction=direction,
                                typ=typ,
                                data_type=data_typ,
@@ -496,7 +803,7 @@ class Parser:
         if logic_or_bit is None and signing is None and range_ is None and inherent_data_type is None:
             return None
         else:
-            return DataTypeNode(ldx=ldx, cdx=cdx, tokens=ctx.tokens[start_idx:end_idx + 1],
+            return DataTypeNode(ldx=ldx, cdx=cdx, tokens=ctx.span(start_idx, end_idx + 1),
                                 logic_or_bit=logic_or_bit,
                                 signing=signing,
                                 range_=range_,
@@ -515,7 +822,7 @@ class Parser:
         if token.kind_ == TokenKind.RBracket:
             end_idx = ctx.token_idx
             ctx.consume()
-            return IndexNode(ldx=ldx, cdx=cdx, tokens=ctx.tokens[start_idx:end_idx+1],
+            return IndexNode(ldx=ldx, cdx=cdx, tokens=ctx.span(start_idx, end_idx+1),
                              index=expr_0)
 
         if token.kind_ != TokenKind.Colon:
@@ -534,7 +841,7 @@ class Parser:
 
         end_idx = ctx.token_idx
         ctx.consume()
-        return RangeNode(ldx=ldx, cdx=cdx, tokens=ctx.tokens[start_idx:end_idx+1],
+        return RangeNode(ldx=ldx, cdx=cdx, tokens=ctx.span(start_idx, end_idx+1),
                          left=expr_0, right=expr_1)
 
     def parse_array_identifier_locally(self, ctx: Context):
@@ -557,7 +864,7 @@ class Parser:
                 break
         end_idx = ctx.token_idx - 1
 
-        return ArrayIdentifierInitNode(ldx=ldx, cdx=cdx, tokens=ctx.tokens[start_idx:end_idx + 1],
+        return ArrayIdentifierInitNode(ldx=ldx, cdx=cdx, tokens=ctx.span(start_idx, end_idx + 1),
                                        identifier=identifier, size=size)
 
     def parse_array_identifiers_locally(self, ctx: Context) -> list[ArrayIdentifierInitNode]:
@@ -695,7 +1002,7 @@ class Parser:
         end_idx = ctx.token_idx
         ctx.consume()
 
-        return BeginEndNode(ldx=ldx, cdx=cdx, tokens=ctx.tokens[start_idx:end_idx + 1],
+        return BeginEndNode(ldx=ldx, cdx=cdx, tokens=ctx.span(start_idx, end_idx + 1),
                             name=name, body_item=items)
 
     def parse_typ_data_typ_identifier_array_val_pairs_locally(self, ctx: Context) -> \
@@ -773,7 +1080,7 @@ class Parser:
             raise ParserError
         ctx.consume()
 
-        return ParamDefInBodyNode(ldx=token.ldx, cdx=token.cdx, tokens=ctx.tokens[start_idx:end_idx + 1],
+        return ParamDefInBodyNode(ldx=token.ldx, cdx=token.cdx, tokens=ctx.span(start_idx, end_idx + 1),
                                   data_type=data_typ, identifier_array_val_pairs=identifier_array_val_pairs)
 
     def parse_port_def_in_body_locally(self, ctx: Context) -> PortDefAndInitInBodyNode:
@@ -797,7 +1104,7 @@ class Parser:
             raise ParserError
         ctx.consume()
 
-        return PortDefAndInitInBodyNode(ldx=token.ldx, cdx=token.cdx, tokens=ctx.tokens[start_idx:end_idx + 1],
+        return PortDefAndInitInBodyNode(ldx=token.ldx, cdx=token.cdx, tokens=ctx.span(start_idx, end_idx + 1),
                                         direction=direction,
                                         typ=typ, data_type=data_typ, identifier_array_val_pairs=identifier_array_val_pairs)
 
@@ -824,7 +1131,7 @@ class Parser:
             raise ParserError
         ctx.consume()
 
-        return LocalParamDefNode(ldx=token.ldx, cdx=token.cdx, tokens=ctx.tokens[start_idx:end_idx + 1],
+        return LocalParamDefNode(ldx=token.ldx, cdx=token.cdx, tokens=ctx.span(start_idx, end_idx + 1),
                                  data_type=data_typ, identifier_array_val_pairs=identifier_array_val_pairs)
 
     def parse_rvw_def_locally(self, ctx: Context)  -> VariableDefInitNode:
@@ -846,7 +1153,7 @@ class Parser:
             raise ParserError
         ctx.consume()
 
-        return VariableDefInitNode(ldx=token.ldx, cdx=token.cdx, tokens=ctx.tokens[start_idx:end_idx + 1],
+        return VariableDefInitNode(ldx=token.ldx, cdx=token.cdx, tokens=ctx.span(start_idx, end_idx + 1),
                                    typ=typ,
                                    data_type=data_typ,
                                    identifier_array_val_pairs=identifier_array_val_pairs)
@@ -870,7 +1177,7 @@ class Parser:
             raise ParserError
         ctx.consume()
 
-        return VariableDefInitNode(ldx=token.ldx, cdx=token.cdx, tokens=ctx.tokens[start_idx:end_idx + 1],
+        return VariableDefInitNode(ldx=token.ldx, cdx=token.cdx, tokens=ctx.span(start_idx, end_idx + 1),
                                    typ=None,
                                    data_type=data_typ,
                                    identifier_array_val_pairs=identifier_array_val_pairs)
@@ -895,7 +1202,7 @@ class Parser:
             raise ParserError
         ctx.consume()
 
-        return VariableDefInitNode(ldx=token.ldx, cdx=token.cdx, tokens=ctx.tokens[start_idx:end_idx + 1],
+        return VariableDefInitNode(ldx=token.ldx, cdx=token.cdx, tokens=ctx.span(start_idx, end_idx + 1),
                                    typ=None,
                                    data_type=data_typ,
                                    identifier_array_val_pairs=identifier_array_val_pairs)
@@ -925,10 +1232,11 @@ class Parser:
             cdx = ctx.last().cdx
             log.fatal(f"invalid syntax in assign statement, ';' is expected at the end,\n"
                       f"{self.error_context(ldx, cdx)}\n")
+            raise ParserError
         end_idx = ctx.token_idx
         ctx.consume()
 
-        return AssignNode(ldx=token.ldx, cdx=token.cdx, tokens=ctx.tokens[start_idx:end_idx+1], assignment=assignment)
+        return AssignNode(ldx=token.ldx, cdx=token.cdx, tokens=ctx.span(start_idx, end_idx+1), assignment=assignment)
 
     def parse_genvar_def_locally(self, ctx: Context) -> GenvarDefNode | GenvarDefAndInitNode:
         """
@@ -950,7 +1258,7 @@ class Parser:
         if token is not None and token.kind_ == TokenKind.SemiColon:
             end_idx = ctx.token_idx
             ctx.consume()
-            return GenvarDefNode(ldx=token.ldx, cdx=token.cdx, tokens=ctx.tokens[start_idx:end_idx + 1],
+            return GenvarDefNode(ldx=token.ldx, cdx=token.cdx, tokens=ctx.span(start_idx, end_idx + 1),
                                  identifier=token)
 
         token = ctx.current()
@@ -966,10 +1274,11 @@ class Parser:
         if token is None or token.kind_ != TokenKind.SemiColon:
             log.fatal(f"invalid syntax in genvar definition, ';' is expected at the end,\n"
                       f"{self.error_context(ctx.near().ldx, ctx.near().cdx)}\n")
+            raise ParserError
         end_idx = ctx.token_idx
         ctx.consume()
 
-        return GenvarDefAndInitNode(ldx=token.ldx, cdx=token.cdx, tokens=ctx.tokens[start_idx:end_idx + 1],
+        return GenvarDefAndInitNode(ldx=token.ldx, cdx=token.cdx, tokens=ctx.span(start_idx, end_idx + 1),
                                     identifier=token,
                                     val=val)
 
@@ -1007,7 +1316,7 @@ class Parser:
                                  DivAssignment, ModAssignment, BitAndAssignment, BitOrAssignment, BitXorAssignment,
                                  LogicLeftShiftAssignment, LogicRightShiftAssignment,
                                  ArithmeticLeftShiftAssignment, ArithmeticRightShiftAssignment)):
-            log.fatal(f"invalid syntax in assignment statement, '{expr}'\n",
+            log.fatal(f"invalid syntax in assignment statement, '{expr}'\n"
                       f"{self.error_context(ldx, cdx)}\n")
             raise ParserError
         return expr
@@ -1063,7 +1372,7 @@ class Parser:
         body = self.parse_procedure_statement_locally(ctx=ctx)
         end_idx = ctx.token_idx - 1
 
-        return ForStatementNode(ldx=ldx, cdx=cdx, tokens=ctx.tokens[start_idx:end_idx + 1],
+        return ForStatementNode(ldx=ldx, cdx=cdx, tokens=ctx.span(start_idx, end_idx + 1),
                                 data_type=data_type, init=init_statement, stop=stop, step=step, body=body)
 
     def parse_procedure_begin_end_block_locally(self, ctx: Context) -> 'ProcedureBeginEndBlockNode':
@@ -1079,7 +1388,7 @@ class Parser:
         end_idx = ctx.token_idx
         ctx.consume()
 
-        return self.parse_begin_end_block(sub_ctx=Context(src_info=self.ctx.src_info, tokens=ctx.tokens[start_idx:end_idx+1]))
+        return self.parse_begin_end_block(sub_ctx=ctx.sub(start_idx, end_idx+1))
 
     def parse_begin_end_block(self, sub_ctx: Context) -> ProcedureBeginEndBlockNode:
         token = sub_ctx.current()
@@ -1100,12 +1409,12 @@ class Parser:
 
         body = []
         while True:
-            if sub_ctx.token_idx == len(sub_ctx.tokens) - 1:
+            if sub_ctx.token_idx == sub_ctx.hi - 1:
                 break
             item = self.parse_procedure_statement_locally(ctx=sub_ctx)
             body.append(item)
 
-        return ProcedureBeginEndBlockNode(ldx=token.ldx, cdx=token.cdx, tokens=sub_ctx.tokens, name=name, body=body)
+        return ProcedureBeginEndBlockNode(ldx=token.ldx, cdx=token.cdx, tokens=sub_ctx.span_tokens(), name=name, body=body)
 
     def parse_procedure_assignment_locally(self, ctx: Context) -> ProcedureAssignmentNode:
         assignment = self.parse_assignment_statement(ctx=ctx)
@@ -1120,6 +1429,7 @@ class Parser:
 
     def parse_if_else_locally(self, ctx: Context) -> IfElseBlock:
         token = ctx.current_nn()
+        ldx, cdx = token.pos
         start_idx = ctx.token_idx
         assert token.kind_ == TokenKind.If
         ctx.consume()
@@ -1128,6 +1438,7 @@ class Parser:
         if token is None or token.kind_ != TokenKind.LParen:
             log.fatal(f"invalid syntax, '(' is expected after 'if',\n"
                       f"{self.error_context(ctx.near().ldx, ctx.near().cdx)}\n")
+            raise ParserError
         ctx.consume()
 
         condition = self.parse_expression_locally(ctx=ctx)
@@ -1136,6 +1447,7 @@ class Parser:
         if token is None or token.kind_ != TokenKind.RParen:
             log.fatal(f"invalid syntax, ')' is expected after condition for 'if',\n"
                       f"{self.error_context(ctx.near().ldx, ctx.near().cdx)}\n")
+            raise ParserError
         ctx.consume()
 
         if_block = self.parse_procedure_statement_locally(ctx=ctx)
@@ -1146,7 +1458,7 @@ class Parser:
             ctx.consume()
             else_block = self.parse_procedure_statement_locally(ctx=ctx)
 
-        return IfElseBlock(ldx=token.ldx, cdx=token.cdx, tokens=ctx.tokens[start_idx:ctx.token_idx + 1],
+        return IfElseBlock(ldx=ldx, cdx=cdx, tokens=ctx.span(start_idx, ctx.token_idx),
                            condition=condition, if_body=if_block, else_body=else_block)
 
     def parse_case_locally(self, ctx: Context) -> CaseStatementNode:
@@ -1163,7 +1475,7 @@ class Parser:
         end_idx = ctx.token_idx
         ctx.consume()
 
-        return self.parse_case(sub_ctx=Context(src_info=self.ctx.src_info, tokens=ctx.tokens[start_idx:end_idx+1]))
+        return self.parse_case(sub_ctx=ctx.sub(start_idx, end_idx+1))
 
     def parse_case(self, sub_ctx: Context) -> CaseStatementNode:
         token = sub_ctx.current_nn()
@@ -1174,6 +1486,7 @@ class Parser:
         if token is None or token.kind_ != TokenKind.LParen:
             log.fatal(f"invalid syntax, '(' is expected after 'case',\n"
                       f"{self.error_context(sub_ctx.near().ldx, sub_ctx.near().cdx)}\n")
+            raise ParserError
         sub_ctx.consume()
 
         expr = self.parse_expression_locally(ctx=sub_ctx)
@@ -1182,6 +1495,7 @@ class Parser:
         if token is None or token.kind_ != TokenKind.RParen:
             log.fatal(f"invalid syntax, ')' is expected after expression for 'case',\n"
                       f"{self.error_context(sub_ctx.near().ldx, sub_ctx.near().cdx)}\n")
+            raise ParserError
         sub_ctx.consume()
 
         pairs = []
@@ -1196,6 +1510,7 @@ class Parser:
                 if token is None or token.kind_ != TokenKind.Colon:
                     log.fatal(f"invalid syntax, ':' is expected after condition for 'case',\n"
                               f"{self.error_context(sub_ctx.near().ldx, sub_ctx.near().cdx)}\n")
+                    raise ParserError
                 sub_ctx.consume()
                 default = self.parse_procedure_statement_locally(ctx=sub_ctx)
                 break
@@ -1204,12 +1519,13 @@ class Parser:
             if token is None or token.kind_ != TokenKind.Colon:
                 log.fatal(f"invalid syntax, ':' is expected after condition for 'case',\n"
                           f"{self.error_context(sub_ctx.near().ldx, sub_ctx.near().cdx)}\n")
+                raise ParserError
             sub_ctx.consume()
             ps = self.parse_procedure_statement_locally(ctx=sub_ctx)
             pairs.append((condition, ps))
 
         return CaseStatementNode(ldx=token.ldx, cdx=token.cdx,
-                                 tokens=sub_ctx.tokens,
+                                 tokens=sub_ctx.span_tokens(),
                                  expression=expr,
                                  case_pairs=pairs,
                                  default_statement=default)
@@ -1231,7 +1547,7 @@ class Parser:
 
         ps = self.parse_procedure_statement_locally(ctx=ctx)
 
-        return AlwaysBlockNode(ldx=ldx, cdx=cdx, tokens=ctx.tokens[start_idx:ctx.token_idx+1],
+        return AlwaysBlockNode(ldx=ldx, cdx=cdx, tokens=ctx.span(start_idx, ctx.token_idx),
                                always_typ=always_typ, sensitivity_list=sensitivity_list, body=ps)
 
     def parse_initial_block_locally(self, ctx: Context) -> InitialBlockNode:
@@ -1244,7 +1560,7 @@ class Parser:
 
         ps = self.parse_procedure_statement_locally(ctx=ctx)
 
-        return InitialBlockNode(ldx=ldx, cdx=cdx, tokens=ctx.tokens[start_idx:ctx.token_idx+1], body=ps)
+        return InitialBlockNode(ldx=ldx, cdx=cdx, tokens=ctx.span(start_idx, ctx.token_idx), body=ps)
 
     def parse_sensitivity_list_locally(self, ctx: Context) -> list[Token]:
         token = ctx.current()
@@ -1280,7 +1596,7 @@ class Parser:
         end_idx = ctx.token_idx
         ctx.consume()
 
-        return self.parse_instantiation(sub_ctx=Context(src_info=self.ctx.src_info, tokens=ctx.tokens[start_idx:end_idx+1]))
+        return self.parse_instantiation(sub_ctx=ctx.sub(start_idx, end_idx+1))
 
     def parse_instantiation(self, sub_ctx: Context) -> InstantiationNode:
         token = sub_ctx.current_nn()
@@ -1307,8 +1623,7 @@ class Parser:
                            f"{self.error_context(token.ldx, token.cdx)}\n")
             end_idx = sub_ctx.token_idx
             sub_ctx.consume()
-            para_set_list = self.parse_para_set_list(sub_ctx=Context(src_info=self.ctx.src_info,
-                                                                     tokens=sub_ctx.tokens[start_idx:end_idx+1]))
+            para_set_list = self.parse_para_set_list(sub_ctx=sub_ctx.sub(start_idx, end_idx+1))
 
         token = sub_ctx.current()
         if token.kind_ != TokenKind.Identifier:
@@ -1330,8 +1645,7 @@ class Parser:
                        f"{self.error_context(token.ldx, token.cdx)}\n")
         end_idx = sub_ctx.token_idx
         sub_ctx.consume()
-        port_connect_list = self.parse_port_connect_list(sub_ctx=Context(src_info=self.ctx.src_info,
-                                                                         tokens=sub_ctx.tokens[start_idx:end_idx+1]))
+        port_connect_list = self.parse_port_connect_list(sub_ctx=sub_ctx.sub(start_idx, end_idx+1))
 
         token = sub_ctx.current()
         if token.kind_ != TokenKind.SemiColon:
@@ -1339,7 +1653,7 @@ class Parser:
                       f"{self.error_context(token.ldx, token.cdx)}\n")
             raise ParserError
 
-        return InstantiationNode(ldx=token.ldx, cdx=token.cdx, tokens=sub_ctx.tokens,
+        return InstantiationNode(ldx=token.ldx, cdx=token.cdx, tokens=sub_ctx.span_tokens(),
                                  prototype_identifier=prototype_identifier,
                                  para_sets=para_set_list,
                                  instance_identifier=instance_identifier,
@@ -1348,7 +1662,7 @@ class Parser:
     def parse_para_set_list(self, sub_ctx: Context) -> list[ParaSetNode]:
         token = sub_ctx.current_nn()
         assert token.kind_ == TokenKind.LParen
-        assert sub_ctx.tokens[-1].kind_ == TokenKind.RParen
+        assert sub_ctx.tokens[sub_ctx.hi - 1].kind_ == TokenKind.RParen
         para_set_list = []
 
         sub_ctx.consume()
@@ -1401,7 +1715,7 @@ class Parser:
                     log.fatal(f"invalid syntax for instantiation, in the parameter set block, ')' or ',' is expected,\n"
                               f"{self.error_context(token.ldx, token.cdx)}\n")
                     raise ParserError
-            para_set_list.append(ParaSetNode(ldx=para_set_ldx, cdx=para_set_cdx, tokens=sub_ctx.tokens[para_set_start_idx:para_set_end_idx+1],
+            para_set_list.append(ParaSetNode(ldx=para_set_ldx, cdx=para_set_cdx, tokens=sub_ctx.span(para_set_start_idx, para_set_end_idx+1),
                                              param_name=para_name,
                                              param_value=para_val))
         return para_set_list
@@ -1409,7 +1723,7 @@ class Parser:
     def parse_port_connect_list(self, sub_ctx: Context) -> list[PortConnectNode]:
         token = sub_ctx.current_nn()
         assert token.kind_ == TokenKind.LParen
-        assert sub_ctx.tokens[-1].kind_ == TokenKind.RParen
+        assert sub_ctx.tokens[sub_ctx.hi - 1].kind_ == TokenKind.RParen
         port_connect_node = []
 
         sub_ctx.consume()
@@ -1462,7 +1776,7 @@ class Parser:
                     log.fatal(f"invalid syntax for instantiation, ')' or ',' is expected,\n"
                               f"{self.error_context(token.ldx, token.cdx)}\n")
                     raise ParserError
-            port_connect_node.append(PortConnectNode(ldx=port_connect_ldx, cdx=port_connect_cdx, tokens=sub_ctx.tokens[port_connect_start_idx:port_set_end_idx+1],
+            port_connect_node.append(PortConnectNode(ldx=port_connect_ldx, cdx=port_connect_cdx, tokens=sub_ctx.span(port_connect_start_idx, port_set_end_idx+1),
                                                      port_name=port_name,
                                                      port_value=port_val))
         return port_connect_node
@@ -1494,7 +1808,7 @@ class Parser:
                        f"{self.error_context(token.ldx, token.cdx)}\n")
         end_idx = ctx.token_idx
         ctx.consume()
-        sub_ctx = Context(src_info=self.ctx.src_info, tokens=ctx.tokens[start_idx:end_idx])
+        sub_ctx = ctx.sub(start_idx, end_idx)
 
         if nxt.kind_ == TokenKind.Case:
             return self.parse_generate_case(sub_ctx=sub_ctx)
@@ -1543,6 +1857,7 @@ class Parser:
             if token is None or token.kind_ != TokenKind.Colon:
                 log.fatal(f"invalid syntax, ':' is expected after condition for 'case',\n"
                           f"{self.error_context(sub_ctx.near().ldx, sub_ctx.near().cdx)}\n")
+                raise ParserError
             sub_ctx.consume()
             i = self.parse_module_body_item_locally(ctx=sub_ctx)
             pairs.append((condition, i))
@@ -1554,7 +1869,7 @@ class Parser:
             raise ParserError
         sub_ctx.consume()
 
-        return GenerateNodeCase(ldx=token.ldx, cdx=token.cdx, tokens=sub_ctx.tokens,
+        return GenerateNodeCase(ldx=token.ldx, cdx=token.cdx, tokens=sub_ctx.span_tokens(),
                                 expression=expr, case_pairs=pairs, default_statement=default)
 
     def parse_generate_for(self, sub_ctx: Context) -> GenerateNodeFor:
@@ -1617,7 +1932,7 @@ class Parser:
 
         body = self.parse_module_body_item_locally(ctx=sub_ctx)
 
-        return GenerateNodeFor(ldx=token.ldx, cdx=token.cdx, tokens=sub_ctx.tokens,
+        return GenerateNodeFor(ldx=token.ldx, cdx=token.cdx, tokens=sub_ctx.span_tokens(),
                                genvar_data_type=data_type, init=init, stop=stop, step=step, body=body)
 
     def parse_generate_if(self, sub_ctx: Context) -> GenerateNodeIf:
@@ -1647,7 +1962,7 @@ class Parser:
 
         body = self.parse_module_body_item_locally(ctx=sub_ctx)
 
-        return GenerateNodeIf(ldx=token.ldx, cdx=token.cdx, tokens=sub_ctx.tokens,
+        return GenerateNodeIf(ldx=token.ldx, cdx=token.cdx, tokens=sub_ctx.span_tokens(),
                               condition=condition, body=body)
 
     def parse_pre_compile_directive_locally(self, ctx: Context) -> PreCompileDirectiveNode:
@@ -1690,7 +2005,7 @@ class Parser:
             consume_until_src_matching_pair(left=["`ifdef", "`ifndef"], right=["`endif"])
             end_idx = ctx.token_idx
             ctx.consume()
-            return PreCompileDirectiveNode(ldx=ldx, cdx=cdx, tokens=ctx.tokens[start_idx:end_idx+1])
+            return PreCompileDirectiveNode(ldx=ldx, cdx=cdx, tokens=ctx.span(start_idx, end_idx+1))
         elif token.src == "`endif":
             log.fatal(f"invalid syntax, no matching '`ifdef`/'`ifndef' found for '`endif'\n"
                       f"{self.error_context(ldx, cdx)}\n")
@@ -1708,7 +2023,7 @@ class Parser:
             consume_until_src_matching_pair(left=["`celldefine"], right=["`endcelldefine"])
             end_idx = ctx.token_idx
             ctx.consume()
-            return PreCompileDirectiveNode(ldx=ldx, cdx=cdx, tokens=ctx.tokens[start_idx:end_idx+1])
+            return PreCompileDirectiveNode(ldx=ldx, cdx=cdx, tokens=ctx.span(start_idx, end_idx+1))
         elif token.src == "`endcelldefine":
             log.fatal(f"invalid syntax, no matching '`celldefine` found for '`endcelldefine'\n"
                       f"{self.error_context(ldx, cdx)}\n")
@@ -1722,7 +2037,7 @@ class Parser:
             consume_until_src_matching_pair(left=["`begin_keyword"], right=["`end_keyword"])
             end_idx = ctx.token_idx
             ctx.consume()
-            return PreCompileDirectiveNode(ldx=ldx, cdx=cdx, tokens=ctx.tokens[start_idx:end_idx+1])
+            return PreCompileDirectiveNode(ldx=ldx, cdx=cdx, tokens=ctx.span(start_idx, end_idx+1))
         elif token.src == "`include":
             start_idx = ctx.token_idx
             ctx.consume()
@@ -1743,7 +2058,7 @@ class Parser:
                 ctx.consume()
             log.warning(f"precompile directive support is very limited, '`include` will not take effect\n"
                         f"{self.error_context(ldx, cdx)}\n")
-            return PreCompileDirectiveNode(ldx=ldx, cdx=cdx, tokens=ctx.tokens[start_idx:end_idx+1])
+            return PreCompileDirectiveNode(ldx=ldx, cdx=cdx, tokens=ctx.span(start_idx, end_idx+1))
         elif token.src == "`timescale":
             start_idx = ctx.token_idx
             ctx.consume()
@@ -1764,6 +2079,7 @@ class Parser:
             if token is None or token.kind_ != TokenKind.Div:
                 log.fatal(f"invalid syntax, '/' is expected after time unit\n"
                           f"{self.error_context(ctx.near().ldx, ctx.near().cdx)}\n")
+                raise ParserError
             ctx.consume()
             precision_mag = ctx.current()
             if precision_mag is None or precision_mag.kind_ != TokenKind.Literal:
@@ -1778,9 +2094,9 @@ class Parser:
                 log.fatal(f"invalid syntax, precision unit should be specified after literal\n"
                           f"{self.error_context(ctx.near().ldx, ctx.near().cdx)}\n")
                 raise ParserError
-            ctx.consume()
             end_idx = ctx.token_idx
-            return PreCompileDirectiveNode(ldx=ldx, cdx=cdx, tokens=ctx.tokens[start_idx:end_idx+1])
+            ctx.consume()
+            return PreCompileDirectiveNode(ldx=ldx, cdx=cdx, tokens=ctx.span(start_idx, end_idx+1))
         elif token.src == "`pragma":
             log.fatal(f"`pragma cannot be parsed since we don't know how to parse them. Please remove them fist.\n"
                       f"{self.error_context(ldx, cdx)}\n")
@@ -1797,7 +2113,7 @@ class Parser:
                 raise ParserError
             end_idx = ctx.token_idx
             ctx.consume()
-            return PreCompileDirectiveNode(ldx=ldx, cdx=cdx, tokens=ctx.tokens[start_idx:end_idx+1])
+            return PreCompileDirectiveNode(ldx=ldx, cdx=cdx, tokens=ctx.span(start_idx, end_idx+1))
         elif token.src in ["`unconnected_drive", "`nounconnected_drive"]:
             start_idx = ctx.token_idx
             start_src = token.src
@@ -1809,7 +2125,7 @@ class Parser:
                 raise ParserError
             end_idx = ctx.token_idx
             ctx.consume()
-            return PreCompileDirectiveNode(ldx=ldx, cdx=cdx, tokens=ctx.tokens[start_idx:end_idx+1])
+            return PreCompileDirectiveNode(ldx=ldx, cdx=cdx, tokens=ctx.span(start_idx, end_idx+1))
         elif token.src == "`resetall":
             start_idx = ctx.token_idx
             ctx.consume()
@@ -1820,10 +2136,110 @@ class Parser:
             raise ParserError
 
 
-def parse_file(path: str, parse_body: bool = False) -> list[SyntaxNode]:
+def split_module_ranges(module_ranges: list[tuple[int, int]], batch_num: int) -> list[list[tuple[int, int]]]:
+    """ split the ranges into at most `batch_num` batches of consecutive ranges, by about the same token number """
+    total = sum(end_idx - start_idx + 1 for start_idx, end_idx in module_ranges)
+    batch_size = max(total // batch_num, 1)
+    batches = [[]]
+    size = 0
+    for module_range in module_ranges:
+        if size >= batch_size:
+            batches.append([])
+            size = 0
+        batches[-1].append(module_range)
+        size += module_range[1] - module_range[0] + 1
+    return batches
+
+
+parse_worker: Parser | None = None  # the parser of a worker process of `Parser.parse_parallel`
+
+
+def init_parse_worker(context: str | bytes | mmap.mmap, line_ends: typing.Sequence[int], eol: str, path: str,
+                      parse_body: bool):
+    """ the context and its line ends are shared with the parent, see `context_pool` """
+    global parse_worker
+    parse_worker = Parser("", eol, path=path, parse_body=parse_body)
+    # the tokens are lexed by the parent, only the lines are needed for the error context
+    src_info = SourceInfo(SourceLines(context, line_ends, eol), path)
+    parse_worker.ctx = Context(src_info=src_info, tokens=[])
+
+
+def parse_modules_in_worker(columns: tuple, module_ranges: list[tuple[int, int]]) -> bytes | None:
+    """
+    the modules in the token columns, see `token_columns`, are sent back in the format of `dump_nodes`,
+    None if they can not be dumped, then the parent parses them itself
+    """
+    parse_worker.ctx = Context(src_info=parse_worker.ctx.src_info, tokens=tokens_from_columns(columns))
+    nodes = [parse_worker.parse_module_detail(sub_ctx=parse_worker.ctx.sub(start_idx, end_idx+1))
+             for start_idx, end_idx in module_ranges]
+    try:
+        return dump_nodes(nodes)
+    except SerializeError:
+        return None
+
+
+class AstCache(DiskCache):
+    """
+    the syntax nodes of the files in the binary format of `syntax.serialize`,
+    keyed by the file content, the tool version and the options changing the nodes
+    """
+    def __init__(self, directory: str, max_age: float = 30 * 24 * 3600, max_size: int = 4 << 30):
+        super().__init__(directory, suffix=".ast", max_age=max_age, max_size=max_size)
+
+    def get_nodes(self, key: str) -> list[SyntaxNode] | None:
+        data = self.get(key)
+        if data is None:
+            return None
+        try:
+            return load_nodes(data)
+        except SerializeError:
+            return None  # a corrupted entry, it is overwritten later
+
+    def put_nodes(self, key: str, nodes: list[SyntaxNode]):
+        try:
+            data = dump_nodes(nodes)
+        except SerializeError:
+            return  # not cached, the file is parsed again next time
+        self.put(key, data)
+
+
+def parse_file(path: str, parse_body: bool = False, token_store: bool = False, stream: bool = False,
+               memory_map: bool = False, header_only: bool = False, cache: AstCache | None = None,
+               lazy_body: bool = False, jobs: int = 1) -> list[SyntaxNode]:
+    """
+    memory_map:
+        lex the memory-mapped file rather than reading it into a str, the map is kept open by the tokens
+    header_only, lazy_body, jobs:
+        see `Parser`, the bodies are parsed anyway when the nodes are put into the cache
+    cache:
+        load the nodes of an unchanged file from the cache rather than parsing it, the tokens of the loaded nodes
+        are Token even if `token_store`
+    """
+    if cache is None:
+        return parse_file_without_cache(path, parse_body, token_store, stream, memory_map, header_only, lazy_body,
+                                        jobs)
+    with open(path, 'rb') as f:
+        key = cache.key(f.read(), parse_body, header_only)
+    nodes = cache.get_nodes(key)
+    if nodes is None:
+        nodes = parse_file_without_cache(path, parse_body, token_store, stream, memory_map, header_only, lazy_body,
+                                         jobs)
+        cache.put_nodes(key, nodes)
+    return nodes
+
+
+def parse_file_without_cache(path: str, parse_body: bool = False, token_store: bool = False, stream: bool = False,
+                             memory_map: bool = False, header_only: bool = False, lazy_body: bool = False,
+                             jobs: int = 1) -> list[SyntaxNode]:
+    if memory_map:
+        return Parser(map_file(path), path=path, parse_body=parse_body, token_store=token_store,
+                      header_only=header_only, lazy_body=lazy_body, jobs=jobs).parse()
     with open(path, 'r', encoding="utf-8") as f:
+        if stream:
+            return Parser(f, path=path, parse_body=parse_body, stream=True, lazy_body=lazy_body).parse()
         verilog = f.read()
-    parser = Parser(verilog, parse_body=parse_body)
+    parser = Parser(verilog, parse_body=parse_body, token_store=token_store, header_only=header_only,
+                    lazy_body=lazy_body, jobs=jobs)
     return parser.parse()
 
 
@@ -1,4 +1,5 @@
 import dataclasses
+import typing
 
 from lexer import Token, TokenKind
 from syntax.expression import *
@@ -6,55 +7,46 @@ from parser import log, Context, ParserError, SourceInfo
 from syntax.node import node_as_dict
 
 
+"""
+binding powers, by token kind, of an operator: infix, prefix (a unary operator), and inside an assign statement,
+where '<=' is the non-blocking assignment rather than the comparison. a kind not in the tables binds by 0
+"""
+infix_bp: dict[TokenKind, int] = {}
+for power, kinds in [(170, [TokenKind.LParen, TokenKind.RParen, TokenKind.LBracket,
+                            TokenKind.ScopeResolution, TokenKind.Dot]),
+                     (160, [TokenKind.LogicNot, TokenKind.BitNot, TokenKind.SelfIncrement, TokenKind.SelfDecrement]),
+                     (150, [TokenKind.Pow]),
+                     (140, [TokenKind.Mul, TokenKind.Div, TokenKind.Mod]),
+                     (130, [TokenKind.Add, TokenKind.Sub]),
+                     (120, [TokenKind.LogicLeftShift, TokenKind.LogicRightShift,
+                            TokenKind.ArithLeftShift, TokenKind.ArithRightShift]),
+                     (110, [TokenKind.LessThan, TokenKind.GreaterThan, TokenKind.GreaterEqual, TokenKind.Inside,
+                            TokenKind.LessEqual]),
+                     (100, [TokenKind.Equal, TokenKind.InEqual, TokenKind.CaseEqual, TokenKind.CaseInEqual,
+                            TokenKind.WildcardEqual, TokenKind.WildcardInEqual]),
+                     (90, [TokenKind.BitAnd]),
+                     (80, [TokenKind.BitXor]),
+                     (70, [TokenKind.BitOr]),
+                     (50, [TokenKind.LogicAnd]),
+                     (40, [TokenKind.LogicOr]),
+                     (30, [TokenKind.QuestionMark]),
+                     (20, [TokenKind.Implication, TokenKind.Equivalence]),
+                     (10, [TokenKind.Assignment, TokenKind.AddAssignment, TokenKind.SubAssignment,
+                           TokenKind.MulAssignment, TokenKind.DivAssignment, TokenKind.ModAssignment,
+                           TokenKind.BitAndAssignment, TokenKind.BitXorAssignment, TokenKind.BitOrAssignment,
+                           TokenKind.LogicLeftShiftAssignment, TokenKind.LogicRightShiftAssignment,
+                           TokenKind.ArithLeftShiftAssignment, TokenKind.ArithRightShiftAssignment])]:
+    infix_bp.update(dict.fromkeys(kinds, power))
+prefix_bp: dict[TokenKind, int] = infix_bp | dict.fromkeys(
+    [TokenKind.Add, TokenKind.Sub, TokenKind.BitAnd, TokenKind.BitOr, TokenKind.BitXor], 160)
+assign_statement_bp: dict[TokenKind, int] = infix_bp | {TokenKind.LessEqual: 10}
+bp_tables: dict[tuple[bool, bool], dict[TokenKind, int]] = {
+    (False, False): infix_bp, (True, False): prefix_bp,
+    (False, True): assign_statement_bp, (True, True): prefix_bp | {TokenKind.LessEqual: 10}}
+
+
 def bp(token: Token, prefix: bool = False, assign_statement: bool = False) -> int:
-    if token.kind_ in [TokenKind.LParen, TokenKind.RParen, TokenKind.LBracket,
-                       TokenKind.ScopeResolution, TokenKind.Dot]:
-        return 170
-    elif token.kind_ in [TokenKind.Add, TokenKind.Sub, TokenKind.BitAnd, TokenKind.BitOr, TokenKind.BitXor] and prefix or \
-         token.kind_ in [TokenKind.LogicNot, TokenKind.BitNot, TokenKind.SelfIncrement, TokenKind.SelfDecrement]:
-        return 160
-    elif token.kind_ in [TokenKind.Pow]:
-        return 150
-    elif token.kind_ in [TokenKind.Mul, TokenKind.Div, TokenKind.Mod]:
-        return 140
-    elif token.kind_ in [TokenKind.Add, TokenKind.Sub] and not prefix:
-        return 130
-    elif token.kind_ in [TokenKind.LogicLeftShift, TokenKind.LogicRightShift, TokenKind.ArithLeftShift, TokenKind.ArithRightShift]:
-        return 120
-    elif token.kind_ in [TokenKind.LessThan, TokenKind.GreaterThan, TokenKind.GreaterEqual, TokenKind.Inside] or \
-         token.kind_ in [TokenKind.LessEqual] and not assign_statement:
-        return 110
-    elif token.kind_ in [TokenKind.Equal, TokenKind.InEqual, TokenKind.CaseEqual, TokenKind.CaseInEqual,
-                         TokenKind.WildcardEqual, TokenKind.WildcardInEqual]:
-        return 100
-    elif token.kind_ in [TokenKind.BitAnd]:
-        return 90
-    elif token.kind_ in [TokenKind.BitXor]:
-        return 80
-    elif token.kind_ in [TokenKind.BitOr]:
-        return 70
-    elif token.kind_ in [TokenKind.LogicNot]:
-        return 60
-    elif token.kind_ in [TokenKind.LogicAnd]:
-        return 50
-    elif token.kind_ in [TokenKind.LogicOr]:
-        return 40
-    elif token.kind_ in [TokenKind.QuestionMark]:
-        return 30
-    elif token.kind_ in [TokenKind.Implication, TokenKind.Equivalence]:
-        return 20
-    elif token.kind_ in [TokenKind.Assignment, TokenKind.AddAssignment, TokenKind.SubAssignment, TokenKind.MulAssignment,
-                         TokenKind.DivAssignment, TokenKind.ModAssignment, TokenKind.BitAndAssignment, TokenKind.BitXorAssignment,
-                         TokenKind.BitOrAssignment, TokenKind.LogicLeftShiftAssignment, TokenKind.LogicRightShiftAssignment,
-                         TokenKind.ArithLeftShiftAssignment, TokenKind.ArithRightShiftAssignment] or \
-         token.kind_ in [TokenKind.LessEqual] and assign_statement:
-        return 10
-    elif token.kind_ in [TokenKind.LBrace, TokenKind.SingleQuoteLBrace]:
-        return 0
-    elif token.kind_ in [TokenKind.Colon, TokenKind.Comma]:
-        return 0
-    else:
-        return 0
+    return bp_tables[prefix, assign_statement].get(token.kind_, 0)
 
 
 led_prefix = [TokenKind.LBracket, TokenKind.ScopeResolution, TokenKind.Dot,
@@ -76,101 +68,179 @@ led_prefix = [TokenKind.LBracket, TokenKind.ScopeResolution, TokenKind.Dot,
               TokenKind.BitOrAssignment, TokenKind.LogicLeftShiftAssignment, TokenKind.LogicRightShiftAssignment]
 
 
+"""
+the expression is parsed by generators: `expression_items` and the nud / led handlers yield (depth, ctx_bp) for each
+sub-expression they need, and are sent the parsed sub-expression back. `parse_expression` keeps the generators waiting
+for a sub-expression on an explicit stack rather than recursing, so the nesting of an expression, e.g. deeply
+parenthesized or a long chain of '?:', is not limited by the recursion limit
+"""
+SubExpression = typing.Generator[tuple[int, int], Expression, Expression]
+
+
 def parse_expression(depth: int, ctx: Context, ctx_bp: int) -> Expression:
-    token = ctx.current()
-    if token is None or token.kind_ == TokenKind.EOF:
-        log.fatal(f"no tokens to parse expression\n"
-                  f"{ctx.src_info.error_context(ctx.near().ldx, ctx.near().cdx)}\n")
-        raise ParserError
+    expr = parse_operand(depth, ctx, ctx_bp)
+    if expr is not None:
+        return expr
+    pending: list[SubExpression] = []  # the expressions waiting for their sub-expression, the innermost last
+    items = expression_items(depth, ctx, ctx_bp)
+    while True:
+        try:
+            sub_depth, sub_bp = items.send(expr)
+        except StopIteration as stop:
+            if not pending:
+                return stop.value
+            items = pending.pop()
+            expr = stop.value
+            continue
+        expr = parse_operand(sub_depth, ctx, sub_bp)
+        if expr is None:
+            pending.append(items)
+            items = expression_items(sub_depth, ctx, sub_bp)
+
+
+def parse_operand(depth: int, ctx: Context, ctx_bp: int) -> Identifier | Literal | None:
+    """
+    the expression if it is a single identifier or literal, as most operands are, parsed without a generator.
+    None if it is not, nothing is consumed then
+    """
+    idx = ctx.token_idx + 1
+    if idx < ctx.hi:
+        entry = led_operators[depth == 0].get(ctx.tokens[idx].kind_)
+        if entry is not None and entry[0] > ctx_bp:  # an operator binding it follows
+            return None
+    return parse_atom(ctx)
+
+
+def parse_atom(ctx: Context) -> Identifier | Literal | None:
+    """ the identifier or literal at the current token, None if it is not one, e.g. the identifier of a function call """
+    idx = ctx.token_idx
+    if idx >= ctx.hi:
+        return None
+    token = ctx.tokens[idx]
+    kind = token.kind_
+    if kind == TokenKind.Identifier:
+        if idx + 1 < ctx.hi and ctx.tokens[idx + 1].kind_ == TokenKind.LParen:
+            return None
+        ctx.consume()
+        return Identifier(ldx=token.ldx, cdx=token.cdx, tokens=[token], identifier=token)
+    if kind == TokenKind.Literal or kind == TokenKind.StringLiteral:
+        ctx.consume()
+        return Literal(ldx=token.ldx, cdx=token.cdx, tokens=[token], literal=token)
+    return None
+
 
-    lhs = nud(ctx=ctx, token=token, depth=depth)
+def expression_items(depth: int, ctx: Context, ctx_bp: int) -> SubExpression:
+    lhs = parse_atom(ctx)
+    if lhs is None:
+        token = ctx.current()
+        if token is None or token.kind_ == TokenKind.EOF:
+            log.fatal(f"no tokens to parse expression\n"
+                      f"{ctx.src_info.error_context(ctx.near().ldx, ctx.near().cdx)}\n")
+            raise ParserError
+        handler = nud_handlers.get(token.kind_)
+        if handler is None:
+            log.fatal(f"invalid token `{token}` for nud\n"
+                      f"{ctx.src_info.error_context(token.ldx, token.cdx)}\n")
+            raise ParserError
+        lhs = yield from handler(ctx, token, depth)
+    # one lookup per operator, for whether it continues the expression, its binding power and its handler
+    operators = led_operators[depth == 0]
     while True:
-        # log.hint(f"lhs: {lhs}, ctx_bp: {ctx_bp}\n")
         operator = ctx.current()
-        if operator is None or operator.kind_ == TokenKind.EOF:
+        if operator is None:
             break
-        if operator.kind_ not in led_prefix:
+        entry = operators.get(operator.kind_)
+        if entry is None:  # e.g. EOF, ',' or ')'
             break
-        obp = bp(token=operator, prefix=False, assign_statement=depth==0)
-        # log.hint(f"operator: {operator}, bp: {obp}\n")
-        if bp(token=operator, prefix=False, assign_statement=depth==0) <= ctx_bp:
+        obp, handler = entry
+        if obp <= ctx_bp:
             break
-        lhs = led(ctx=ctx, operator=operator, lhs=lhs, depth=depth)
+        lhs = yield from handler(ctx, operator, lhs, depth)
     return lhs
 
 
-def parse_args(depth: int, ctx: Context, ctx_bp: int, stop_by: TokenKind) -> Args:
+def parse_args(depth: int, ctx: Context, ctx_bp: int, stop_by: TokenKind) -> SubExpression:
     token = ctx.current()
     ldx = token.ldx
     cdx = token.cdx
 
-    tokens = []
+    start_idx = ctx.token_idx
+    end_idx = start_idx  # the tokens are the args and the separators, the stop token behind the last arg included
     args = []
     while True:
         token = ctx.current()
         if token is None or token.kind_ == stop_by:
             break
-        expr = parse_expression(depth=depth, ctx=ctx, ctx_bp=ctx_bp)
-        tokens.extend(expr.tokens)
+        expr = yield depth, ctx_bp
         args.append(expr)
         token = ctx.current()
         if token is None or token.kind_ != TokenKind.Comma and token.kind_ != stop_by:
             log.fatal(f"invalid syntax for argument list, expecting ',' or {stop_by}\n"
                       f"{ctx.src_info.error_context(ldx=ctx.near().ldx, cdx=ctx.near().cdx)}\n")
             raise ParserError
+        end_idx = ctx.token_idx + 1
         if token.kind_ == TokenKind.Comma:
             ctx.consume()
-        tokens.append(token)
-    return Args(ldx=ldx, cdx=cdx, tokens=tokens,
+    return Args(ldx=ldx, cdx=cdx, tokens=ctx.span(start_idx, end_idx),
                 args=args)
 
 
-def nud(ctx: Context, token: Token, depth: int = 0) -> Expression:
-    if token.kind_ == TokenKind.Add:
-        ctx.consume()
-        src = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(token, prefix=True))
-        return UnaryPlus(ldx=token.ldx, cdx=token.cdx, tokens=[token] + src.tokens, expr=src)
-    elif token.kind_ == TokenKind.Sub:
-        ctx.consume()
-        src = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(token, prefix=True))
-        return UnaryMinus(ldx=token.ldx, cdx=token.cdx, tokens=[token] + src.tokens, expr=src)
-    elif token.kind_ == TokenKind.BitAnd:
-        ctx.consume()
-        src = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(token, prefix=True))
-        return ReducedAnd(ldx=token.ldx, cdx=token.cdx, tokens=[token] + src.tokens, expr=src)
-    elif token.kind_ == TokenKind.BitOr:
-        ctx.consume()
-        src = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(token, prefix=True))
-        return ReducedOr(ldx=token.ldx, cdx=token.cdx, tokens=[token] + src.tokens, expr=src)
-    elif token.kind_ == TokenKind.BitXor:
-        ctx.consume()
-        src = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(token, prefix=True))
-        return ReducedXor(ldx=token.ldx, cdx=token.cdx, tokens=[token] + src.tokens, expr=src)
-    elif token.kind_ == TokenKind.BitNot:
-        ctx.consume()
-        src = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(token, prefix=True))
-        return BitNot(ldx=token.ldx, cdx=token.cdx, tokens=[token] + src.tokens, expr=src)
-    elif token.kind_ == TokenKind.LogicNot:
-        ctx.consume()
-        src = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(token, prefix=True))
-        return LogicNot(ldx=token.ldx, cdx=token.cdx, tokens=[token] + src.tokens, expr=src)
-    elif token.kind_ == TokenKind.LParen:
-        start_idx = ctx.token_idx
+def nud_unary(ctx: Context, token: Token, depth: int) -> SubExpression:
+    start_idx = ctx.token_idx
+    ctx.consume()
+    src = yield depth + 1, prefix_bp[token.kind_]
+    return unary_nodes[token.kind_](ldx=token.ldx, cdx=token.cdx, tokens=ctx.span(start_idx, ctx.token_idx),
+                                    expr=src)
+
+
+def nud_parenthesis(ctx: Context, token: Token, depth: int) -> SubExpression:
+    start_idx = ctx.token_idx
+    ctx.consume()
+    expr = yield depth + 1, 0
+    token = ctx.current()
+    end_idx = ctx.token_idx
+    if token.kind_ != TokenKind.RParen:
+        log.fatal(f"invalid syntax for expression, no matching ')' for '(',\n"
+                  f"{ctx.src_info.error_context(token.ldx, token.cdx)}\n")
+        raise ParserError
+    ctx.consume()
+    return Parenthesis(ldx=token.ldx, cdx=token.cdx, tokens=ctx.span(start_idx, end_idx + 1), expression=expr)
+
+
+def nud_unpacked_array_cat(ctx: Context, token: Token, depth: int) -> SubExpression:
+    start_idx = ctx.token_idx
+    ldx = token.ldx
+    cdx = token.cdx
+    ctx.consume()
+    args = yield from parse_args(depth=depth + 1, ctx=ctx, ctx_bp=0, stop_by=TokenKind.RBrace)
+    token = ctx.current()
+    if token.kind_ != TokenKind.RBrace:
+        log.fatal(f"invalid syntax for expression, no matching '}}' for '{{',\n"
+                  f"{ctx.src_info.error_context(token.ldx, token.cdx)}\n")
+        raise ParserError
+    end_idx = ctx.token_idx
+    ctx.consume()
+    return UnpackedArrayCat(ldx=ldx, cdx=cdx, tokens=ctx.span(start_idx, end_idx + 1),
+                            args=args)
+
+
+def nud_brace(ctx: Context, token: Token, depth: int) -> SubExpression:
+    start_idx = ctx.token_idx
+    ldx = token.ldx
+    cdx = token.cdx
+    ctx.consume()
+
+    first_expr = yield depth + 1, 0
+    token = ctx.current()
+    if token.kind_ == TokenKind.LBrace:
         ctx.consume()
-        expr = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=0)
+        args = yield from parse_args(depth=depth+1, ctx=ctx, ctx_bp=0, stop_by=TokenKind.RBrace)
         token = ctx.current()
-        end_idx = ctx.token_idx
-        if token.kind_ != TokenKind.RParen:
-            log.fatal(f"invalid syntax for expression, no matching ')' for '(',\n"
+        if token.kind_ != TokenKind.RBrace:
+            log.fatal(f"invalid syntax for expression, no matching '}}' for '{{',\n"
                       f"{ctx.src_info.error_context(token.ldx, token.cdx)}\n")
+            raise ParserError
         ctx.consume()
-        return Parenthesis(ldx=token.ldx, cdx=token.cdx, tokens=ctx.tokens[start_idx:end_idx + 1], expression=expr)
-    elif token.kind_ == TokenKind.SingleQuoteLBrace:
-        start_idx = ctx.token_idx
-        ldx = token.ldx
-        cdx = token.cdx
-        ctx.consume()
-        args = parse_args(depth=depth + 1, ctx=ctx, ctx_bp=0, stop_by=TokenKind.RBrace)
         token = ctx.current()
         if token.kind_ != TokenKind.RBrace:
             log.fatal(f"invalid syntax for expression, no matching '}}' for '{{',\n"
@@ -178,482 +248,170 @@ def nud(ctx: Context, token: Token, depth: int = 0) -> Expression:
             raise ParserError
         end_idx = ctx.token_idx
         ctx.consume()
-        return UnpackedArrayCat(ldx=ldx, cdx=cdx, tokens=ctx.tokens[start_idx:end_idx + 1],
-                                args=args)
-
-    elif token.kind_ == TokenKind.LBrace:
-        start_idx = ctx.token_idx
-        ldx = token.ldx
-        cdx = token.cdx
-        ctx.consume()
-
-        first_expr = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=0)
+        return Repeat(ldx=ldx, cdx=cdx, tokens=ctx.span(start_idx, end_idx + 1),
+                      times=first_expr, expr=args)
+    else:
+        ctx.token_idx = start_idx + 1
+        args = yield from parse_args(depth=depth + 1, ctx=ctx, ctx_bp=0, stop_by=TokenKind.RBrace)
         token = ctx.current()
-        if token.kind_ == TokenKind.LBrace:
-            ctx.consume()
-            args = parse_args(depth=depth+1, ctx=ctx, ctx_bp=0, stop_by=TokenKind.RBrace)
-            token = ctx.current()
-            if token.kind_ != TokenKind.RBrace:
-                log.fatal(f"invalid syntax for expression, no matching '}}' for '{{',\n"
-                          f"{ctx.src_info.error_context(token.ldx, token.cdx)}\n")
-                raise ParserError
-            ctx.consume()
-            token = ctx.current()
-            if token.kind_ != TokenKind.RBrace:
-                log.fatal(f"invalid syntax for expression, no matching '}}' for '{{',\n"
-                          f"{ctx.src_info.error_context(token.ldx, token.cdx)}\n")
-                raise ParserError
-            end_idx = ctx.token_idx
-            ctx.consume()
-            return Repeat(ldx=ldx, cdx=cdx, tokens=ctx.tokens[start_idx:end_idx+1],
-                          times=first_expr, expr=args)
-        else:
-            ctx.token_idx = start_idx + 1
-            args = parse_args(depth=depth + 1, ctx=ctx, ctx_bp=0, stop_by=TokenKind.RBrace)
-            token = ctx.current()
-            if token.kind_ != TokenKind.RBrace:
-                log.fatal(f"invalid syntax for expression, no matching '}}' for '{{',\n"
-                          f"{ctx.src_info.error_context(token.ldx, token.cdx)}\n")
-                raise ParserError
-            end_idx = ctx.token_idx
-            ctx.consume()
-            return Concatenation(ldx=ldx, cdx=cdx, tokens=ctx.tokens[start_idx:end_idx+1],
-                                 args=args)
-    elif token.kind_ in [TokenKind.Literal, TokenKind.StringLiteral]:
-        ctx.consume()
-        return Literal(ldx=token.ldx, cdx=token.cdx, tokens=[token], literal=token)
-    elif token.kind_ == TokenKind.Identifier:
+        if token.kind_ != TokenKind.RBrace:
+            log.fatal(f"invalid syntax for expression, no matching '}}' for '{{',\n"
+                      f"{ctx.src_info.error_context(token.ldx, token.cdx)}\n")
+            raise ParserError
+        end_idx = ctx.token_idx
         ctx.consume()
-        identifier = Identifier(ldx=token.ldx, cdx=token.cdx, tokens=[token], identifier=token)
-        token = ctx.current()
-        if token is None:
-            return identifier
-        ldx = token.ldx
-        cdx = token.cdx
-        if token.kind_ == TokenKind.LParen:
-            lparen = token
-            ctx.consume()
-            args = parse_args(depth=depth+1, ctx=ctx, ctx_bp=0, stop_by=TokenKind.RParen)
-            token = ctx.current()
-            if token.kind_ != TokenKind.RParen:
-                log.fatal(f"syntax error, no matching ')' for '(' in expression,\n"
-                          f"{ctx.src_info.error_context(token.ldx, token.cdx)}\n")
-                raise ParserError
-            ctx.consume()
-            return FuncCall(ldx=ldx, cdx=cdx, tokens=identifier.tokens+[lparen]+args.tokens+[token],
-                            identifier=identifier,
-                            args=args)
-        else:
-            return identifier
-    else:
-        log.fatal(f"invalid token `{token}` for nud\n"
-                  f"{ctx.src_info.error_context(token.ldx, token.cdx)}\n")
-        raise ParserError
+        return Concatenation(ldx=ldx, cdx=cdx, tokens=ctx.span(start_idx, end_idx + 1),
+                             args=args)
 
 
-def led(ctx: Context, operator: Token, lhs: Expression, depth: int) -> Expression:
-    if operator.kind_ == TokenKind.LBracket:
+def nud_identifier(ctx: Context, token: Token, depth: int) -> SubExpression:
+    start_idx = ctx.token_idx
+    ctx.consume()
+    identifier = Identifier(ldx=token.ldx, cdx=token.cdx, tokens=[token], identifier=token)
+    token = ctx.current()
+    if token is None:
+        return identifier
+    ldx = token.ldx
+    cdx = token.cdx
+    if token.kind_ == TokenKind.LParen:
         ctx.consume()
-        expr_l = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=0)
+        args = yield from parse_args(depth=depth+1, ctx=ctx, ctx_bp=0, stop_by=TokenKind.RParen)
         token = ctx.current()
-        if token.kind_ == TokenKind.RBracket:
-            ctx.consume()
-            return Index(ldx=operator.ldx, cdx=operator.cdx,
-                         tokens=lhs.tokens + [operator] + expr_l.tokens + [token],
-                         src=lhs,
-                         idx=expr_l)
-        if token.kind_ != TokenKind.Colon:
-            log.fatal(f"invalid syntax for expression, expecting ']' or ':',\n"
+        if token.kind_ != TokenKind.RParen:
+            log.fatal(f"syntax error, no matching ')' for '(' in expression,\n"
                       f"{ctx.src_info.error_context(token.ldx, token.cdx)}\n")
-        colon = token
+            raise ParserError
         ctx.consume()
-        expr_r = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=0)
-        token = ctx.current()
-        if token.kind_ != TokenKind.RBracket:
-            log.fatal(f"invalid syntax for expression, expecting ']'\n"
-                      f"{ctx.src_info.error_context(token.ldx, token.cdx)}\n")
+        return FuncCall(ldx=ldx, cdx=cdx, tokens=ctx.span(start_idx, ctx.token_idx),
+                        identifier=identifier,
+                        args=args)
+    else:
+        return identifier
+
+
+unary_nodes: dict[TokenKind, type[UnaryOperator]] = {
+    TokenKind.Add: UnaryPlus, TokenKind.Sub: UnaryMinus,
+    TokenKind.BitAnd: ReducedAnd, TokenKind.BitOr: ReducedOr, TokenKind.BitXor: ReducedXor,
+    TokenKind.BitNot: BitNot, TokenKind.LogicNot: LogicNot}
+nud_handlers = dict.fromkeys(unary_nodes, nud_unary) | {
+    TokenKind.LParen: nud_parenthesis,
+    TokenKind.SingleQuoteLBrace: nud_unpacked_array_cat,
+    TokenKind.LBrace: nud_brace,
+    TokenKind.Identifier: nud_identifier}
+
+
+def led_index(ctx: Context, operator: Token, lhs: Expression, depth: int) -> SubExpression:
+    start_idx = ctx.token_idx - len(lhs.tokens)  # lhs ends right before the operator
+    ctx.consume()
+    expr_l = yield depth + 1, 0
+    token = ctx.current()
+    if token.kind_ == TokenKind.RBracket:
         ctx.consume()
-        return Slice(ldx=operator.ldx, cdx=operator.cdx,
-                     tokens=lhs.tokens + [operator] + expr_l.tokens + [colon] + expr_r.tokens + [token],
+        return Index(ldx=operator.ldx, cdx=operator.cdx,
+                     tokens=ctx.span(start_idx, ctx.token_idx),
                      src=lhs,
-                     left_idx=expr_l,
-                     right_idx=expr_r)
-    elif operator.kind_ == TokenKind.QuestionMark:
-        ctx.consume()
-        true_val = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=0)
-        token = ctx.current()
-        if token.kind_ != TokenKind.Colon:
-            log.fatal(f"invalid syntax for expression, expecting ':'\n"
-                      f"{ctx.src_info.error_context(token.ldx, token.cdx)}\n")
-        colon = token
-        ctx.consume()
-        false_val = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=0)
-        return Conditional(ldx=operator.ldx, cdx=operator.cdx,
-                           tokens=lhs.tokens + [operator] + true_val.tokens + [colon] + false_val.tokens,
-                           condition=lhs,
-                           true_expr=true_val,
-                           false_expr=false_val)
-    elif operator.kind_ == TokenKind.ScopeResolution:
-        ctx.consume()
-        name = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(operator))
-        return ScopeResolution(ldx=operator.ldx, cdx=operator.cdx,
-                               tokens=lhs.tokens + [operator] + name.tokens,
-                               left=lhs,
-                               right=name)
-    elif operator.kind_ == TokenKind.Dot:
-        ctx.consume()
-        name = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(operator))
-        return MemberAccess(ldx=operator.ldx, cdx=operator.cdx,
-                            tokens=lhs.tokens + [operator] + name.tokens,
-                            left=lhs,
-                            right=name)
-    elif operator.kind_ == TokenKind.Pow:
-        ctx.consume()
-        rop = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(operator))
-        return Pow(ldx=operator.ldx, cdx=operator.cdx,
-                   tokens=lhs.tokens + [operator] + rop.tokens,
-                   left=lhs,
-                   right=rop)
-    elif operator.kind_ == TokenKind.Mul:
-        ctx.consume()
-        rop = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(operator))
-        return Mul(ldx=operator.ldx, cdx=operator.cdx,
-                   tokens=lhs.tokens + [operator] + rop.tokens,
-                   left=lhs,
-                   right=rop)
-    elif operator.kind_ == TokenKind.Div:
-        ctx.consume()
-        rop = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(operator))
-        return Div(ldx=operator.ldx, cdx=operator.cdx,
-                   tokens=lhs.tokens + [operator] + rop.tokens,
-                   left=lhs,
-                   right=rop)
-    elif operator.kind_ == TokenKind.Mod:
-        ctx.consume()
-        rop = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(operator))
-        return Mod(ldx=operator.ldx, cdx=operator.cdx,
-                   tokens=lhs.tokens + [operator] + rop.tokens,
-                   left=lhs,
-                   right=rop)
-    elif operator.kind_ == TokenKind.Add:
-        ctx.consume()
-        rop = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(operator, prefix=False))
-        return Add(ldx=operator.ldx, cdx=operator.cdx,
-                   tokens=lhs.tokens + [operator] + rop.tokens,
-                   left=lhs,
-                   right=rop)
-    elif operator.kind_ == TokenKind.Sub:
-        ctx.consume()
-        rop = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(operator, prefix=False))
-        return Sub(ldx=operator.ldx, cdx=operator.cdx,
-                   tokens=lhs.tokens + [operator] + rop.tokens,
-                   left=lhs,
-                   right=rop)
-    elif operator.kind_ == TokenKind.LogicLeftShift:
-        ctx.consume()
-        rop = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(operator))
-        return LogicLeftShift(ldx=operator.ldx, cdx=operator.cdx,
-                              tokens=lhs.tokens + [operator] + rop.tokens,
-                              left=lhs,
-                              right=rop)
-    elif operator.kind_ == TokenKind.LogicRightShift:
-        ctx.consume()
-        rop = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(operator))
-        return LogicRightShift(ldx=operator.ldx, cdx=operator.cdx,
-                               tokens=lhs.tokens + [operator] + rop.tokens,
-                               left=lhs,
-                               right=rop)
-    elif operator.kind_ == TokenKind.ArithLeftShift:
-        ctx.consume()
-        rop = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(operator))
-        return ArithmeticLeftShift(ldx=operator.ldx, cdx=operator.cdx,
-                                   tokens=lhs.tokens + [operator] + rop.tokens,
-                                   left=lhs,
-                                   right=rop)
-    elif operator.kind_ == TokenKind.ArithRightShift:
-        ctx.consume()
-        rop = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(operator))
-        return ArithmeticRightShift(ldx=operator.ldx, cdx=operator.cdx,
-                                    tokens=lhs.tokens + [operator] + rop.tokens,
-                                    left=lhs,
-                                    right=rop)
-    elif operator.kind_ == TokenKind.GreaterThan:
-        ctx.consume()
-        rop = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(operator))
-        return GreaterThan(ldx=operator.ldx, cdx=operator.cdx,
-                           tokens=lhs.tokens + [operator] + rop.tokens,
-                           left=lhs,
-                           right=rop)
-    elif operator.kind_ == TokenKind.GreaterEqual:
-        ctx.consume()
-        rop = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(operator))
-        return GreaterThanEqual(ldx=operator.ldx, cdx=operator.cdx,
-                                tokens=lhs.tokens + [operator] + rop.tokens,
-                                left=lhs,
-                                right=rop)
-    elif operator.kind_ == TokenKind.LessThan:
-        ctx.consume()
-        rop = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(operator))
-        return LessThan(ldx=operator.ldx, cdx=operator.cdx,
-                        tokens=lhs.tokens + [operator] + rop.tokens,
-                        left=lhs,
-                        right=rop)
-    elif operator.kind_ == TokenKind.LessEqual:
-        ctx.consume()
-        if depth != 0:
-            rop = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(operator, assign_statement=False))
-            return LessThanEqual(ldx=operator.ldx, cdx=operator.cdx,
-                                 tokens=lhs.tokens + [operator] + rop.tokens,
-                                 left=lhs,
-                                 right=rop)
-        else:
-            delay = None
-            token = ctx.current()
-            if token.kind_ == TokenKind.SharpPat:
-                delay = parse_delay(ctx=ctx)
-            rop = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(operator, assign_statement=True))
-            return NonBlockingAssignment(ldx=operator.ldx, cdx=operator.cdx,
-                                         tokens=lhs.tokens + [operator] + rop.tokens,
-                                         left=lhs,
-                                         delay=delay,
-                                         right=rop)
-    elif operator.kind_ == TokenKind.Equal:
-        ctx.consume()
-        rop = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(operator))
-        return Equal(ldx=operator.ldx, cdx=operator.cdx,
-                     tokens=lhs.tokens + [operator] + rop.tokens,
-                     left=lhs,
-                     right=rop)
-    elif operator.kind_ == TokenKind.InEqual:
-        ctx.consume()
-        rop = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(operator))
-        return InEqual(ldx=operator.ldx, cdx=operator.cdx,
-                       tokens=lhs.tokens + [operator] + rop.tokens,
-                       left=lhs,
-                       right=rop)
-    elif operator.kind_ == TokenKind.CaseEqual:
-        ctx.consume()
-        rop = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(operator))
-        return CaseEqual(ldx=operator.ldx, cdx=operator.cdx,
-                         tokens=lhs.tokens + [operator] + rop.tokens,
-                         left=lhs,
-                         right=rop)
-    elif operator.kind_ == TokenKind.CaseInEqual:
-        ctx.consume()
-        rop = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(operator))
-        return CaseInEqual(ldx=operator.ldx, cdx=operator.cdx,
-                           tokens=lhs.tokens + [operator] + rop.tokens,
-                           left=lhs,
-                           right=rop)
-    elif operator.kind_ == TokenKind.WildcardEqual:
-        ctx.consume()
-        rop = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(operator))
-        return WildcardEqual(ldx=operator.ldx, cdx=operator.cdx,
-                             tokens=lhs.tokens + [operator] + rop.tokens,
-                             left=lhs,
-                             right=rop)
-    elif operator.kind_ == TokenKind.WildcardInEqual:
-        ctx.consume()
-        rop = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(operator))
-        return WildcardInEqual(ldx=operator.ldx, cdx=operator.cdx,
-                               tokens=lhs.tokens + [operator] + rop.tokens,
-                               left=lhs,
-                               right=rop)
-    elif operator.kind_ == TokenKind.BitAnd:
-        ctx.consume()
-        rop = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(operator, prefix=False))
-        return BitAnd(ldx=operator.ldx, cdx=operator.cdx,
-                      tokens=lhs.tokens + [operator] + rop.tokens,
-                      left=lhs,
-                      right=rop)
-    elif operator.kind_ == TokenKind.BitXor:
-        ctx.consume()
-        rop = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(operator, prefix=False))
-        return BitXor(ldx=operator.ldx, cdx=operator.cdx,
-                      tokens=lhs.tokens + [operator] + rop.tokens,
-                      left=lhs,
-                      right=rop)
-    elif operator.kind_ == TokenKind.BitOr:
-        ctx.consume()
-        rop = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(operator, prefix=False))
-        return BitOr(ldx=operator.ldx, cdx=operator.cdx,
-                     tokens=lhs.tokens + [operator] + rop.tokens,
-                     left=lhs,
-                     right=rop)
-    elif operator.kind_ == TokenKind.LogicAnd:
-        ctx.consume()
-        rop = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(operator, prefix=False))
-        return LogicAnd(ldx=operator.ldx, cdx=operator.cdx,
-                        tokens=lhs.tokens + [operator] + rop.tokens,
-                        left=lhs,
-                        right=rop)
-    elif operator.kind_ == TokenKind.LogicOr:
-        ctx.consume()
-        rop = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(operator, prefix=False))
-        return LogicOr(ldx=operator.ldx, cdx=operator.cdx,
-                       tokens=lhs.tokens + [operator] + rop.tokens,
-                       left=lhs,
-                       right=rop)
-    elif operator.kind_ == TokenKind.Assignment:
-        ctx.consume()
-        delay = None
-        token = ctx.current()
-        if token.kind_ == TokenKind.SharpPat:
-            delay = parse_delay(ctx=ctx)
-        rop = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(operator, assign_statement=True))
-        return Assignment(ldx=operator.ldx, cdx=operator.cdx,
-                          tokens=lhs.tokens + [operator] + rop.tokens,
-                          left=lhs,
-                          delay=delay,
-                          right=rop)
-    elif operator.kind_ == TokenKind.AddAssignment:
-        ctx.consume()
-        delay = None
-        token = ctx.current()
-        if token.kind_ == TokenKind.SharpPat:
-            delay = parse_delay(ctx=ctx)
-        rop = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(operator, assign_statement=True))
-        return AddAssignment(ldx=operator.ldx, cdx=operator.cdx,
-                             tokens=lhs.tokens + [operator] + rop.tokens,
-                             left=lhs,
-                             delay=delay,
-                             right=rop)
-    elif operator.kind_ == TokenKind.SubAssignment:
-        ctx.consume()
-        delay = None
-        token = ctx.current()
-        if token.kind_ == TokenKind.SharpPat:
-            delay = parse_delay(ctx=ctx)
-        rop = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(operator, assign_statement=True))
-        return SubAssignment(ldx=operator.ldx, cdx=operator.cdx,
-                             tokens=lhs.tokens + [operator] + rop.tokens,
-                             left=lhs,
-                             delay=delay,
-                             right=rop)
-    elif operator.kind_ == TokenKind.MulAssignment:
-        ctx.consume()
-        delay = None
-        token = ctx.current()
-        if token.kind_ == TokenKind.SharpPat:
-            delay = parse_delay(ctx=ctx)
-        rop = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(operator, assign_statement=True))
-        return MulAssignment(ldx=operator.ldx, cdx=operator.cdx,
-                             tokens=lhs.tokens + [operator] + rop.tokens,
-                             left=lhs,
-                             delay=delay,
-                             right=rop)
-    elif operator.kind_ == TokenKind.DivAssignment:
-        ctx.consume()
-        delay = None
-        token = ctx.current()
-        if token.kind_ == TokenKind.SharpPat:
-            delay = parse_delay(ctx=ctx)
-        rop = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(operator, assign_statement=True))
-        return DivAssignment(ldx=operator.ldx, cdx=operator.cdx,
-                             tokens=lhs.tokens + [operator] + rop.tokens,
-                             left=lhs,
-                             delay=delay,
-                             right=rop)
-    elif operator.kind_ == TokenKind.ModAssignment:
-        ctx.consume()
-        delay = None
-        token = ctx.current()
-        if token.kind_ == TokenKind.SharpPat:
-            delay = parse_delay(ctx=ctx)
-        rop = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(operator, assign_statement=True))
-        return ModAssignment(ldx=operator.ldx, cdx=operator.cdx,
-                             tokens=lhs.tokens + [operator] + rop.tokens,
-                             left=lhs,
-                             delay=delay,
-                             right=rop)
-    elif operator.kind_ == TokenKind.BitAndAssignment:
-        ctx.consume()
-        delay = None
-        token = ctx.current()
-        if token.kind_ == TokenKind.SharpPat:
-            delay = parse_delay(ctx=ctx)
-        rop = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(operator, assign_statement=True))
-        return BitAndAssignment(ldx=operator.ldx, cdx=operator.cdx,
-                                tokens=lhs.tokens + [operator] + rop.tokens,
-                                left=lhs,
-                                delay=delay,
-                                right=rop)
-    elif operator.kind_ == TokenKind.BitOrAssignment:
-        ctx.consume()
-        delay = None
-        token = ctx.current()
-        if token.kind_ == TokenKind.SharpPat:
-            delay = parse_delay(ctx=ctx)
-        rop = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(operator, assign_statement=True))
-        return BitOrAssignment(ldx=operator.ldx, cdx=operator.cdx,
-                               tokens=lhs.tokens + [operator] + rop.tokens,
-                               left=lhs,
-                               delay=delay,
-                               right=rop)
-    elif operator.kind_ == TokenKind.BitXorAssignment:
-        ctx.consume()
-        delay = None
-        token = ctx.current()
-        if token.kind_ == TokenKind.SharpPat:
-            delay = parse_delay(ctx=ctx)
-        rop = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(operator, assign_statement=True))
-        return BitXorAssignment(ldx=operator.ldx, cdx=operator.cdx,
-                                tokens=lhs.tokens + [operator] + rop.tokens,
-                                left=lhs,
-                                delay=delay,
-                                right=rop)
-    elif operator.kind_ == TokenKind.LogicLeftShiftAssignment:
-        ctx.consume()
-        delay = None
-        token = ctx.current()
-        if token.kind_ == TokenKind.SharpPat:
-            delay = parse_delay(ctx=ctx)
-        rop = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(operator, assign_statement=True))
-        return LogicLeftShiftAssignment(ldx=operator.ldx, cdx=operator.cdx,
-                                        tokens=lhs.tokens + [operator] + rop.tokens,
+                     idx=expr_l)
+    if token.kind_ != TokenKind.Colon:
+        log.fatal(f"invalid syntax for expression, expecting ']' or ':',\n"
+                  f"{ctx.src_info.error_context(token.ldx, token.cdx)}\n")
+        raise ParserError
+    ctx.consume()
+    expr_r = yield depth + 1, 0
+    token = ctx.current()
+    if token.kind_ != TokenKind.RBracket:
+        log.fatal(f"invalid syntax for expression, expecting ']'\n"
+                  f"{ctx.src_info.error_context(token.ldx, token.cdx)}\n")
+        raise ParserError
+    ctx.consume()
+    return Slice(ldx=operator.ldx, cdx=operator.cdx,
+                 tokens=ctx.span(start_idx, ctx.token_idx),
+                 src=lhs,
+                 left_idx=expr_l,
+                 right_idx=expr_r)
+
+
+def led_conditional(ctx: Context, operator: Token, lhs: Expression, depth: int) -> SubExpression:
+    start_idx = ctx.token_idx - len(lhs.tokens)  # lhs ends right before the operator
+    ctx.consume()
+    true_val = yield depth + 1, 0
+    token = ctx.current()
+    if token.kind_ != TokenKind.Colon:
+        log.fatal(f"invalid syntax for expression, expecting ':'\n"
+                  f"{ctx.src_info.error_context(token.ldx, token.cdx)}\n")
+        raise ParserError
+    ctx.consume()
+    false_val = yield depth + 1, 0
+    return Conditional(ldx=operator.ldx, cdx=operator.cdx,
+                       tokens=ctx.span(start_idx, ctx.token_idx),
+                       condition=lhs,
+                       true_expr=true_val,
+                       false_expr=false_val)
+
+
+def led_binary(ctx: Context, operator: Token, lhs: Expression, depth: int) -> SubExpression:
+    start_idx = ctx.token_idx - len(lhs.tokens)  # lhs ends right before the operator
+    ctx.consume()
+    rop = yield depth + 1, infix_bp[operator.kind_]
+    return binary_nodes[operator.kind_](ldx=operator.ldx, cdx=operator.cdx,
+                                        tokens=ctx.span(start_idx, ctx.token_idx),
                                         left=lhs,
-                                        delay=delay,
                                         right=rop)
-    elif operator.kind_ == TokenKind.LogicRightShiftAssignment:
-        ctx.consume()
-        delay = None
-        token = ctx.current()
-        if token.kind_ == TokenKind.SharpPat:
-            delay = parse_delay(ctx=ctx)
-        rop = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(operator, assign_statement=True))
-        return LogicRightShiftAssignment(ldx=operator.ldx, cdx=operator.cdx,
-                                         tokens=lhs.tokens + [operator] + rop.tokens,
-                                         left=lhs,
-                                         delay=delay,
-                                         right=rop)
-    elif operator.kind_ == TokenKind.ArithLeftShiftAssignment:
-        ctx.consume()
-        delay = None
-        token = ctx.current()
-        if token.kind_ == TokenKind.SharpPat:
-            delay = parse_delay(ctx=ctx)
-        rop = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(operator, assign_statement=True))
-        return ArithmeticLeftShiftAssignment(ldx=operator.ldx, cdx=operator.cdx,
-                                             tokens=lhs.tokens + [operator] + rop.tokens,
-                                             left=lhs,
-                                             delay=delay,
-                                             right=rop)
-    elif operator.kind_ == TokenKind.ArithRightShiftAssignment:
-        ctx.consume()
-        delay = None
-        token = ctx.current()
-        if token.kind_ == TokenKind.SharpPat:
-            delay = parse_delay(ctx=ctx)
-        rop = parse_expression(depth=depth+1, ctx=ctx, ctx_bp=bp(operator, assign_statement=True))
-        return ArithmeticRightShiftAssignment(ldx=operator.ldx, cdx=operator.cdx,
-                                              tokens=lhs.tokens + [operator] + rop.tokens,
-                                              left=lhs,
-                                              delay=delay,
-                                              right=rop)
-    else:
-        log.fatal(f"syntax error, invalid token `{operator}` as an operator\n"
-                  f"{ctx.src_info.error_context(operator.ldx, operator.cdx)}\n")
-        raise ParserError
+
+
+def led_less_equal(ctx: Context, operator: Token, lhs: Expression, depth: int) -> SubExpression:
+    if depth != 0:
+        return (yield from led_binary(ctx, operator, lhs, depth))
+    return (yield from led_assignment(ctx, operator, lhs, depth))
+
+
+def led_assignment(ctx: Context, operator: Token, lhs: Expression, depth: int) -> SubExpression:
+    start_idx = ctx.token_idx - len(lhs.tokens)  # lhs ends right before the operator
+    ctx.consume()
+    delay = None
+    token = ctx.current()
+    if token.kind_ == TokenKind.SharpPat:
+        delay = parse_delay(ctx=ctx)
+    rop = yield depth + 1, assign_statement_bp[operator.kind_]
+    return assignment_nodes[operator.kind_](ldx=operator.ldx, cdx=operator.cdx,
+                                            tokens=ctx.span(start_idx, ctx.token_idx),
+                                            left=lhs,
+                                            delay=delay,
+                                            right=rop)
+
+
+binary_nodes: dict[TokenKind, type[BinaryOperator]] = {
+    TokenKind.ScopeResolution: ScopeResolution, TokenKind.Dot: MemberAccess,
+    TokenKind.Pow: Pow, TokenKind.Mul: Mul, TokenKind.Div: Div, TokenKind.Mod: Mod,
+    TokenKind.Add: Add, TokenKind.Sub: Sub,
+    TokenKind.LogicLeftShift: LogicLeftShift, TokenKind.LogicRightShift: LogicRightShift,
+    TokenKind.ArithLeftShift: ArithmeticLeftShift, TokenKind.ArithRightShift: ArithmeticRightShift,
+    TokenKind.GreaterThan: GreaterThan, TokenKind.GreaterEqual: GreaterThanEqual,
+    TokenKind.LessThan: LessThan, TokenKind.LessEqual: LessThanEqual,
+    TokenKind.Equal: Equal, TokenKind.InEqual: InEqual,
+    TokenKind.CaseEqual: CaseEqual, TokenKind.CaseInEqual: CaseInEqual,
+    TokenKind.WildcardEqual: WildcardEqual, TokenKind.WildcardInEqual: WildcardInEqual,
+    TokenKind.BitAnd: BitAnd, TokenKind.BitXor: BitXor, TokenKind.BitOr: BitOr,
+    TokenKind.LogicAnd: LogicAnd, TokenKind.LogicOr: LogicOr}
+assignment_nodes: dict[TokenKind, type[BaseAssignment]] = {
+    TokenKind.LessEqual: NonBlockingAssignment,
+    TokenKind.Assignment: Assignment, TokenKind.AddAssignment: AddAssignment,
+    TokenKind.SubAssignment: SubAssignment, TokenKind.MulAssignment: MulAssignment,
+    TokenKind.DivAssignment: DivAssignment, TokenKind.ModAssignment: ModAssignment,
+    TokenKind.BitAndAssignment: BitAndAssignment, TokenKind.BitOrAssignment: BitOrAssignment,
+    TokenKind.BitXorAssignment: BitXorAssignment,
+    TokenKind.LogicLeftShiftAssignment: LogicLeftShiftAssignment,
+    TokenKind.LogicRightShiftAssignment: LogicRightShiftAssignment,
+    TokenKind.ArithLeftShiftAssignment: ArithmeticLeftShiftAssignment,
+    TokenKind.ArithRightShiftAssignment: ArithmeticRightShiftAssignment}
+led_handlers = dict.fromkeys(binary_nodes, led_binary) | dict.fromkeys(assignment_nodes, led_assignment) | {
+    TokenKind.LBracket: led_index,
+    TokenKind.QuestionMark: led_conditional,
+    TokenKind.LessEqual: led_less_equal}
+# the operators continuing an expression, inside an assign statement (depth 0) or not: kind -> (binding power, handler)
+led_operators: dict[bool, dict[TokenKind, tuple[int, typing.Callable[..., SubExpression]]]] = {
+    assign_statement: {kind: (bp_tables[False, assign_statement].get(kind, 0), led_handlers[kind])
+                       for kind in led_prefix}
+    for assign_statement in [False, True]}
 
 
 def parse_delay(ctx: Context):
@@ -674,7 +432,7 @@ def parse_delay(ctx: Context):
         ctx.consume()
     end_idx = ctx.token_idx - 1
 
-    return Delay(ldx=ldx, cdx=cdx, tokens=ctx.tokens[start_idx:end_idx+1], duration=duration, unit=unit)
+    return Delay(ldx=ldx, cdx=cdx, tokens=ctx.span(start_idx, end_idx + 1), duration=duration, unit=unit)
 
 
 if __name__ == "__main__":
@@ -1,11 +1,17 @@
+import argparse
+import concurrent.futures
 import dataclasses
+import glob
 import json
 import os
+import typing
 
 import log
-from lexer import literal_pat_0, literal_pat_1, literal_pat_2
+from cache import DiskCache
+from lexer import literal_pat_0, literal_pat_1, literal_pat_2, map_file
 from parser import Parser, ParserError, SourceInfo
-from syntax.node import DataTypeNode, ModuleNode, AnsiPortDefNode, NonAnsiPortDefNode, PortDefAndInitInBodyNode, ParamDefInBodyNode
+from syntax.node import DataTypeNode, ModuleNode, AnsiPortDefNode, NonAnsiPortDefNode, PortDefAndInitInBodyNode, \
+    ParamDefInBodyNode, node_fields
 from syntax.expression import Expression, Identifier, Literal
 
 log = log.log
@@ -38,18 +44,236 @@ class ModulePrototypeInfo:
     pos: (int, int)
 
 
-def extract_module_prototype_info_from_file_to_yml(i: str, o: str, enable_non_ansi: bool = True):
-    info_s = extract_module_prototype_info_from_file(i, enable_non_ansi)
+class PrototypeCache(DiskCache):
+    """
+    the prototype info of the files, keyed by the file content, the tool version and `enable_non_ansi`
+    """
+    def __init__(self, directory: str, max_age: float = 30 * 24 * 3600, max_size: int = 1 << 30):
+        super().__init__(directory, suffix=".json", max_age=max_age, max_size=max_size)
+
+    def get_info_s(self, key: str) -> list[ModulePrototypeInfo] | None:
+        data = self.get(key)
+        if data is None:
+            return None
+        try:
+            return [module_prototype_info_from_dict(info) for info in json.loads(data)]
+        except (ValueError, KeyError, TypeError):
+            return None  # a corrupted entry, it is overwritten later
+
+    def put_info_s(self, key: str, info_s: list[ModulePrototypeInfo]):
+        self.put(key, json.dumps([dataclasses.asdict(info) for info in info_s]).encode())
+
+
+def module_prototype_info_from_dict(info: dict) -> ModulePrototypeInfo:
+    def pos(val: list[int] | None) -> (int, int):
+        return tuple(val) if val is not None else None
+
+    return ModulePrototypeInfo(
+        name=info["name"],
+        parameters=[ParameterInfo(name=para["name"], data_type=para["data_type"], default_val=para["default_val"],
+                                  pos=pos(para["pos"])) for para in info["parameters"]],
+        port=[PortInfo(name=port["name"], direction=port["direction"], data_type=port["data_type"],
+                       width=port["width"], pos_ansi=pos(port["pos_ansi"]),
+                       pos_non_ansi_0=pos(port["pos_non_ansi_0"]), pos_non_ansi_1=pos(port["pos_non_ansi_1"]))
+              for port in info["port"]],
+        pos=pos(info["pos"]))
+
+
+@dataclasses.dataclass
+class ExtractionFailure:
+    path: str
+    error: str  # the messages logged while extracting, then the type and the message of the exception
+
+
+def collect_source_files(inputs: list[str], suffixes: tuple[str, ...] = (".v", ".sv")) -> list[str]:
+    """
+    inputs:
+        directories, searched recursively for the files with `suffixes`,
+        glob patterns, '**' matches any sub-directories,
+        '.f' filelists, one file per line, '//' and '#' comments, '+incdir+' like options and '-f' nested filelists,
+        relative paths in a filelist are relative to the filelist itself,
+        or the files themselves
+    the files are returned in the order they are found, without duplicates
+    """
+    paths = []
+    for i in inputs:
+        if os.path.isdir(i):
+            for root, dirs, files in os.walk(i):
+                dirs.sort()
+                paths.extend(os.path.join(root, file) for file in sorted(files) if file.endswith(suffixes))
+        elif i.endswith(".f") and os.path.isfile(i):
+            paths.extend(collect_source_files(read_filelist(i), suffixes))
+        elif glob.has_magic(i):
+            paths.extend(path for path in sorted(glob.glob(i, recursive=True)) if os.path.isfile(path))
+        else:
+            paths.append(i)
+    return list(dict.fromkeys(os.path.abspath(path) for path in paths))
+
+
+# the filelist options whose argument is the next word, a library directory or file, which is not a source entry
+filelist_options_with_argument: tuple[str, ...] = ("-y", "-v")
+
+
+def read_filelist(path: str) -> list[str]:
+    base = os.path.dirname(os.path.abspath(path))
+    entries = []
+    with open(path, 'r', encoding="utf-8") as f:
+        words = iter(word for line in f for word in line.split("//")[0].split("#")[0].split())
+        for word in words:
+            if word == "-f" or word == "-F":
+                word = next(words, None)
+                if word is None:
+                    break
+            elif word in filelist_options_with_argument:
+                next(words, None)
+                continue
+            elif word.startswith(("-", "+")):
+                continue
+            word = os.path.expandvars(word)
+            entries.append(word if os.path.isabs(word) else os.path.join(base, word))
+    return entries
+
+
+def extract_module_prototype_info_from_file_reporting_failure(path: str, enable_non_ansi: bool = True,
+                                                              memory_map: bool = False, header_only: bool = False,
+                                                              cache_dir: str | None = None) \
+        -> tuple[list[ModulePrototypeInfo], ExtractionFailure | None]:
+    """
+    same as `extract_module_prototype_info_from_file`, but the failure is returned rather than raised
+    """
+    with log.collect() as msgs:
+        try:
+            cache = PrototypeCache(cache_dir) if cache_dir is not None else None
+            info_s = extract_module_prototype_info_from_file(path, enable_non_ansi, memory_map, header_only, cache)
+        except Exception as e:  # any failure of one file is reported, rather than stopping the others
+            error = "".join(msg if kept is None else kept for _, msg, kept in msgs) + f"{type(e).__name__}: {e}"
+            return [], ExtractionFailure(path=path, error=error)
+    log.report(msgs)
+    return info_s, None
+
+
+def extract_module_prototype_info_from_files(inputs: list[str], jobs: int | None = None, enable_non_ansi: bool = True,
+                                             memory_map: bool = False, header_only: bool = False,
+                                             cache: PrototypeCache | None = None) \
+        -> tuple[list[tuple[str, ModulePrototypeInfo]], list[ExtractionFailure]]:
+    """
+    inputs:
+        directories, glob patterns, '.f' filelists or files, see `collect_source_files`
+    jobs:
+        the files are parsed by a pool of `jobs` processes, `os.cpu_count()` if None, in this process if 1
+    cache:
+        shared by the processes through its directory, the stale entries are evicted at the end of the run
+    a file failing to be parsed does not abort the run, it is reported in the failures,
+    the prototypes are returned with the path of their files, in the order of the files
+    """
+    paths = collect_source_files(inputs)
+    extract = extract_module_prototype_info_from_file_reporting_failure
+    cache_dir = cache.directory if cache is not None else None
+    args = (paths, [enable_non_ansi] * len(paths), [memory_map] * len(paths), [header_only] * len(paths),
+            [cache_dir] * len(paths))
+    if jobs == 1 or len(paths) <= 1:
+        results = map(extract, *args)
+        merged = merge_extraction_results(paths, results)
+    else:
+        jobs = jobs or os.cpu_count() or 1
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = pool.map(extract, *args, chunksize=max(1, min(64, len(paths) // (jobs * 4))))
+            merged = merge_extraction_results(paths, results_of_pool(paths, results))
+    if cache is not None:
+        cache.evict()
+    return merged
+
+
+def results_of_pool(paths: list[str], results: typing.Iterable[tuple[list[ModulePrototypeInfo],
+                                                                     ExtractionFailure | None]]) \
+        -> typing.Iterator[tuple[list[ModulePrototypeInfo], ExtractionFailure | None]]:
+    """ the results of the pool in order, the files left are failures if the pool breaks, e.g. a worker is killed """
+    done = 0
+    try:
+        for result in results:
+            yield result
+            done += 1
+    except concurrent.futures.BrokenExecutor as e:  # BrokenProcessPool
+        for path in paths[done:]:
+            yield [], ExtractionFailure(path=path, error=f"{type(e).__name__}: {e}")
+
+
+def merge_extraction_results(paths: list[str], results: typing.Iterable[tuple[list[ModulePrototypeInfo],
+                                                                               ExtractionFailure | None]]) \
+        -> tuple[list[tuple[str, ModulePrototypeInfo]], list[ExtractionFailure]]:
+    info_s = []
+    failures = []
+    for path, (file_info_s, failure) in zip(paths, results):
+        if failure is not None:
+            log.error(f"failed to extract module prototype info from '{path}':\n{failure.error}\n")
+            failures.append(failure)
+        info_s.extend((path, info) for info in file_info_s)
+    return info_s, failures
+
+
+def extract_module_prototype_info_from_files_to_yml(inputs: list[str], o: str, jobs: int | None = None,
+                                                    enable_non_ansi: bool = True, memory_map: bool = False,
+                                                    header_only: bool = False, cache: PrototypeCache | None = None) \
+        -> list[ExtractionFailure]:
+    """
+    the prototypes of all the files are written into one output, each with the path of its file
+    """
+    info_s, failures = extract_module_prototype_info_from_files(inputs, jobs, enable_non_ansi, memory_map,
+                                                                header_only, cache)
+    info_dict_s = [{"path": path, **dataclasses.asdict(info)} for path, info in info_s]
+    with open(o, 'w', encoding="utf-8") as f:
+        json.dump(info_dict_s, f, indent=4)
+        log.hint(f"module prototype info of {len(info_s)} modules has been written to '{o}', "
+                 f"{len(failures)} files failed\n")
+    return failures
+
+
+def extract_module_prototype_info_from_file_to_yml(i: str, o: str, enable_non_ansi: bool = True,
+                                                   memory_map: bool = False, header_only: bool = False):
+    info_s = extract_module_prototype_info_from_file(i, enable_non_ansi, memory_map, header_only)
     info_dict_s = [dataclasses.asdict(info) for info in info_s]
     with open(o, 'w', encoding="utf-8") as f:
         json.dump(info_dict_s, f, indent=4)
         log.hint(f"module prototype info has been written to '{o}'\n")
 
 
-def extract_module_prototype_info_from_file(path: str, enable_non_ansi: bool = True) -> list[ModulePrototypeInfo]:
-    with open(path, 'r', encoding="utf-8") as f:
-        verilog = f.read()
-    parser = Parser(verilog, path=os.path.abspath(path), parse_body=enable_non_ansi)
+def extract_module_prototype_info_from_file(path: str, enable_non_ansi: bool = True,
+                                            memory_map: bool = False, header_only: bool = False,
+                                            cache: PrototypeCache | None = None) -> list[ModulePrototypeInfo]:
+    """
+    memory_map:
+        lex the memory-mapped file into a TokenStore, neither the file text nor the token strings are copied
+    header_only:
+        lex only the module headers and the port / parameter declarations, the module bodies are skipped by a scan,
+        see `Parser`. the syntax of the rest of the bodies is not checked then
+    cache:
+        look up the file content in the cache before parsing, and put the result into it after parsing
+    """
+    key = None
+    if cache is not None:
+        with open(path, 'rb') as f:
+            # a header_only run does not check the syntax of the bodies, memory_map gives the same info
+            key = cache.key(f.read(), enable_non_ansi, header_only)
+        info_s = cache.get_info_s(key)
+        if info_s is not None:
+            log.verbose_info(f"module prototype info of '{path}' is found in the cache\n")
+            return info_s
+    info_s = parse_module_prototype_info_from_file(path, enable_non_ansi, memory_map, header_only)
+    if cache is not None:
+        cache.put_info_s(key, info_s)
+    return info_s
+
+
+def parse_module_prototype_info_from_file(path: str, enable_non_ansi: bool = True,
+                                          memory_map: bool = False, header_only: bool = False) \
+        -> list[ModulePrototypeInfo]:
+    if memory_map:
+        verilog = map_file(path)
+    else:
+        with open(path, 'r', encoding="utf-8") as f:
+            verilog = f.read()
+    parser = Parser(verilog, path=os.path.abspath(path), parse_body=enable_non_ansi, token_store=memory_map,
+                    header_only=header_only)
     nodes = parser.parse()
     src_info = parser.ctx.src_info
 
@@ -298,7 +522,8 @@ def extract_identifier_names_from_expr(expr: Expression, identifier_name_s: set[
         identifier_name_s.add(expr.identifier.src)
         return
     else:
-        for k, v in expr.__dict__.items():
+        for attr in node_fields(expr.__class__):
+            v = getattr(expr, attr)
             if isinstance(v, list):
                 for vc in v:
                     if isinstance(v, Expression):
@@ -308,6 +533,28 @@ def extract_identifier_names_from_expr(expr: Expression, identifier_name_s: set[
         return
 
 
+def main(argv: list[str] | None = None) -> int:
+    arg_parser = argparse.ArgumentParser(description="extract module prototype info from verilog/systemverilog files")
+    arg_parser.add_argument("inputs", nargs='+', help="directories, glob patterns, '.f' filelists or files")
+    arg_parser.add_argument("-o", "--output", required=True, help="the output json file")
+    arg_parser.add_argument("-j", "--jobs", type=int, default=None, help="number of processes, all cpus by default")
+    arg_parser.add_argument("--disable-non-ansi", action="store_true", help="fail on Non-ANSI port definition")
+    arg_parser.add_argument("--memory-map", action="store_true", help="lex the memory-mapped files")
+    arg_parser.add_argument("--header-only", action="store_true", help="skip the module bodies by a scan")
+    arg_parser.add_argument("--cache-dir", default=None, help="reuse the prototypes of unchanged files")
+    arg_parser.add_argument("--cache-max-age", type=float, default=30.0, help="in days, 30 by default")
+    arg_parser.add_argument("--cache-max-size", type=float, default=1024.0, help="in MiB, 1024 by default")
+    args = arg_parser.parse_args(argv)
+    cache = None
+    if args.cache_dir is not None:
+        cache = PrototypeCache(args.cache_dir, max_age=args.cache_max_age * 24 * 3600,
+                               max_size=int(args.cache_max_size * 2**20))
+    failures = extract_module_prototype_info_from_files_to_yml(args.inputs, args.output, jobs=args.jobs,
+                                                               enable_non_ansi=not args.disable_non_ansi,
+                                                               memory_map=args.memory_map,
+                                                               header_only=args.header_only, cache=cache)
+    return 1 if failures else 0
+
+
 if __name__ == "__main__":
-    extract_module_prototype_info_from_file_to_yml("./rich_grammar.sv", "./prototype.yml", enable_non_ansi=True)
-    _ = extract_module_prototype_info_from_file("./rich_grammar.sv", enable_non_ansi=True)
+    raise SystemExit(main())
@@ -0,0 +1,57 @@
+`timescale 1ns/1ps
+// a little of every construct the lexer and the parser know, the fixture of the tests
+
+/* a block comment
+   over two lines */
+module counter #(parameter WIDTH = 8, parameter logic [3:0] STEP = 4'd1) (
+    input wire clk,  // the clock
+    /* actif à l'état bas */ input wire rst_n,
+    input wire [WIDTH-1:0] load_val, input wire load,
+    output reg [WIDTH-1:0] count,
+    output wire overflow
+);
+    localparam MAX = (1 << WIDTH) - 1;
+    wire [WIDTH:0] next;
+    reg [1:0] state, state_n;
+    logic signed [7:0] delta = -8'sd3;
+    integer i;
+    genvar g;
+
+    assign next = {1'b0, count} + STEP;
+    assign overflow = next[WIDTH] & ~load | &count[WIDTH-1:0] && !rst_n;
+
+    always @(posedge clk or negedge rst_n) begin
+        if (!rst_n)
+            count <= {WIDTH{1'b0}};
+        else if (load)
+            count <= load_val;
+        else begin : counting
+            count <= next[WIDTH-1:0];
+        end
+    end
+
+    always_comb begin
+        case (state)
+            2'b00: state_n = load ? 2'b01 : 2'b00;
+            2'b01: state_n = state + 1;
+            default: state_n = 2'b00;
+        endcase
+    end
+
+    initial begin
+        #10 state = 2'b00;
+        i = 0;
+    end
+endmodule
+
+module top (a, b, y);
+    input [7:0] a;
+    /* µ */ input [7:0] b;
+    output [7:0] y;
+    wire o;
+
+    counter #(.WIDTH(8), .STEP(4'd2)) u_counter (
+        .clk(a[0]), .rst_n(b[0]), .load_val(a ^ b), .load(1'b0), .count(y), .overflow(o)
+    );
+    /* a comment before an instance */ AND2 u_and (.A(a[1]), .B(b[1]), .Y(o));
+endmodule
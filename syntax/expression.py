@@ -4,25 +4,23 @@ from lexer import Token
 from syntax.node import Expression, SyntaxNode
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class Identifier(Expression):
     identifier: Token
 
-    @property
-    def tokens_str(self) -> str:
+    def str_parts(self) -> str:
         return self.identifier.src
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class Literal(Expression):
     literal: Token
 
-    @property
-    def tokens_str(self) -> str:
+    def str_parts(self) -> str:
         return self.literal.src
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class UnaryOperator(Expression):
     expr: Expression
 
@@ -30,12 +28,11 @@ class UnaryOperator(Expression):
     def symbol(self) -> str:
         return ''
 
-    @property
-    def tokens_str(self) -> str:
-        return f"{self.symbol}『{self.expr.tokens_str}』"
+    def str_parts(self) -> list[str | SyntaxNode]:
+        return [f"{self.symbol}『", self.expr, "』"]
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class BinaryOperator(Expression):
     left: Expression
     right: Expression
@@ -44,315 +41,306 @@ class BinaryOperator(Expression):
     def symbol(self) -> str:
         return ''
 
-    @property
-    def tokens_str(self) -> str:
-        return f"『{self.left.tokens_str}』{self.symbol}『{self.right.tokens_str}』"
+    def str_parts(self) -> list[str | SyntaxNode]:
+        return ["『", self.left, f"』{self.symbol}『", self.right, "』"]
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class UnaryPlus(UnaryOperator):
     @property
     def symbol(self) -> str:
         return '+'
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class UnaryMinus(UnaryOperator):
     @property
     def symbol(self) -> str:
         return '-'
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class BitNot(UnaryOperator):
     @property
     def symbol(self) -> str:
         return '~'
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class ReducedAnd(UnaryOperator):
     @property
     def symbol(self) -> str:
         return '&'
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class ReducedOr(UnaryOperator):
     @property
     def symbol(self) -> str:
         return '|'
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class ReducedXor(UnaryOperator):
     @property
     def symbol(self) -> str:
         return '^'
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class LogicNot(UnaryOperator):
     @property
     def symbol(self) -> str:
         return '!'
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class SelfIncrement(UnaryOperator):
     @property
     def symbol(self) -> str:
         return '++'
 
-    @property
-    def tokens_str(self) -> str:
-        return f"『{self.expr.tokens_str}』{self.symbol}"
+    def str_parts(self) -> list[str | SyntaxNode]:
+        return ["『", self.expr, f"』{self.symbol}"]
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class SelfDecrement(UnaryOperator):
     @property
     def symbol(self) -> str:
         return '--'
 
-    @property
-    def tokens_str(self) -> str:
-        return f"『{self.expr.tokens_str}』{self.symbol}"
+    def str_parts(self) -> list[str | SyntaxNode]:
+        return ["『", self.expr, f"』{self.symbol}"]
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class BitAnd(BinaryOperator):
     @property
     def symbol(self) -> str:
         return '&'
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class BitOr(BinaryOperator):
     @property
     def symbol(self) -> str:
         return '|'
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class BitXor(BinaryOperator):
     @property
     def symbol(self) -> str:
         return '^'
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class LogicAnd(BinaryOperator):
     @property
     def symbol(self) -> str:
         return '&&'
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class LogicOr(BinaryOperator):
     @property
     def symbol(self) -> str:
         return '||'
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class Add(BinaryOperator):
     @property
     def symbol(self) -> str:
         return '+'
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class Sub(BinaryOperator):
     @property
     def symbol(self) -> str:
         return '-'
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class Mul(BinaryOperator):
     @property
     def symbol(self) -> str:
         return '*'
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class Div(BinaryOperator):
     @property
     def symbol(self) -> str:
         return '/'
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class Mod(BinaryOperator):
     @property
     def symbol(self) -> str:
         return '%'
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class Pow(BinaryOperator):
     @property
     def symbol(self) -> str:
         return '**'
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class LogicLeftShift(BinaryOperator):
     @property
     def symbol(self) -> str:
         return '<<'
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class LogicRightShift(BinaryOperator):
     @property
     def symbol(self) -> str:
         return '>>'
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class ArithmeticLeftShift(BinaryOperator):
     @property
     def symbol(self) -> str:
         return '<<<'
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class ArithmeticRightShift(BinaryOperator):
     @property
     def symbol(self) -> str:
         return '>>>'
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class Equal(BinaryOperator):
     @property
     def symbol(self) -> str:
         return '=='
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class InEqual(BinaryOperator):
     @property
     def symbol(self) -> str:
         return '!='
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class GreaterThan(BinaryOperator):
     @property
     def symbol(self) -> str:
         return '>'
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class LessThan(BinaryOperator):
     @property
     def symbol(self) -> str:
         return '<'
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class GreaterThanEqual(BinaryOperator):
     @property
     def symbol(self) -> str:
         return '>='
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class LessThanEqual(BinaryOperator):
     @property
     def symbol(self) -> str:
         return '<='
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class CaseEqual(BinaryOperator):
     @property
     def symbol(self) -> str:
         return '==='
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class CaseInEqual(BinaryOperator):
     @property
     def symbol(self) -> str:
         return '!=='
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class WildcardEqual(BinaryOperator):
     @property
     def symbol(self) -> str:
         return '==?'
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class WildcardInEqual(BinaryOperator):
     @property
     def symbol(self) -> str:
         return '!=?'
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class Parenthesis(Expression):
     expression: Expression
 
-    @property
-    def tokens_str(self) -> str:
-        return f"(『{self.expression.tokens_str}』)"
+    def str_parts(self) -> list[str | SyntaxNode]:
+        return ["(『", self.expression, "』)"]
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class Slice(Expression):
     src: Expression
     left_idx: Expression
     right_idx: Expression
 
-    @property
-    def tokens_str(self) -> str:
-        return f"『{self.src.tokens_str}』[『{self.left_idx.tokens_str}』:『{self.right_idx.tokens_str}』]"
+    def str_parts(self) -> list[str | SyntaxNode]:
+        return ["『", self.src, "』[『", self.left_idx, "』:『", self.right_idx, "』]"]
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class Index(Expression):
     src: Expression
     idx: Expression
 
-    @property
-    def tokens_str(self) -> str:
-        return f"『{self.src.tokens_str}』[『{self.idx.tokens_str}』]"
+    def str_parts(self) -> list[str | SyntaxNode]:
+        return ["『", self.src, "』[『", self.idx, "』]"]
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class ScopeResolution(BinaryOperator):
     @property
     def symbol(self) -> str:
         return '::'
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class MemberAccess(BinaryOperator):
     @property
     def symbol(self) -> str:
         return '.'
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class Conditional(Expression):
     condition: Expression
     true_expr: Expression
     false_expr: Expression
 
-    @property
-    def tokens_str(self) -> str:
-        return f"『{self.condition.tokens_str}』?"\
-               f"『{self.true_expr.tokens_str}』:"\
-               f"『{self.false_expr.tokens_str}』]"
+    def str_parts(self) -> list[str | SyntaxNode]:
+        return ["『", self.condition, "』?『", self.true_expr, "』:『", self.false_expr, "』]"]
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class BaseAssignment(BinaryOperator):
     delay: 'Delay | None'
 
@@ -360,162 +348,160 @@ class BaseAssignment(BinaryOperator):
     def symbol(self) -> str:
         return '='
 
-    @property
-    def tokens_str(self) -> str:
+    def str_parts(self) -> list[str | SyntaxNode]:
         if self.delay is None:
-            return f"『{self.left.tokens_str}』{self.symbol}『{self.right.tokens_str}』"
+            return ["『", self.left, f"』{self.symbol}『", self.right, "』"]
         else:
-            return f"『{self.left.tokens_str}』{self.symbol}『{self.delay.tokens_str}』『{self.right.tokens_str}』"
+            return ["『", self.left, f"』{self.symbol}『", self.delay, "』『", self.right, "』"]
 
-@dataclasses.dataclass
+
+@dataclasses.dataclass(slots=True, frozen=True)
 class Assignment(BaseAssignment):
     @property
     def symbol(self) -> str:
         return '='
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class AddAssignment(BaseAssignment):
     @property
     def symbol(self) -> str:
         return '+='
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class SubAssignment(BaseAssignment):
     @property
     def symbol(self) -> str:
         return '-='
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class MulAssignment(BaseAssignment):
     @property
     def symbol(self) -> str:
         return '*='
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class DivAssignment(BaseAssignment):
     @property
     def symbol(self) -> str:
         return '/='
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class ModAssignment(BaseAssignment):
     @property
     def symbol(self) -> str:
         return '%='
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class BitAndAssignment(BaseAssignment):
     @property
     def symbol(self) -> str:
         return '&='
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class BitOrAssignment(BaseAssignment):
     @property
     def symbol(self) -> str:
         return '|='
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class BitXorAssignment(BaseAssignment):
     @property
     def symbol(self) -> str:
         return '^='
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class LogicLeftShiftAssignment(BaseAssignment):
     @property
     def symbol(self) -> str:
         return '<<='
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class LogicRightShiftAssignment(BaseAssignment):
     @property
     def symbol(self) -> str:
         return '>>='
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class ArithmeticLeftShiftAssignment(BaseAssignment):
     @property
     def symbol(self) -> str:
         return '<<<='
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class ArithmeticRightShiftAssignment(BaseAssignment):
     @property
     def symbol(self) -> str:
         return '>>>='
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class NonBlockingAssignment(BaseAssignment):
     @property
     def symbol(self) -> str:
         return '<='
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class Concatenation(Expression):
     args: 'Args'
 
-    @property
-    def tokens_str(self) -> str:
-        return f"{{『{self.args.tokens_str}』}}"
+    def str_parts(self) -> list[str | SyntaxNode]:
+        return ["{『", self.args, "』}"]
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class Repeat(Expression):
     times: Expression
     expr: Expression
 
-    @property
-    def tokens_str(self) -> str:
-        return f"{{『{self.times.tokens_str}』{{『{self.expr.tokens_str}』}}}}"
+    def str_parts(self) -> list[str | SyntaxNode]:
+        return ["{『", self.times, "』{『", self.expr, "』}}"]
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class Args(Expression):
     args: list[Expression]
 
-    @property
-    def tokens_str(self) -> str:
-        return ', '.join(map(lambda x: f"『{x.tokens_str}』", self.args))
+    def str_parts(self) -> list[str | SyntaxNode]:
+        parts = []
+        for arg in self.args:
+            parts.extend((", 『" if parts else "『", arg, "』"))
+        return parts
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class FuncCall(Expression):
     identifier: Expression
     args: Args
 
-    @property
-    def tokens_str(self) -> str:
-        return f"『{self.identifier.tokens_str}』(『{self.args.tokens_str}』)"
+    def str_parts(self) -> list[str | SyntaxNode]:
+        return ["『", self.identifier, "』(『", self.args, "』)"]
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class Delay(SyntaxNode):
     duration: Expression
     unit: Token | None
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class UnpackedArrayCat(Expression):
     args: Args
 
-    @property
-    def tokens_str(self) -> str:
-        return f"{{『{self.args.tokens_str}』}}"
+    def str_parts(self) -> list[str | SyntaxNode]:
+        return ["{『", self.args, "』}"]
 
 
 
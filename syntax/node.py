@@ -1,17 +1,28 @@
+import collections.abc
 import dataclasses
+import functools
+import typing
 from typing import TYPE_CHECKING
 
-from lexer import Token
+from lexer import Token, TokenSpan, TokenStore, TokenView
 
 if TYPE_CHECKING:
+    from parser import SourceLines
     from syntax.expression import Assignment, Expression, Delay
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class SyntaxNode:
+    """
+    a node is frozen once it is built, a change of a tree builds new nodes, e.g. by `dataclasses.replace`,
+    whose tokens_str is not memoized yet, so tokens_str is memoized on the node for good: neither the node nor its
+    sub-nodes, whose text its own includes, can change under it
+    """
     ldx: int
     cdx: int
-    tokens: list[Token]
+    tokens: list[Token] | TokenSpan  # a span of the token stream for the nodes built by the parser
+    # the memoized tokens_str, not a field of the constructor, the only attribute set after the node is built
+    tokens_str_: str | None = dataclasses.field(default=None, init=False, repr=False, compare=False)
 
     def get_str(self) -> str:
         return f"\"{{{' '.join(map(lambda x: x.src, self.tokens))}\" , ldx: {self.ldx}, cdx: {self.cdx}}}"
@@ -24,7 +35,43 @@ class SyntaxNode:
 
     @property
     def tokens_str(self) -> str:
-        return ' '.join(map(lambda x: x.src, self.tokens))
+        """ rendered once by `render_tokens_str`, the node is frozen, see `SyntaxNode` """
+        s = self.tokens_str_
+        if s is None:
+            s = render_tokens_str(self)
+            object.__setattr__(self, "tokens_str_", s)
+        return s
+
+    def str_parts(self) -> 'str | typing.Sequence[str | SyntaxNode] | None':
+        """
+        the strings and the sub-nodes tokens_str is made of, in order, a single str if it is the whole of it,
+        None to join the srcs of the tokens
+        """
+        return None
+
+    def source_str(self, lines: 'SourceLines | None' = None) -> str:
+        """
+        the source text of the node as it is written, with the whitespace and the comments between its tokens,
+        sliced from the context between its first and last token rather than joined token by token.
+        the tokens of a TokenStore know their offsets, the others are located by their positions in `lines`,
+        e.g. `Parser.ctx.src_info.lines`
+        """
+        tokens = self.tokens
+        if not tokens:
+            return ""
+        first, last = tokens[0], tokens[-1]
+        if isinstance(first, TokenView) and isinstance(last, TokenView):
+            store: TokenStore = first.store
+            context, binary = store.context, store.binary
+            start = store.starts[first.idx]
+            end = store.starts[last.idx] + store.lengths[last.idx]
+        else:
+            assert lines is not None, f"the source lines are needed to slice the source of the tokens of {self}"
+            context, binary = lines.context, lines.binary
+            start = lines.offset(first.ldx, first.cdx)
+            end = lines.offset(last.ldx, last.cdx) + (len(last.src.encode()) if binary else len(last.src))
+        s = context[start:end]
+        return s.decode(errors="replace") if binary else s
 
     @property
     def pos(self) -> (int, int):
@@ -34,27 +81,72 @@ class SyntaxNode:
         return node_as_dict(self)
 
 
+@functools.cache
+def node_fields(cls: type) -> tuple[str, ...]:
+    """ the field names of a node class, in the order of its constructor, the memoized tokens_str_ is not one """
+    return tuple(field.name for field in dataclasses.fields(cls) if field.init)
+
+
+def is_sequence(obj) -> bool:
+    """ a list or a tuple, or another sequence a node holds, e.g. a TokenSpan or a ShiftedSlices of incremental """
+    return isinstance(obj, (list, tuple)) or \
+        isinstance(obj, collections.abc.Sequence) and not isinstance(obj, (str, bytes))
+
+
+def render_tokens_str(node: SyntaxNode) -> str:
+    """
+    the str_parts of the node are expanded with an explicit stack rather than by recursion, into one list joined once,
+    so a deep expression is rendered in time linear in its length rather than its length times its depth.
+    the memoized tokens_str of the sub-nodes are reused, but the sub-nodes rendered here are not memoized
+    """
+    parts = node.str_parts()
+    if parts is None:
+        return ' '.join(map(lambda x: x.src, node.tokens))
+    elif parts.__class__ is str:
+        return parts
+    out = []
+    append = out.append
+    stack = [iter(parts)]  # the parts of each node being expanded, from where it is left
+    while stack:
+        for part in stack[-1]:
+            if part.__class__ is str:
+                append(part)
+            elif part.tokens_str_ is not None:
+                append(part.tokens_str_)
+            else:
+                parts = part.str_parts()
+                if parts is None:
+                    append(' '.join(map(lambda x: x.src, part.tokens)))
+                elif parts.__class__ is str:
+                    append(parts)
+                else:
+                    stack.append(iter(parts))
+                    break
+        else:
+            stack.pop()
+    return ''.join(out)
+
+
 def node_as_dict(obj):
     if isinstance(obj, SyntaxNode):
         d = {"_type_": obj.__class__.__name__, "_str_": obj.tokens_str}
-        for attr, value in obj.__dict__.items():
-            d[attr] = node_as_dict(value)
+        for attr in node_fields(obj.__class__):
+            d[attr] = node_as_dict(getattr(obj, attr))
         return d
     elif isinstance(obj, Token):
-        d = {}
-        for attr, value in obj.__dict__.items():
-            d[attr] = node_as_dict(value)
-        return d
-    elif isinstance(obj, list):
-        l = []
-        for c in obj:
-            l.append(node_as_dict(c))
-        return l
+        return {"kind": obj.kind, "ldx": obj.ldx, "cdx": obj.cdx, "val": obj.val, "src": obj.src}
+    elif isinstance(obj, TokenView):
+        return node_as_dict(obj.to_token())
     elif isinstance(obj, tuple):
         t = tuple()
         for c in obj:
             t = t + (node_as_dict(c),)
         return t
+    elif is_sequence(obj):
+        l = []
+        for c in obj:
+            l.append(node_as_dict(c))
+        return l
     elif isinstance(obj, set):
         s = set()
         for c in obj:
@@ -69,12 +161,12 @@ def node_as_dict(obj):
         return obj
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class Expression(SyntaxNode):
     pass
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class ModuleNode(SyntaxNode):
     name: str
     paras: 'list[ParamDefNode]'
@@ -82,7 +174,43 @@ class ModuleNode(SyntaxNode):
     body_items: 'list[ModuleBodyItemNode]'
 
 
-@dataclasses.dataclass
+class LazyModuleNode(ModuleNode):
+    """
+    a ModuleNode whose body_items are parsed on the first access, see `Parser` lazy_body, they are set once then,
+    the node is frozen otherwise. it is pickled as a plain ModuleNode, with the body parsed
+    """
+    __slots__ = ("parse_body_",)
+
+    def __init__(self, ldx: int, cdx: int, tokens: list[Token] | TokenSpan, name: str, paras: 'list[ParamDefNode]',
+                 ports: 'list[AnsiPortDefNode] | list[NonAnsiPortDefNode]',
+                 parse_body_: 'typing.Callable[[], list[ModuleBodyItemNode]]'):
+        object.__setattr__(self, "ldx", ldx)
+        object.__setattr__(self, "cdx", cdx)
+        object.__setattr__(self, "tokens", tokens)
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "paras", paras)
+        object.__setattr__(self, "ports", ports)
+        object.__setattr__(self, "tokens_str_", None)
+        object.__setattr__(self, "parse_body_", parse_body_)
+
+    def __getattr__(self, name: str):
+        # only called if the attribute is not found, i.e. body_items before it is parsed
+        if name != "body_items":
+            raise AttributeError(name)
+        parse_body = self.parse_body_
+        object.__setattr__(self, "body_items", parse_body())
+        object.__delattr__(self, "parse_body_")  # the parser and its tokens are released
+        return self.body_items
+
+    @property
+    def body_parsed(self) -> bool:
+        return not hasattr(self, "parse_body_")  # released once the body is parsed
+
+    def __reduce__(self):
+        return ModuleNode, (self.ldx, self.cdx, self.tokens, self.name, self.paras, self.ports, self.body_items)
+
+
+@dataclasses.dataclass(slots=True, frozen=True)
 class DataTypeNode(SyntaxNode):
     logic_or_bit: Token | None
     signing: Token | None
@@ -90,13 +218,13 @@ class DataTypeNode(SyntaxNode):
     inherent_data_type: Token | None
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class RangeNode(SyntaxNode):
     left: Expression
     right: Expression
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class IndexNode(SyntaxNode):
     index: Expression
 
@@ -104,13 +232,13 @@ class IndexNode(SyntaxNode):
 SizeNode = IndexNode
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class ArrayIdentifierInitNode(SyntaxNode):
     identifier: Token
     size: list[RangeNode | SizeNode]
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class AnsiPortDefNode(SyntaxNode):
     direction: Token
     typ: Token
@@ -118,29 +246,29 @@ class AnsiPortDefNode(SyntaxNode):
     array_identifiers: list[ArrayIdentifierInitNode]
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class NonAnsiPortDefNode(SyntaxNode):
     identifier: Token
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class ParamDefNode(SyntaxNode):
     data_type: DataTypeNode
     identifier_array_val_pairs: list[(ArrayIdentifierInitNode, Expression)]
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class ModuleBodyItemNode(SyntaxNode):
     pass
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class ParamDefInBodyNode(ModuleBodyItemNode):
     data_type: DataTypeNode
     identifier_array_val_pairs: list[(ArrayIdentifierInitNode, Expression)]
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class PortDefAndInitInBodyNode(ModuleBodyItemNode):
     direction: Token
     typ: Token | None
@@ -148,60 +276,60 @@ class PortDefAndInitInBodyNode(ModuleBodyItemNode):
     identifier_array_val_pairs: list[(ArrayIdentifierInitNode, Expression)]
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class LocalParamDefNode(ModuleBodyItemNode):
     data_type: DataTypeNode
     identifier_array_val_pairs: list[(ArrayIdentifierInitNode, Expression)]
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class VariableDefInitNode(ModuleBodyItemNode):
     typ: Token | None
     data_type: Token | None
     identifier_array_val_pairs: list[(ArrayIdentifierInitNode, Expression)]
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class GenvarDefNode(ModuleBodyItemNode):
     identifier: Token
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class GenvarDefAndInitNode(ModuleBodyItemNode):
     identifier: Token
     val: Expression
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class AssignNode(ModuleBodyItemNode):
     assignment: Expression
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class AlwaysBlockNode(ModuleBodyItemNode):
     always_typ: Token
     sensitivity_list: list[Token]
     body: 'ProcedureStatementNode'
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class InitialBlockNode(ModuleBodyItemNode):
     body: 'ProcedureStatementNode'
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class ParaSetNode(SyntaxNode):
     param_name: Token
     param_value: Expression
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class PortConnectNode(SyntaxNode):
     port_name: Token
     port_value: Expression
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class InstantiationNode(ModuleBodyItemNode):
     prototype_identifier: Token
     para_sets: list[ParaSetNode]
@@ -209,24 +337,24 @@ class InstantiationNode(ModuleBodyItemNode):
     port_connects: list[PortConnectNode]
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class BeginEndNode(ModuleBodyItemNode):
     name: Token | None
     body_item: list[ModuleBodyItemNode]
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class ProcedureStatementNode(SyntaxNode):
     pass
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class ProcedureBeginEndBlockNode(ProcedureStatementNode):
     name: Token | None
     body: list[ProcedureStatementNode]
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class ForStatementNode(ProcedureStatementNode):
     data_type: DataTypeNode | None
     init: Expression | None
@@ -235,42 +363,42 @@ class ForStatementNode(ProcedureStatementNode):
     body: ProcedureStatementNode
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class IfElseBlock(ProcedureStatementNode):
     condition: Expression
     if_body: ProcedureStatementNode
     else_body: ProcedureStatementNode | None
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class CaseStatementNode(ProcedureStatementNode):
     expression: Expression
     case_pairs: list[(Expression, ProcedureStatementNode)]
     default_statement: ProcedureStatementNode | None
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class DelayStatementNode(ProcedureStatementNode):
     delay: 'Delay'
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class ProcedureAssignmentNode(ProcedureStatementNode):
     assignment: 'Assignment'
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class GenerateNode(ModuleBodyItemNode):
     pass
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class GenerateNodeIf(GenerateNode):
     condition: Expression
     body: ModuleBodyItemNode
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class GenerateNodeFor(GenerateNode):
     genvar_data_type: Token | None
     init: Expression | None
@@ -279,28 +407,28 @@ class GenerateNodeFor(GenerateNode):
     body: ModuleBodyItemNode
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class GenerateNodeCase(GenerateNode):
     expression: Expression
     case_pairs: list[(Expression, ModuleBodyItemNode)]
     default_statement: ModuleBodyItemNode
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class EmptyProcedureStatementNode(ProcedureStatementNode):
     pass
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class EmptyModuleBodyItem(ModuleBodyItemNode):
     pass
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class PreCompileDirectiveNode(SyntaxNode):
     pass
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class PreCompileDirectiveInsideBodyNode(ModuleBodyItemNode):
     directive: PreCompileDirectiveNode
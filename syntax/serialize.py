@@ -0,0 +1,208 @@
+import array
+import bisect
+import contextlib
+import functools
+import gc
+import importlib
+import io
+import pickle
+import typing
+
+from lexer import Token, TokenSpan, TokenView, kind_by_id
+from syntax.node import SyntaxNode, is_sequence, node_fields
+
+
+"""
+binary format of a list of syntax nodes:
+    magic, format version (1 byte)
+    pickle of the token table, in columns: kinds, ldxs, cdxs (arrays), srcs, vals (None if they are the srcs)
+    pickle of (the nodes in post-order, the nodes), whose tokens refer to the token table:
+        a token as its index, a list of tokens as a slice of the table, if the tokens are consecutive in it
+the tokens of the nodes are slices of the token stream, so a token is stored once rather than once per enclosing node.
+the sub-nodes of a node are pickled before it, so a node refers to them by the memo of the pickle rather than the
+pickler recursing into them, and a deep expression is pickled as a shallow one.
+a TokenView is stored as a Token, the loaded nodes do not refer to the TokenStore and its context.
+a slice of the token table is loaded as a list, or as a TokenSpan of the table if it is long, e.g. the tokens of the
+nodes of a deep expression, which would be copied in time and memory quadratic in its depth
+"""
+
+magic = b"DOTVAST"
+format_version = 2
+
+
+class SerializeError(Exception):
+    pass
+
+
+def token_key(token: Token | TokenView):
+    """ a TokenView is built on each read of a TokenSpan, the same view is the same store and index """
+    return (id(token.store), token.idx) if token.__class__ is TokenView else id(token)
+
+
+class TokenTable:
+    """
+    the tokens in the order they are met, the tokens of a node before the ones of its fields,
+    so the top-level nodes lay out the token stream and the tokens of a sub-node are a slice of it.
+    a TokenSpan whose tokens are all new is a run of the table, a span inside a run is a slice of the table without
+    its tokens being walked again, so the nested nodes of a deep expression cost O(1) each rather than O(their length)
+    """
+    def __init__(self):
+        self.tokens: list[Token | TokenView] = []
+        self.token_idxs: dict = {}  # by token_key, the index of a token in the table
+        # by id of the source of a TokenSpan, its runs (start in the source, end in the source, index in the table)
+        self.runs: dict[int, list[tuple[int, int, int]]] = {}
+
+    def span_slice(self, span: TokenSpan) -> slice | None:
+        runs = self.runs.get(id(span.source))
+        if runs:
+            k = bisect.bisect_right(runs, (span.start, float("inf"))) - 1
+            if k >= 0 and runs[k][0] <= span.start and span.end <= runs[k][1]:
+                base = runs[k][2] - runs[k][0]
+                return slice(base + span.start, base + span.end)
+        return None
+
+    def add(self, tokens: typing.Iterable[Token | TokenView]):
+        if isinstance(tokens, TokenSpan) and self.span_slice(tokens) is not None:
+            return
+        first = len(self.tokens)
+        for token in tokens:
+            key = token_key(token)
+            if key not in self.token_idxs:
+                self.token_idxs[key] = len(self.tokens)
+                self.tokens.append(token)
+        if isinstance(tokens, TokenSpan) and len(self.tokens) - first == len(tokens) > 0:
+            bisect.insort(self.runs.setdefault(id(tokens.source), []), (tokens.start, tokens.end, first))
+
+
+def collect_tokens(nodes: list[SyntaxNode]) -> tuple[TokenTable, list[SyntaxNode]]:
+    """
+    the table of the tokens of the nodes, and the nodes in post-order, a node after its sub-nodes.
+    walked with an explicit stack, a deep expression does not hit the recursion limit
+    """
+    table = TokenTable()
+    order = []
+    stack = [(nodes, False)]
+    while stack:
+        obj, done = stack.pop()
+        if done:
+            order.append(obj)
+        elif isinstance(obj, (Token, TokenView)):
+            table.add((obj,))
+        elif isinstance(obj, SyntaxNode):
+            table.add(obj.tokens)
+            stack.append((obj, True))
+            stack.extend((getattr(obj, attr), False) for attr in reversed(node_fields(obj.__class__))
+                         if attr != "tokens")
+        elif is_sequence(obj):
+            stack.extend((c, False) for c in reversed(obj))
+    return table, order
+
+
+def token_columns(tokens: typing.Sequence[Token | TokenView]) -> tuple:
+    """
+    the tokens in columns: kinds, ldxs, cdxs (arrays), srcs, vals (None if they are the srcs),
+    a TokenView is stored as a Token
+    """
+    srcs = {}  # the same src of different tokens is stored once
+    return (array.array('H', [token.kind_.value for token in tokens]),
+            array.array('I', [token.ldx for token in tokens]),
+            array.array('I', [token.cdx for token in tokens]),
+            [srcs.setdefault(token.src, token.src) for token in tokens],
+            None if all(token.val == token.src for token in tokens) else [token.val for token in tokens])
+
+
+def tokens_from_columns(columns: tuple) -> list[Token]:
+    kinds, ldxs, cdxs, srcs, vals = columns
+    return list(map(Token, map(kind_by_id.__getitem__, kinds), ldxs.tolist(), cdxs.tolist(),
+                    srcs if vals is None else vals, srcs))
+
+
+class NodePickler(pickle.Pickler):
+    def __init__(self, f: io.BytesIO, table: TokenTable):
+        super().__init__(f, protocol=pickle.HIGHEST_PROTOCOL)
+        self.table: TokenTable = table
+        self.table_keys: list = list(map(token_key, table.tokens))
+
+    def persistent_id(self, obj):
+        if isinstance(obj, (Token, TokenView)):
+            return self.table.token_idxs[token_key(obj)]
+        if obj.__class__ is not tuple and is_sequence(obj) and len(obj) > 2 and \
+                isinstance(obj[0], (Token, TokenView)):
+            # a short list is cheaper to be loaded token by token than as a slice
+            if isinstance(obj, TokenSpan):
+                span = self.table.span_slice(obj)
+                if span is not None:
+                    return span
+            start = self.table.token_idxs[token_key(obj[0])]
+            end = start + len(obj)
+            if list(map(token_key, obj)) == self.table_keys[start:end]:
+                return slice(start, end)
+        return None
+
+
+def load_tokens(table: list[Token], pid: int | slice) -> Token | list[Token] | TokenSpan:
+    """ a token or a slice of the token table, a short slice is cheaper to be copied than to be a TokenSpan """
+    if pid.__class__ is int or pid.stop - pid.start <= 64:
+        return table[pid]
+    return TokenSpan(table, pid.start, pid.stop)
+
+
+class NodeUnpickler(pickle.Unpickler):
+    """
+    loads only the globals a dump refers to: the node classes, Token and TokenKind, arrays, lists and slices,
+    any other is refused, so a cache file written by someone else can not run code when it is loaded
+    """
+    allowed: set[tuple[str, str]] = {("array", "array"), ("array", "_array_reconstructor"), ("builtins", "list"),
+                                     ("builtins", "slice"), ("lexer", "Token"), ("lexer", "TokenKind")}
+
+    def find_class(self, module: str, name: str):
+        if (module, name) in self.allowed:
+            return super().find_class(module, name)
+        if module in ("syntax.node", "syntax.expression"):
+            cls = getattr(importlib.import_module(module), name, None)
+            if isinstance(cls, type) and issubclass(cls, SyntaxNode):
+                return cls
+        raise pickle.UnpicklingError(f"'{module}.{name}' is not allowed in a syntax node dump")
+
+
+def dump_nodes(nodes: list[SyntaxNode]) -> bytes:
+    table, order = collect_tokens(nodes)
+    f = io.BytesIO()
+    f.write(magic + bytes([format_version]))
+    try:
+        pickle.dump(token_columns(table.tokens), f, protocol=pickle.HIGHEST_PROTOCOL)
+        NodePickler(f, table).dump((order, nodes))
+    except (pickle.PicklingError, RecursionError) as e:  # e.g. a node holding something which is not a node
+        raise SerializeError(f"syntax nodes not dumped: {e}") from e
+    return f.getvalue()
+
+
+@contextlib.contextmanager
+def paused_gc():
+    """
+    the cyclic garbage collector paused within, and restored to its previous state after, e.g. around `load_nodes`,
+    which creates many objects and no garbage, but triggers collections by their number. it pauses the collector of
+    the whole process, so it is left to the caller, which knows that no other thread creates garbage meanwhile
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def load_nodes(data: bytes) -> list[SyntaxNode]:
+    if data[:len(magic)] != magic or len(data) <= len(magic) or data[len(magic)] != format_version:
+        raise SerializeError(f"not a syntax node dump of format version {format_version}")
+    f = io.BytesIO(data)
+    f.seek(len(magic) + 1)
+    try:
+        table = tokens_from_columns(NodeUnpickler(f).load())
+        unpickler = NodeUnpickler(f)
+        unpickler.persistent_load = functools.partial(load_tokens, table)
+        _, nodes = unpickler.load()
+        return nodes
+    except Exception as e:  # whatever a corrupted or a tampered dump raises, it is not loaded
+        raise SerializeError(f"corrupted syntax node dump: {e}") from e
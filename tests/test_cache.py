@@ -0,0 +1,45 @@
+import os
+import time
+
+from cache import DiskCache
+
+
+def filled_cache(directory: str, ages: dict[str, float], **kwargs) -> DiskCache:
+    """ an entry of 100 bytes per key, last used `ages[key]` days ago """
+    cache = DiskCache(directory, suffix=".bin", **kwargs)
+    now = time.time()
+    for key, age in ages.items():
+        cache.put(key, bytes(100))
+        os.utime(cache.path(key), (now - age * 24 * 3600,) * 2)
+    return cache
+
+
+def kept(cache: DiskCache, keys) -> list[str]:
+    return [key for key in keys if os.path.exists(cache.path(key))]
+
+
+def test_evict_entries_not_used_for_too_long(tmp_path):
+    ages = {"aa01": 0, "aa02": 10, "bb03": 29, "bb04": 31, "cc05": 400}
+    cache = filled_cache(str(tmp_path), ages)
+    assert cache.evict() == 2
+    assert kept(cache, ages) == ["aa01", "aa02", "bb03"]
+    assert cache.evict() == 0
+
+
+def test_evict_the_least_recently_used_down_to_the_size(tmp_path):
+    ages = {"aa01": 3, "aa02": 1, "bb03": 4, "bb04": 2}
+    cache = filled_cache(str(tmp_path), ages, max_size=250)
+    assert cache.get("bb03") == bytes(100)  # read, so the most recently used now
+    assert cache.evict() == 2
+    assert kept(cache, ages) == ["aa02", "bb03"]
+
+
+def test_evict_leaves_other_files_alone(tmp_path):
+    cache = filled_cache(str(tmp_path), {"aa01": 100}, max_size=0)
+    others = [os.path.join(os.path.dirname(cache.path("aa01")), name) for name in (".tmpxyz.bin", "notes.txt")]
+    for other in others:
+        with open(other, 'wb') as f:
+            f.write(bytes(100))
+        os.utime(other, (0, 0))
+    assert cache.evict() == 1
+    assert kept(cache, ["aa01"]) == [] and all(map(os.path.exists, others))
@@ -0,0 +1,104 @@
+import random
+import threading
+
+import pytest
+
+from incremental import IncrementalParser
+from log import log
+from parser import Parser, ParserError
+from syntax.node import node_as_dict
+
+
+def netlist(line_num: int) -> str:
+    lines = ["module top (input wire clk, input wire [7:0] a, output wire [7:0] y);"]
+    for i in range(line_num):
+        if i % 4 == 0:
+            lines.append(f"    wire n_{i}, n_{i + 1};")
+        elif i % 4 == 3:
+            lines.append(f"    assign n_{i} = n_{i - 1} ^ 8'hff; // xor {i}")
+        else:
+            lines.append(f"    AND2 u_{i} (.A(n_{i}), .B(n_{i + 1}), .Y(n_{i + 2}));")
+    lines.append("endmodule")
+    return "\n".join(lines) + "\n"
+
+
+def random_edit(rng: random.Random, text: str) -> tuple[int, int, str]:
+    """ an edit as an editor makes one, most keep the text valid, some do not """
+    line_starts = [0] + [i + 1 for i, c in enumerate(text) if c == '\n']
+    line = rng.randrange(len(line_starts) - 1)
+    start, end = line_starts[line], line_starts[line + 1]
+    kind = rng.randrange(8)
+    if kind == 0:  # a new line, as typed with Enter
+        pos = rng.randrange(start, end)
+        return pos, pos, "\n"
+    elif kind == 1:  # a new declaration
+        return start, start, f"    wire w_{rng.randrange(1000)};\n"
+    elif kind == 2:  # a line removed
+        return start, end, ""
+    elif kind == 3:  # lines joined
+        return end - 1, end, " "
+    elif kind == 4:  # a comment
+        pos = rng.randrange(start, end)
+        return pos, pos, rng.choice([" /* c */ ", "/* multi\nline */", " // c\n"])
+    elif kind == 5:  # an identifier renamed
+        pos = text.find("n_", start, end)
+        return (pos, pos + 2, "m_") if pos != -1 else (start, start, "")
+    elif kind == 6:  # a character typed
+        pos = rng.randrange(start, end)
+        return pos, pos, rng.choice("a1;( \t")
+    else:  # a few lines removed
+        return start, line_starts[min(line + 3, len(line_starts) - 1)], ""
+
+
+def full_parse(text: str) -> list | None:
+    try:
+        return [node_as_dict(node) for node in Parser(text, parse_body=True).parse()]
+    except (ParserError, AssertionError):
+        return None
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_random_edits_match_full_parse(rich_grammar, seed):
+    rng = random.Random(seed)
+    text = rng.choice([rich_grammar, netlist(40)])
+    incremental = IncrementalParser(text)
+    previous = [node_as_dict(node) for node in incremental.nodes]
+    for _ in range(60):
+        start, end, new = random_edit(rng, text)
+        text = text[:start] + new + text[end:]
+        expected = full_parse(text)
+        if expected is None:
+            with pytest.raises((ParserError, AssertionError)):
+                incremental.edit(start, end, new)
+            continue
+        old_nodes = incremental.nodes
+        nodes = incremental.edit(start, end, new)
+        assert [node_as_dict(node) for node in nodes] == expected
+        if old_nodes is not None:  # the tree of the previous edit is left as it was
+            assert [node_as_dict(node) for node in old_nodes] == previous
+        previous = expected
+
+
+def test_a_failed_reparse_is_reported_once(capsys):
+    text = netlist(8)
+    incremental = IncrementalParser(text)
+    capsys.readouterr()
+    msg_num = len(log.msgs)
+    pos = text.index("    wire n_4")
+    with pytest.raises((ParserError, AssertionError)):
+        incremental.edit(pos, pos, "    assign = ;\n")  # the local reparse fails, then the whole text
+    fatal = [msg for msg in log.msgs[msg_num:] if "fatal!" in msg]
+    assert len(fatal) == 1 and capsys.readouterr().out.count("fatal!") == 1
+
+
+def test_collected_messages_are_of_this_thread_only():
+    msg_num = len(log.msgs)
+    with log.collect() as msgs:
+        log.info("quiet\n")
+        thread = threading.Thread(target=log.info, args=("loud\n",))
+        thread.start()
+        thread.join()
+    assert [msg for _, msg, _ in msgs] == ["[dotv] quiet\n"]
+    assert log.msgs[msg_num:] == ["[dotv] loud\n"]
+    log.report(msgs)
+    assert log.msgs[msg_num:] == ["[dotv] loud\n", "[dotv] quiet\n"]
@@ -0,0 +1,81 @@
+import io
+import pickle
+
+import pytest
+
+from lexer import Lexer, TokenSpan, comment_kinds, map_file
+
+
+def test_master_engine_matches_reference(rich_grammar):
+    assert Lexer(rich_grammar).tokens == Lexer(rich_grammar, engine="reference").tokens
+
+
+def test_token_store_matches_token_list(rich_grammar):
+    store = Lexer(rich_grammar, store=True)
+    assert [token.to_token() for token in store.tokens] == Lexer(rich_grammar).tokens
+
+
+def test_trivia_keeps_comments_aside(rich_grammar):
+    tokens = Lexer(rich_grammar).tokens
+    lexer = Lexer(rich_grammar, trivia=True)
+    assert [token for token in tokens if token.kind_ not in comment_kinds] == lexer.tokens
+    assert list(lexer.trivia.comments) == [token for token in tokens if token.kind_ in comment_kinds]
+
+
+def test_iter_tokens_matches_lexer(rich_grammar):
+    tokens = Lexer(rich_grammar).tokens
+    assert list(Lexer.iter_tokens(rich_grammar)) == tokens
+    assert list(Lexer.iter_tokens(io.StringIO(rich_grammar), chunk_size=97)) == tokens
+
+
+def test_bytes_and_memory_map_match_str(rich_grammar, rich_grammar_path):
+    tokens = Lexer(rich_grammar).tokens
+    assert Lexer(rich_grammar.encode()).tokens == tokens  # the columns count characters, not utf-8 bytes
+    assert [token.to_token() for token in Lexer(map_file(rich_grammar_path), store=True).tokens] == tokens
+
+
+def test_parallel_chunks_match_single_process(rich_grammar):
+    context = rich_grammar * 200  # large enough to be split into chunks
+    tokens = Lexer(context, trivia=True)
+    for parallel in (Lexer(context, jobs=2, trivia=True), Lexer(context.encode(), jobs=2, trivia=True)):
+        assert parallel.tokens == tokens.tokens
+        assert parallel.trivia.comments == tokens.trivia.comments
+        assert parallel.trivia.token_idxs == tokens.trivia.token_idxs
+
+
+def test_parallel_chunks_of_a_memory_map(rich_grammar, tmp_path):
+    path = tmp_path / "big.sv"
+    path.write_text(rich_grammar * 200, encoding="utf-8")
+    tokens = Lexer(rich_grammar * 200).tokens
+    parallel = Lexer(map_file(str(path)), store=True, jobs=2)  # the workers lex the mapped file in place
+    assert [token.to_token() for token in parallel.tokens] == tokens
+
+
+def test_token_span_slices_as_a_list(rich_grammar):
+    tokens = Lexer(rich_grammar).tokens
+    store = Lexer(rich_grammar, store=True).tokens
+    expected = tokens[10:60]
+    for span in (TokenSpan(tokens, 10, 60), TokenSpan(store, 10, 60)):
+        def as_tokens(seq) -> list:
+            return [token.to_token() for token in seq] if span.source is store else list(seq)
+
+        assert as_tokens(span) == expected
+        for idx in (slice(None), slice(5, 20), slice(-7, None), slice(None, -3), slice(20, 5), slice(-100, 100),
+                    slice(1, 40, 3), slice(None, None, -1), slice(30, 2, -4)):
+            sliced = span[idx]
+            assert as_tokens(sliced) == expected[idx], idx
+            if idx.step is None:
+                assert isinstance(sliced, TokenSpan) and sliced.source is span.source  # shared, not copied
+        assert as_tokens(span[5:20][2:4]) == expected[7:9]
+        assert as_tokens([span[-1], span[0]]) == [expected[-1], expected[0]]
+        with pytest.raises(IndexError):
+            span[50]
+        with pytest.raises(IndexError):
+            span[-51]
+
+
+def test_token_span_is_pickled_as_a_list(rich_grammar):
+    tokens = Lexer(rich_grammar).tokens
+    loaded = pickle.loads(pickle.dumps(TokenSpan(tokens, 3, 30)))
+    assert type(loaded) is list and loaded == tokens[3:30]
+    assert pickle.loads(pickle.dumps(TokenSpan(tokens, 7, 7))) == []
@@ -0,0 +1,220 @@
+import dataclasses
+import inspect
+import io
+import os
+import pickle
+
+import pytest
+
+import parser
+from lexer import Lexer, TokenKind
+from log import log
+from parser import AstCache, Context, ExpectedTokenNotFound, Parser, ParserError, match_pairs, parse_file
+from syntax.node import LazyModuleNode, ModuleNode, SyntaxNode, is_sequence, node_as_dict, node_fields
+from syntax.serialize import SerializeError, dump_nodes, format_version, load_nodes, magic, token_columns
+
+
+def as_dicts(nodes) -> list:
+    return [node_as_dict(node) for node in nodes]
+
+
+def test_parse_modes_give_the_same_nodes(rich_grammar, rich_grammar_path):
+    expected = as_dicts(Parser(rich_grammar, parse_body=True).parse())
+    assert as_dicts(Parser(rich_grammar, parse_body=True, token_store=True).parse()) == expected
+    assert as_dicts(Parser(rich_grammar.encode(), parse_body=True).parse()) == expected
+    assert as_dicts(Parser(io.StringIO(rich_grammar), parse_body=True, stream=True).parse()) == expected
+    lazy = as_dicts(Parser(rich_grammar, parse_body=True, lazy_body=True).parse())
+    for d in lazy:
+        if d["_type_"] == "LazyModuleNode":
+            d["_type_"] = "ModuleNode"
+    assert lazy == expected
+    assert as_dicts(Parser(rich_grammar, parse_body=True, jobs=2).parse()) == expected
+    assert as_dicts(parse_file(rich_grammar_path, parse_body=True, memory_map=True)) == expected
+    assert as_dicts(parse_file(rich_grammar_path, parse_body=True, memory_map=True, token_store=True)) == expected
+
+
+def test_lazy_body_is_parsed_on_access_as_the_eager_one(rich_grammar):
+    _, counter, top = Parser(rich_grammar, parse_body=True).parse()
+    _, lazy_counter, lazy_top = Parser(rich_grammar, parse_body=True, lazy_body=True).parse()
+    assert isinstance(lazy_counter, LazyModuleNode) and not lazy_counter.body_parsed
+    assert as_dicts(lazy_counter.body_items) == as_dicts(counter.body_items)
+    assert lazy_counter.body_parsed and not lazy_top.body_parsed
+    loaded = pickle.loads(pickle.dumps(lazy_top))  # parsed to be pickled, loaded as a plain ModuleNode
+    assert type(loaded) is ModuleNode and as_dicts(loaded.body_items) == as_dicts(top.body_items)
+
+
+def test_lazy_body_error_is_raised_on_access():
+    text = "module m (input wire a, output wire b);\n    assign b = (a;\nendmodule\n"
+    [module] = Parser(text, parse_body=True, lazy_body=True).parse()  # the header alone is parsed
+    assert module.name == "m"
+    with pytest.raises(ParserError):
+        module.body_items
+
+
+def test_index_modules_spans_each_module(rich_grammar):
+    text = rich_grammar + "module open_ (input wire a);\n"  # not closed, left out
+    parser = Parser(text)
+    tokens = parser.ctx.tokens
+    index = parser.index_modules()
+    assert list(index) == ["counter", "top"]
+    for name, (start, end) in index.items():
+        assert tokens[start].kind_ == TokenKind.Module and tokens[start + 1].val == name
+        assert tokens[end].kind_ == TokenKind.EndModule
+        assert [token.kind_ for token in tokens[start + 1:end]].count(TokenKind.EndModule) == 0
+    _, counter, top = Parser(rich_grammar).parse()
+    assert node_as_dict(parser.parse_module("top")) == node_as_dict(top)
+    assert node_as_dict(parser.parse_module("counter")) == node_as_dict(counter)
+
+
+def test_matching_table_of_unbalanced_brackets_and_blocks():
+    tokens = Lexer("( [ ) ] end begin ( ) end ( module a module b endmodule endmodule").tokens
+    # an 'endmodule' closes every pending 'module', the second one is left unmatched, as are the stray 'end' and '('
+    assert list(match_pairs(tokens)) == [2, 3, 0, 1, -1, 8, 7, 6, 5, -1, 14, -1, 14, -1, 10, -1, -1]
+    ctx = Context(tokens)
+    assert ctx.partner(5) == 8 and ctx.partner(4) is None and ctx.partner(9) is None
+    assert ctx.sub(5, 8).partner(5) is None  # the partner is out of the view
+
+
+@pytest.mark.parametrize("text, error, line", [
+    ("module m (input wire a, output wire b;\nendmodule\n", "for the port list block, '(' is not closed by ')'", 1),
+    ("module m (input wire a, output wire b);\n    AND2 u (.A(a), .Y(b);\nendmodule\n",
+     "no matching ')' found at the end of port connection block", 2),
+    ("module m (input wire clk, output reg q);\n    always @(posedge clk) begin\n        q <= 1;\nendmodule\n",
+     "no matching 'end' found for 'begin'", 2),
+])
+def test_an_unclosed_bracket_or_block_is_reported(text, error, line):
+    msg_num = len(log.msgs)
+    with pytest.raises(ExpectedTokenNotFound):
+        Parser(text).parse()
+    [fatal] = [msg for msg in log.msgs[msg_num:] if "fatal!" in msg]
+    assert error in fatal and f"line: {line}," in fatal
+
+
+def test_a_stray_end_is_reported():
+    text = "module m (input wire clk, output reg q);\n    always @(posedge clk) begin\n        q <= 1;\n    end\n" \
+           "    end\nendmodule\n"
+    with pytest.raises(AssertionError, match="got token: end, it's invalid inside module definition") as info:
+        Parser(text).parse()
+    assert "line: 5, column: 5," in str(info.value)
+
+
+def deep_modules(depth: int, module_num: int = 2) -> str:
+    return "".join(f"module deep{i} (input wire a, output wire b);\n    assign b = " + "(" * depth + "a" + ")" * depth +
+                   ";\nendmodule\n" for i in range(module_num))
+
+
+def test_parallel_parse_of_deep_expressions():
+    context = deep_modules(3000)  # deeper than the recursion limit, compared by their text, as_dicts recurses
+    nodes = Parser(context).parse()
+    assert [node.body_items[0].tokens_str for node in Parser(context, jobs=2).parse()] == \
+        [node.body_items[0].tokens_str for node in nodes]
+
+
+def test_parallel_parse_falls_back_to_this_process(rich_grammar, monkeypatch):
+    def dump_nodes_failing(nodes):
+        raise SerializeError("not dumped")
+
+    monkeypatch.setattr(parser, "dump_nodes", dump_nodes_failing)  # inherited by the forked workers
+    context = rich_grammar + deep_modules(10)
+    assert as_dicts(Parser(context, jobs=2).parse()) == as_dicts(Parser(context).parse())
+
+
+def test_dump_and_load_nodes_round_trip(rich_grammar):
+    nodes = Parser(rich_grammar, parse_body=True).parse()
+    assert as_dicts(load_nodes(dump_nodes(nodes))) == as_dicts(nodes)
+    store_nodes = Parser(rich_grammar, parse_body=True, token_store=True).parse()
+    assert as_dicts(load_nodes(dump_nodes(store_nodes))) == as_dicts(nodes)
+
+
+def test_ast_cache_round_trip(rich_grammar_path, tmp_path):
+    cache = AstCache(str(tmp_path))
+    parsed = parse_file(rich_grammar_path, parse_body=True, cache=cache)
+    loaded = parse_file(rich_grammar_path, parse_body=True, cache=cache)
+    assert as_dicts(loaded) == as_dicts(parsed) == as_dicts(parse_file(rich_grammar_path, parse_body=True))
+
+
+class Payload:
+    def __init__(self, path: str):
+        self.path = path
+
+    def __reduce__(self):
+        return os.mkdir, (self.path,)
+
+
+def test_ast_cache_does_not_load_arbitrary_objects(rich_grammar_path, tmp_path):
+    cache = AstCache(str(tmp_path / "cache"))
+    parsed = parse_file(rich_grammar_path, parse_body=True, cache=cache)
+    [entry] = [os.path.join(root, name) for root, _, names in os.walk(tmp_path / "cache") for name in names]
+    with open(entry, 'wb') as f:  # a dump whose nodes would run code, if they were loaded by a plain unpickler
+        f.write(magic + bytes([format_version]))
+        pickle.dump(token_columns([]), f)
+        pickle.dump([Payload(str(tmp_path / "created"))], f)
+    loaded = parse_file(rich_grammar_path, parse_body=True, cache=cache)  # a cache miss, it is parsed again
+    assert not (tmp_path / "created").exists()
+    assert as_dicts(loaded) == as_dicts(parsed)
+
+
+def test_ast_cache_of_a_deep_expression(tmp_path):
+    path = tmp_path / "deep.sv"
+    depth = 3000  # deeper than the recursion limit
+    path.write_text("module deep (input wire a, output wire b);\n    assign b = " + "(" * depth + "a" + ")" * depth +
+                    ";\nendmodule\n", encoding="utf-8")
+    cache = AstCache(str(tmp_path / "cache"))
+    parsed = parse_file(str(path), parse_body=True, cache=cache)
+    assert len(os.listdir(tmp_path / "cache")) == 1  # written, not skipped
+    loaded = parse_file(str(path), parse_body=True, cache=cache)
+    assert loaded[0].tokens_str == parsed[0].tokens_str
+    store_nodes = parse_file(str(path), parse_body=True, token_store=True)
+    assert load_nodes(dump_nodes(store_nodes))[0].tokens_str == parsed[0].tokens_str
+
+
+def test_tokens_str_of_a_changed_tree(rich_grammar):
+    module = Parser(rich_grammar, parse_body=True).parse()[1]
+    assignment = module.body_items[6].assignment  # expressions are rendered from their sub-nodes
+    text = assignment.tokens_str
+    assert "next" in text and "overflow" not in text
+    # a change builds new nodes, the old ones keep their text
+    other = module.body_items[7].assignment.left  # 'overflow'
+    changed = dataclasses.replace(assignment, left=other)
+    assert changed.tokens_str == text.replace("next", "overflow", 1) and assignment.tokens_str == text
+    # a node is not mutated in place, its text can not go stale
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        assignment.left = other
+    assert assignment.tokens_str == text
+
+
+def test_node_fields_are_the_constructor_arguments(rich_grammar):
+    classes, nodes = set(), list(Parser(rich_grammar, parse_body=True).parse())
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, SyntaxNode):
+            classes.add(node.__class__)
+            fields = node_fields(node.__class__)
+            assert "tokens_str_" not in fields and fields == tuple(inspect.signature(node.__class__).parameters)
+            rebuilt = node.__class__(**{attr: getattr(node, attr) for attr in fields})
+            assert node_as_dict(rebuilt) == node_as_dict(node)
+            nodes.extend(getattr(node, attr) for attr in fields if attr != "tokens")
+        elif is_sequence(node):
+            nodes.extend(node)
+    assert len(classes) > 20  # most of the node classes are met in the rich grammar
+    assert node_fields(LazyModuleNode) == node_fields(ModuleNode)
+
+
+def test_source_str_is_the_text_between_the_first_and_last_tokens(rich_grammar, rich_grammar_path):
+    def source(first: str, last: str) -> str:
+        start = rich_grammar.index(first)
+        return rich_grammar[start:rich_grammar.index(last, start) + len(last)]
+
+    parser = Parser(rich_grammar, parse_body=True)
+    lines = parser.ctx.src_info.lines
+    _, counter, top = parser.parse()
+    expected = [(counter, source("module counter", "endmodule")),  # with the comments and the non-ASCII text
+                (counter.body_items[7], source("assign overflow", "!rst_n;")),
+                (counter.body_items[8], source("always @(posedge", "        end\n    end")),
+                (top, source("module top", "endmodule")),
+                (top.body_items[1], "input [7:0] b;")]  # not the comment before
+    for node, text in expected:
+        assert node.source_str(lines) == text
+    # the nodes of a TokenStore slice their text from the memory-mapped file
+    _, store_counter, store_top = parse_file(rich_grammar_path, parse_body=True, memory_map=True, token_store=True)
+    assert [store_counter.source_str(), store_top.body_items[1].source_str()] == [expected[0][1], expected[4][1]]
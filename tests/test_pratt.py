@@ -0,0 +1,94 @@
+import pytest
+
+from lexer import Token, TokenKind
+from log import log
+from parser import Parser, ParserError
+from pratt import bp
+
+
+def assigned(expression: str):
+    module = Parser(f"module m (input wire a, output wire b);\n    assign b = {expression};\nendmodule\n").parse()[0]
+    return module.body_items[0]
+
+
+@pytest.mark.parametrize("opening, closing, rendered_opening, rendered_closing", [
+    (["("], [")"], "(『", "』)"),  # parenthesized
+    (["a", "?", "a", ":", "("], [")"], "『a』?『a』:『(『", "』)』]"),  # a chain of '?:'
+    (["a", "["], ["]"], "『a』[『", "』]"),  # indexed by an index
+])
+def test_deep_expression_is_parsed_and_rendered(opening, closing, rendered_opening, rendered_closing):
+    depth = 10000  # far deeper than the recursion limit
+    tokens = opening * depth + ["a"] + closing * depth
+    assign = assigned(" ".join(tokens))
+    assert assign.tokens_str == " ".join(["assign", "b", "="] + tokens + [";"])
+    assert assign.assignment.right.tokens_str == rendered_opening * depth + "a" + rendered_closing * depth
+
+
+@pytest.mark.parametrize("expression, error", [
+    ("(a + a", "no matching ')' for '('"),
+    ("a[a", "expecting ']' or ':'"),
+    ("a[a:a", "expecting ']'"),
+    ("a ? a a", "expecting ':'"),
+])
+def test_a_missing_closer_stops_the_parse(expression, error):
+    msg_num = len(log.msgs)
+    with pytest.raises(ParserError):
+        assigned(expression)
+    [fatal] = [msg for msg in log.msgs[msg_num:] if "fatal!" in msg]  # not parsed on past it
+    assert f"invalid syntax for expression, {error}" in fatal
+
+
+def chained_bp(kind: TokenKind, prefix: bool, assign_statement: bool) -> int:
+    """ the binding power as the if / elif chain the tables replaced worked it out """
+    if kind in [TokenKind.LParen, TokenKind.RParen, TokenKind.LBracket, TokenKind.ScopeResolution, TokenKind.Dot]:
+        return 170
+    elif kind in [TokenKind.Add, TokenKind.Sub, TokenKind.BitAnd, TokenKind.BitOr, TokenKind.BitXor] and prefix or \
+         kind in [TokenKind.LogicNot, TokenKind.BitNot, TokenKind.SelfIncrement, TokenKind.SelfDecrement]:
+        return 160
+    elif kind in [TokenKind.Pow]:
+        return 150
+    elif kind in [TokenKind.Mul, TokenKind.Div, TokenKind.Mod]:
+        return 140
+    elif kind in [TokenKind.Add, TokenKind.Sub] and not prefix:
+        return 130
+    elif kind in [TokenKind.LogicLeftShift, TokenKind.LogicRightShift, TokenKind.ArithLeftShift,
+                  TokenKind.ArithRightShift]:
+        return 120
+    elif kind in [TokenKind.LessThan, TokenKind.GreaterThan, TokenKind.GreaterEqual, TokenKind.Inside] or \
+         kind in [TokenKind.LessEqual] and not assign_statement:
+        return 110
+    elif kind in [TokenKind.Equal, TokenKind.InEqual, TokenKind.CaseEqual, TokenKind.CaseInEqual,
+                  TokenKind.WildcardEqual, TokenKind.WildcardInEqual]:
+        return 100
+    elif kind in [TokenKind.BitAnd]:
+        return 90
+    elif kind in [TokenKind.BitXor]:
+        return 80
+    elif kind in [TokenKind.BitOr]:
+        return 70
+    elif kind in [TokenKind.LogicAnd]:
+        return 50
+    elif kind in [TokenKind.LogicOr]:
+        return 40
+    elif kind in [TokenKind.QuestionMark]:
+        return 30
+    elif kind in [TokenKind.Implication, TokenKind.Equivalence]:
+        return 20
+    elif kind in [TokenKind.Assignment, TokenKind.AddAssignment, TokenKind.SubAssignment, TokenKind.MulAssignment,
+                  TokenKind.DivAssignment, TokenKind.ModAssignment, TokenKind.BitAndAssignment,
+                  TokenKind.BitXorAssignment, TokenKind.BitOrAssignment, TokenKind.LogicLeftShiftAssignment,
+                  TokenKind.LogicRightShiftAssignment, TokenKind.ArithLeftShiftAssignment,
+                  TokenKind.ArithRightShiftAssignment] or \
+         kind in [TokenKind.LessEqual] and assign_statement:
+        return 10
+    else:
+        return 0
+
+
+@pytest.mark.parametrize("prefix", [False, True])
+@pytest.mark.parametrize("assign_statement", [False, True])
+def test_binding_power_tables_match_the_chain(prefix, assign_statement):
+    for kind in TokenKind:
+        token = Token(kind, 1, 1, "", "")
+        assert bp(token, prefix=prefix, assign_statement=assign_statement) == \
+            chained_bp(kind, prefix, assign_statement), kind
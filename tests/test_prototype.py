@@ -0,0 +1,107 @@
+import json
+import os
+
+import pytest
+
+import prototype
+from parser import ParserError
+from prototype import PrototypeCache, collect_source_files, extract_module_prototype_info_from_file, \
+    extract_module_prototype_info_from_file_reporting_failure, extract_module_prototype_info_from_files, main
+
+
+def test_prototype_modes_give_the_same_info(rich_grammar_path):
+    expected = extract_module_prototype_info_from_file(rich_grammar_path)
+    assert [info.name for info in expected] == ["counter", "top"]
+    assert extract_module_prototype_info_from_file(rich_grammar_path, memory_map=True) == expected
+    assert extract_module_prototype_info_from_file(rich_grammar_path, header_only=True) == expected
+
+
+def test_prototype_cache_round_trip(rich_grammar_path, tmp_path):
+    cache = PrototypeCache(str(tmp_path))
+    parsed = extract_module_prototype_info_from_file(rich_grammar_path, cache=cache)
+    loaded = extract_module_prototype_info_from_file(rich_grammar_path, cache=cache)
+    assert loaded == parsed == extract_module_prototype_info_from_file(rich_grammar_path)
+    assert extract_module_prototype_info_from_file(rich_grammar_path, memory_map=True, cache=cache) == parsed
+
+
+def test_header_only_result_is_not_cached_for_a_full_run(tmp_path):
+    path = tmp_path / "body_error.sv"
+    path.write_text("module m (input wire a);\n    assign = ;\nendmodule\n", encoding="utf-8")
+    cache = PrototypeCache(str(tmp_path / "cache"))
+    assert [info.name for info in extract_module_prototype_info_from_file(str(path), header_only=True,
+                                                                          cache=cache)] == ["m"]
+    with pytest.raises(ParserError):
+        extract_module_prototype_info_from_file(str(path), cache=cache)
+
+
+def test_files_are_extracted_in_a_pool(rich_grammar_path, tmp_path):
+    broken = tmp_path / "broken.sv"
+    broken.write_text("module broken (input wire a);\n    assign = ;\nendmodule\n", encoding="utf-8")
+    info_s, failures = extract_module_prototype_info_from_files([rich_grammar_path, str(broken)], jobs=2)
+    assert [(path, info.name) for path, info in info_s] == [(rich_grammar_path, "counter"),
+                                                            (rich_grammar_path, "top")]
+    assert [failure.path for failure in failures] == [str(broken)]
+    assert failures[0].error.endswith("ParserError: ")
+
+
+def test_any_exception_is_reported_as_a_failure(rich_grammar_path, monkeypatch):
+    def fail(*args):
+        raise RecursionError("maximum recursion depth exceeded")
+    monkeypatch.setattr(prototype, "parse_module_prototype_info_from_file", fail)
+    info_s, failure = extract_module_prototype_info_from_file_reporting_failure(rich_grammar_path)
+    assert info_s == []
+    assert failure.error == "RecursionError: maximum recursion depth exceeded"
+
+
+def source_tree(tmp_path, rich_grammar: str):
+    """ src/a.sv, src/sub/b.v, src/notes.txt, lib/cell.v """
+    (tmp_path / "src" / "sub").mkdir(parents=True)
+    (tmp_path / "lib").mkdir()
+    (tmp_path / "src" / "a.sv").write_text(rich_grammar, encoding="utf-8")
+    (tmp_path / "src" / "sub" / "b.v").write_text("module b (input wire x);\nendmodule\n", encoding="utf-8")
+    (tmp_path / "src" / "notes.txt").write_text("not a source\n", encoding="utf-8")
+    (tmp_path / "lib" / "cell.v").write_text("module cell (input wire x);\nendmodule\n", encoding="utf-8")
+
+
+def test_inputs_are_collected_from_directories_globs_and_filelists(rich_grammar, tmp_path, monkeypatch):
+    source_tree(tmp_path, rich_grammar)
+    a, b = str(tmp_path / "src" / "a.sv"), str(tmp_path / "src" / "sub" / "b.v")
+    assert collect_source_files([str(tmp_path / "src")]) == [a, b]
+    assert collect_source_files([str(tmp_path / "src" / "**" / "*.v")]) == [b]
+    (tmp_path / "nested.f").write_text("src/sub/b.v\n", encoding="utf-8")
+    monkeypatch.setenv("SRC", str(tmp_path / "src"))
+    (tmp_path / "src" / "files.f").write_text(
+        "// the sources\n"
+        "+incdir+inc -y ../lib +libext+.v\n"
+        "-v ../lib/cell.v\n"
+        "$SRC/a.sv  # by a variable\n"
+        "-f ../nested.f\n"
+        "a.sv\n", encoding="utf-8")
+    # the library of -y and -v is not a source, a file is listed once
+    assert collect_source_files([str(tmp_path / "src" / "files.f")]) == [a, b]
+
+
+def test_a_broken_pool_reports_the_files_left(rich_grammar, tmp_path, monkeypatch):
+    source_tree(tmp_path, rich_grammar)
+    monkeypatch.setattr(prototype, "extract_module_prototype_info_from_file", exit_on_b)  # inherited by the workers
+    paths = [str(tmp_path / "src" / "a.sv"), str(tmp_path / "src" / "sub" / "b.v")]
+    info_s, failures = extract_module_prototype_info_from_files(paths, jobs=2)
+    assert paths[1] in [failure.path for failure in failures]
+    assert all(failure.error.startswith("BrokenProcessPool") for failure in failures)
+
+
+def exit_on_b(path: str, *args):
+    if path.endswith("b.v"):
+        os._exit(1)  # a worker killed, e.g. out of memory
+    return []
+
+
+def test_command_line(rich_grammar, tmp_path):
+    source_tree(tmp_path, rich_grammar)
+    output = tmp_path / "out.json"
+    assert main([str(tmp_path / "src"), "-o", str(output), "-j", "1", "--cache-dir", str(tmp_path / "cache")]) == 0
+    assert [(os.path.basename(info["path"]), info["name"]) for info in json.loads(output.read_text())] == \
+        [("a.sv", "counter"), ("a.sv", "top"), ("b.v", "b")]
+    (tmp_path / "src" / "sub" / "b.v").write_text("module b (input wire x);\n    assign = ;\nendmodule\n")
+    assert main([str(tmp_path / "src"), "-o", str(output), "-j", "2"]) == 1
+    assert [info["name"] for info in json.loads(output.read_text())] == ["counter", "top"]